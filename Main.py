@@ -1,14 +1,17 @@
 import collections
 import functools
 import logging
+import multiprocessing
 import os
 import shutil
+from concurrent import futures
 
 import h5py
 import numpy
 import yaml
 from PyQt5 import QtWidgets, QtCore
 
+from module.PluginRegistry import PluginRegistry, load_plugin
 from ui.ConfirmInt.ConfirmInterface import ConfirmInterface
 from ui.GUI import Ui_MainWindow
 from ui.PrefInt.PreferenceInterface import PreferenceInterface
@@ -19,10 +22,14 @@ DIR = os.path.dirname(os.path.abspath(__file__))
 MODULE_DIR = os.path.join(DIR, "module")
 
 CONFIG = os.path.join(DIR, "CFG.yml")
+# Discovered plugins, see PluginRegistry.
+PLUGIN_CACHE = os.path.join(DIR, ".plugins.yml")
 MODULE_G = "MODULE"
 PREFERENCE = 'PREFERENCE'
 GENERAL = 'GENERAL'
 MAT_LIB = 'db_lib_path'
+# Item data role marking a library group whose children are not loaded yet.
+LAZY_ROLE = QtCore.Qt.UserRole
 
 
 # TODO: Add search bar for recipe
@@ -38,6 +45,97 @@ def block_tree_signal(func):
     return wrapper
 
 
+def read_data_file(reader_name, file):
+    """Parse a data file with a FileModule reader.
+
+    Module level so that it could be run in the import process pool.
+
+    :param reader_name: The name of the reader module, from TYPE_DICT.
+    :param file: The path of the data file.
+    :return: data, attr
+    """
+    reader = load_plugin(reader_name)()
+    reader.get_file(file)
+    data, attr, *_ = reader.get_data()
+
+    return data, attr
+
+
+class ImportWorker(QtCore.QObject):
+    """Import data files into the library in a background thread.
+
+    The files are parsed concurrently in a process pool, the results are
+    written to the library by this worker only, in order of completion.
+    """
+    progress = QtCore.pyqtSignal(int, int)
+    imported = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str, str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, lib, jobs, h5_path, is_force=False, max_workers=None):
+        """
+        :param lib: The H5File library.
+        :param jobs: list of (reader name, file path).
+        :param h5_path: The group in which the data are recorded.
+        :param is_force: Overwrite the existed data sets.
+        :param max_workers: Size of the process pool, default to cpu count.
+        """
+        super(ImportWorker, self).__init__()
+        self.lib = lib
+        self.jobs = jobs
+        self.h5_path = h5_path
+        self.is_force = is_force
+        self.max_workers = max_workers
+        self._is_cancelled = False
+
+    def cancel(self):
+        """Stop the import, the files already recorded are kept."""
+        self._is_cancelled = True
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        total = len(self.jobs)
+        done = 0
+        # Forking a process running Qt is not safe.
+        with futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')) as executor:
+            future_d = {
+                executor.submit(read_data_file, reader_name, file): file
+                for reader_name, file in self.jobs
+            }
+            for future in futures.as_completed(future_d):
+                if self._is_cancelled:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+                file = future_d[future]
+                try:
+                    data, attr = future.result()
+                    self._write(file, data, attr)
+                except Exception as e:
+                    logging.warning("Fail to import {0}: {1}".format(file, e))
+                    self.failed.emit(file, str(e))
+                done += 1
+                self.progress.emit(done, total)
+
+        self.lib.fh.flush()
+        self.finished.emit()
+
+    def _write(self, file, data, attr):
+        if "TYPE" not in attr:
+            raise TypeError("Must set type for the data.")
+        name = os.path.basename(file).split('.')[0]
+        attr['title'] = self.h5_path + '/' + name
+        try:
+            self.lib.set_data(
+                data, attr, path=self.h5_path, name=name,
+                is_force=self.is_force)
+        except FileExistsError:
+            raise FileExistsError("File has existed.")
+        logging.debug("Recorded {0}.".format(attr['title']))
+        self.imported.emit(name)
+
+
 class ProgramInterface(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -47,6 +145,7 @@ class ProgramInterface(QtWidgets.QMainWindow):
         os.chdir(DIR)
 
         self.f_path = ''
+        self._import_thread = None
         self.cut_items_l = []
         self.copy_items_l = []
         with open(CONFIG, 'r') as yml_file:
@@ -62,6 +161,8 @@ class ProgramInterface(QtWidgets.QMainWindow):
             self._error.rejected.connect(self.close)
 
         # Initiate the modules and library.
+        self.registry = PluginRegistry(MODULE_DIR, PLUGIN_CACHE).scan()
+        self.registry.update_types(self.cfg['TYPE_DICT'])
         self._init_module()
         try:
             self._init_lib()
@@ -95,6 +196,7 @@ class ProgramInterface(QtWidgets.QMainWindow):
         )
         self.ui.treeWidget.itemChanged.connect(
             lambda: self.rename_item(self.f_path))
+        self.ui.treeWidget.itemExpanded.connect(self._populate_item)
 
         self.ui.actionAdd_Module.triggered.connect(self._add_module)
         self.ui.actionImport_Data.triggered.connect(self._add_data)
@@ -169,23 +271,27 @@ class ProgramInterface(QtWidgets.QMainWindow):
         except shutil.SameFileError:
             pass
 
-        # import module
+        # Register module to config file.
         mdl_n = str(mdl_n.split('.')[0])
-        _tmp = __import__(
-            'module', globals(), locals(), [mdl_n], 0)
-        _mdl = getattr(_tmp, mdl_n)
-        _mdl = getattr(_mdl, mdl_n)
+        info = self.registry.add(new_mdl)
+        if info is None:
+            self._error = QtWidgets.QErrorMessage(self)
+            self._error.showMessage(
+                "{0} has no reader or processor class {0}.".format(mdl_n))
+            return
+        sup_tp_l = info['supp_type']
+        if not sup_tp_l:
+            # Not declared as a literal, ask an instance.
+            _mdl = load_plugin(mdl_n)()
+            sup_tp_l = (
+                [_mdl.supp_type] if isinstance(_mdl.supp_type, str)
+                else list(_mdl.supp_type))
 
-        # Register module to config file.
         self.cfg[MODULE_G].setdefault(mdl_n, {})
-        self.cfg[MODULE_G][mdl_n].setdefault('name', _mdl().name)
-        if isinstance(_mdl().supp_type, str):
-            sup_tp_l = [_mdl().supp_type]
-        else:
-            sup_tp_l = list(_mdl().supp_type)
-
+        self.cfg[MODULE_G][mdl_n].setdefault('name', info['name'])
         for i in sup_tp_l:
             self.cfg['TYPE_DICT'][i] = mdl_n
+        self.registry.update_types({i: mdl_n for i in sup_tp_l})
 
         # Add module to menu.
         self._tmp_act = QtWidgets.QAction(mdl_n)
@@ -219,20 +325,11 @@ class ProgramInterface(QtWidgets.QMainWindow):
         self.ui.treeWidget.clear()
         root_item = QtWidgets.QTreeWidgetItem(self.ui.treeWidget)
         root_item.setText(0, '/')
-        def post_order(g, l):
-            for i in l.keys():
-                if hasattr(l[i], "keys"):
-                    gp = QtWidgets.QTreeWidgetItem(g, [i])
-                    gp.setFlags(gp.flags() | QtCore.Qt.ItemIsEditable)
-                    post_order(gp, l[i])
-                else:
-                    item = QtWidgets.QTreeWidgetItem(g, [i])
-                    item.setFlags(item.flags() | QtCore.Qt.ItemIsEditable)
-
-        post_order(root_item, self.lib.fh)
+        root_item.setData(0, LAZY_ROLE, True)
+        # Only the first level is read, the groups are read when expanded.
+        self._populate_item(root_item)
         root_item.setExpanded(True)
 
-
         try:
             self._mat_lib = self._get_file_reader(
                 self.cfg[PREFERENCE][GENERAL][MAT_LIB])
@@ -246,6 +343,37 @@ class ProgramInterface(QtWidgets.QMainWindow):
 
             # self.view_sort(self.ui.treeWidget)
 
+    def _populate_item(self, item):
+        """Read the children of a group item from the library.
+
+        Called when the item is expanded, and before its children are
+        listed or modified. Does nothing if they are already read.
+
+        :param item: The qTreeItem of a group.
+        """
+        if not item.data(0, LAZY_ROLE):
+            return
+        is_blocked = self.ui.treeWidget.blockSignals(True)
+        item.setData(0, LAZY_ROLE, False)
+        item.setChildIndicatorPolicy(
+            QtWidgets.QTreeWidgetItem.DontShowIndicatorWhenChildless)
+        grp = self.lib.fh[self._item2h5(item)]
+        for i in grp.keys():
+            # Hidden groups, e.g. the content index of H5File.
+            if i.startswith('.'):
+                continue
+            ch_item = QtWidgets.QTreeWidgetItem(item, [i])
+            ch_item.setFlags(ch_item.flags() | QtCore.Qt.ItemIsEditable)
+            if grp.get(i, getclass=True) is h5py.Group:
+                self._set_lazy(ch_item)
+        self.ui.treeWidget.blockSignals(is_blocked)
+
+    @staticmethod
+    def _set_lazy(item):
+        """Mark a group item as not read, it shows an expand indicator."""
+        item.setData(0, LAZY_ROLE, True)
+        item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
+
     def _add_data(self):
         """Menu action to import data from file.
 
@@ -262,13 +390,12 @@ class ProgramInterface(QtWidgets.QMainWindow):
         raw_file_names = raw_file_names[0]
         if not raw_file_names:
             return
-        for i in raw_file_names:
-            self._save_data(str(i))
-        self.lib.fh.flush()
+        self._import_data([str(i) for i in raw_file_names])
 
     @block_tree_signal
     def add_grp(self):
         item = self.ui.treeWidget.currentItem()
+        self._populate_item(item)
         ch_text_l = [item.child(i).text(0) for i in range(item.childCount())]
 
         new_item = QtWidgets.QTreeWidgetItem(item)
@@ -303,7 +430,7 @@ class ProgramInterface(QtWidgets.QMainWindow):
                 # Delete the item from h5file.
                 h5_path = self._item2h5(item)
                 logging.debug("Deleting {0}.".format(h5_path))
-                del self.lib.fh[h5_path]
+                self.lib.delete(h5_path)
                 # Delete the item from qTreeWidget
                 (item.parent() or root).removeChild(item)
         else:
@@ -328,7 +455,7 @@ class ProgramInterface(QtWidgets.QMainWindow):
                 root = self.ui.treeWidget.invisibleRootItem()
                 item = self._h52item(c_path)
                 (item.parent() or root).removeChild(item)
-                del self.lib.fh[c_path]
+                self.lib.delete(c_path)
                 logging.debug(f_path + '->' + c_path)
                 self.lib.fh.move(f_path, c_path)
                 self.lib.fh.flush()
@@ -383,13 +510,16 @@ class ProgramInterface(QtWidgets.QMainWindow):
             if not overwrite_alert.get_bool:
                 return
         root = self.ui.treeWidget.invisibleRootItem()
+        self._populate_item(self.ui.treeWidget.currentItem())
         for i in self.cut_items_l:
             f_path = self._item2h5(i)
             n_path = (n_grp + "/" + f_path.split("/")[-1])
             if n_path in self.lib.fh:
-                del self.lib.fh[n_path]
+                self.lib.delete(n_path)
             else:
                 n_ch = i.clone()
+                if n_ch.data(0, LAZY_ROLE):
+                    self._set_lazy(n_ch)
                 self.ui.treeWidget.currentItem().addChild(n_ch)
             self.lib.fh.move(f_path, n_path)
 
@@ -399,76 +529,118 @@ class ProgramInterface(QtWidgets.QMainWindow):
             f_path = self._item2h5(i)
             n_path = (n_grp + "/" + f_path.split("/")[-1])
             if n_path in self.lib.fh:
-                del self.lib.fh[n_path]
+                self.lib.delete(n_path)
             else:
                 n_ch = i.clone()
+                if n_ch.data(0, LAZY_ROLE):
+                    self._set_lazy(n_ch)
                 self.ui.treeWidget.currentItem().addChild(n_ch)
             self.lib.fh[n_path] = f_path
 
-    def _save_data(self, raw_file_name):
-        try:
-            reader = self._get_file_reader(raw_file_name)
-        except TypeError as e:
+    def _import_data(self, raw_file_names, is_strict=True):
+        """Import data files into the current group in background.
+
+        :param raw_file_names: list of file paths.
+        :param is_strict: Report the files of unknown type, otherwise they
+        are skipped silently, e.g. when importing a directory.
+        """
+        if self._import_thread is not None:
             self._error = QtWidgets.QErrorMessage(self)
             self._error.setWindowModality(QtCore.Qt.WindowModal)
-            self._error.showMessage(str(e))
+            self._error.showMessage("Another import is running.")
             return
 
-        is_duplicate = False
-
-        logging.debug("Recording data to h5 file...")
-        h5_path = self._item2h5(self.ui.treeWidget.currentItem())
-        data, attr, *_ = reader.get_data()
-        if "TYPE" not in attr:
-            self._error = QtWidgets.QErrorMessage(self)
-            self._error.setWindowModality(QtCore.Qt.WindowModal)
-            self._error.showMessage("Must set type for the data.")
+        jobs = []
+        for i in raw_file_names:
+            _, extension = os.path.splitext(i)
+            try:
+                jobs.append((self.registry.get_name(extension), i))
+            except KeyError:
+                logging.debug("Skip {0}, unknown type.".format(i))
+                if is_strict:
+                    self._error = QtWidgets.QErrorMessage(self)
+                    self._error.setWindowModality(QtCore.Qt.WindowModal)
+                    self._error.showMessage(
+                        "Unknown Type of {0}. Please confirm this type is "
+                        "supported by at least one module.".format(i))
+                    return
+        if not jobs:
             return
-        name = os.path.basename(raw_file_name).split('.')[0]
-        attr['title'] = h5_path + '/' + name
-        is_data = self.lib.is_data_set(h5_path)
-        try:
-            self.lib.set_data(
-                data,
-                attr,
-                path=h5_path,
-                name=name,
-            )
-        except FileExistsError:
+
+        # The data are recorded beside a data set, or in a group.
+        item = self.ui.treeWidget.currentItem()
+        if item is None:
+            item = self.ui.treeWidget.topLevelItem(0)
+        if self.lib.is_data_set(self._item2h5(item)) == 0:
+            item = item.parent()
+        h5_path = self._item2h5(item)
+        self._populate_item(item)
+
+        is_force = False
+        ch_text_l = [item.child(i).text(0) for i in range(item.childCount())]
+        if any(os.path.basename(i).split('.')[0] in ch_text_l
+               for _, i in jobs):
             self.temp_confirm = ConfirmInterface()
             self.temp_confirm.set_text("File has existed, overwrite?")
             self.temp_confirm.exec()
-            if self.temp_confirm.get_bool():
-                is_duplicate = True
-                self.lib.set_data(
-                    data,
-                    attr,
-                    path=h5_path,
-                    name=name,
-                    is_force=True,
-                )
-            else:
-                return
+            is_force = self.temp_confirm.get_bool()
             del self.temp_confirm
-        except TypeError as e:
-            self._error = QtWidgets.QErrorMessage(self)
-            self._error.setWindowModality(QtCore.Qt.WindowModal)
-            self._error.showMessage(str(e))
-            logging.warning(str(e))
+
+        logging.debug("Importing {0} files to {1}...".format(
+            len(jobs), h5_path))
+        self._import_item = item
+        self._import_err_l = []
+        self._import_progress = QtWidgets.QProgressDialog(
+            "Importing data...", "Cancel", 0, len(jobs), self)
+        self._import_progress.setWindowModality(QtCore.Qt.WindowModal)
+        self._import_progress.setMinimumDuration(500)
+
+        self._import_thread = QtCore.QThread()
+        self._import_worker = ImportWorker(self.lib, jobs, h5_path, is_force)
+        self._import_worker.moveToThread(self._import_thread)
+        self._import_thread.started.connect(self._import_worker.run)
+        self._import_worker.progress.connect(self._import_on_progress)
+        self._import_worker.imported.connect(self._import_on_imported)
+        self._import_worker.failed.connect(self._import_on_failed)
+        self._import_worker.finished.connect(self._import_on_finished)
+        # Called directly, the worker is busy and won't handle queued calls.
+        self._import_progress.canceled.connect(
+            self._import_worker.cancel, QtCore.Qt.DirectConnection)
+        self._import_thread.start()
+
+    @QtCore.pyqtSlot(int, int)
+    def _import_on_progress(self, done, total):
+        self._import_progress.setValue(done)
+        self.statusBar().showMessage(
+            "Imported {0}/{1} files.".format(done, total))
+
+    @QtCore.pyqtSlot(str)
+    def _import_on_imported(self, name):
+        item = self._import_item
+        ch_text_l = [item.child(i).text(0) for i in range(item.childCount())]
+        if name in ch_text_l:
             return
+        self.ui.treeWidget.blockSignals(True)
+        new_item = QtWidgets.QTreeWidgetItem(item, [name])
+        new_item.setFlags(new_item.flags() | QtCore.Qt.ItemIsEditable)
+        self.ui.treeWidget.blockSignals(False)
 
-        # Refresh lib.
-        logging.debug("Refreshing lib...")
-        if is_duplicate:
-            pass
-        elif is_data == 0:
-            QtWidgets.QTreeWidgetItem(
-                self.ui.treeWidget.currentItem().parent(), [name])
-        elif is_data == 1:
-            QtWidgets.QTreeWidgetItem(
-                self.ui.treeWidget.currentItem(), [name])
-        else:
-            raise IndexError
+    @QtCore.pyqtSlot(str, str)
+    def _import_on_failed(self, file, msg):
+        self._import_err_l.append("{0}: {1}".format(file, msg))
+
+    @QtCore.pyqtSlot()
+    def _import_on_finished(self):
+        self._import_thread.quit()
+        self._import_thread.wait()
+        self._import_progress.reset()
+        self._import_thread = None
+        del self._import_worker
+        logging.debug("Import finished.")
+        if self._import_err_l:
+            self._error = QtWidgets.QErrorMessage(self)
+            self._error.setWindowModality(QtCore.Qt.WindowModal)
+            self._error.showMessage("<br>".join(self._import_err_l))
 
     def tree_view_open_menu(self, position):
         sub_menu = SubMenu(self)
@@ -564,21 +736,25 @@ class ProgramInterface(QtWidgets.QMainWindow):
             event.setDropAction(QtCore.Qt.CopyAction)
             event.accept()
 
+            raw_file_names = []
+            is_strict = True
             for url in event.mimeData().urls():
                 dropped_str = str(url.toLocalFile())
                 if os.path.isdir(dropped_str):
+                    is_strict = False
                     for path, sub_dirs, files in os.walk(dropped_str):
                         for filename in files:
-                            self._save_data(os.path.join(path, filename))
+                            raw_file_names.append(
+                                os.path.join(path, filename))
                 elif os.path.isfile(dropped_str):
-                    self._save_data(dropped_str)
+                    raw_file_names.append(dropped_str)
                 else:
                     self._error = QtWidgets.QErrorMessage(self)
                     self._error.setWindowModality(QtCore.Qt.WindowModal)
                     self._error.showMessage(
                         "Please choose a directory or a file.")
                     return
-                self._init_lib()
+            self._import_data(raw_file_names, is_strict=is_strict)
         else:
             event.ignore()
 
@@ -600,14 +776,10 @@ class ProgramInterface(QtWidgets.QMainWindow):
             raise TypeError("Function only accept str type.")
         _, extension = os.path.splitext(file)
         try:
-            reader_name = self.cfg['TYPE_DICT'][extension]
+            reader = self.registry.get_class(extension)()
         except KeyError:
             raise TypeError("Unknown Type. \
             Please confirm this type is supported by at least one module.")
-
-        _tmp = __import__('module', globals(), locals(), [reader_name], 0)
-
-        reader = getattr(getattr(_tmp, reader_name), reader_name)()
         reader.get_file(file)
 
         logging.debug("Successfully read file {0}.".format(file))
@@ -630,7 +802,7 @@ class ProgramInterface(QtWidgets.QMainWindow):
             raise TypeError("Function only accept str type.")
         print(proc_type)
         try:
-            processor = self.cfg['TYPE_DICT'][proc_type]
+            processor = self.registry.get_class(proc_type)(_widget_title)
         except KeyError:
             logging.error("Unknown Type " + proc_type)
             raise TypeError(
@@ -638,13 +810,10 @@ class ProgramInterface(QtWidgets.QMainWindow):
                 "Please confirm this type is supported by at least one module."
             )
 
-        _tmp = __import__('module', globals(), locals(), [processor], 0)
-
-        processor = getattr(getattr(_tmp, processor), processor)(_widget_title)
         processor.set_data(
             self.lib.fh[h5_path],
             self.lib.fh[h5_path].attrs,
-            self.cfg[MODULE_G][self.cfg['TYPE_DICT'][proc_type]],
+            self.cfg[MODULE_G].get(self.registry.get_name(proc_type), {}),
         )
 
         logging.debug("Successfully read file...")
@@ -714,23 +883,21 @@ class ProgramInterface(QtWidgets.QMainWindow):
     def _h52item(self, h5_s):
         """Get the corresponding h5 path of a qTreeItem
 
+        The groups along the path are read if they are not yet.
+
         :param h5: The h5 path
         :return: Corresponding qTreeItem path
         """
-        text_l = h5_s.split('/')
-        root = self.ui.treeWidget.invisibleRootItem()
-        items = self.ui.treeWidget.findItems(
-            text_l[-1],
-            QtCore.Qt.MatchContains | QtCore.Qt.MatchRecursive,
-            0
-        )
-        text_l.pop()
-        for i in items:
-            p_item = i.parent() or root
-            if self._item2h5(p_item) == '/'.join(text_l):
-                return i
+        item = self.ui.treeWidget.topLevelItem(0)
+        for text in (i for i in h5_s.split('/') if i):
+            self._populate_item(item)
+            for j in range(item.childCount()):
+                if item.child(j).text(0) == text:
+                    item = item.child(j)
+                    break
             else:
-                pass
+                return None
+        return item
 
     def closeEvent(self, *args, **kwargs):
         self._write_cfg()
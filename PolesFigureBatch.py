@@ -0,0 +1,185 @@
+"""Micro-twin volume fractions of the poles figures of libraries, without GUI.
+
+Example:
+    python PolesFigureBatch.py lib.h5 -p "campaign/*" -o fractions.csv
+
+Each poles figure data set of the HDF5 libraries (optionally only those
+whose path matches one of the patterns) is gridded, its four micro-twin
+peaks are searched and integrated in a process pool as PolesFigureProc does,
+and the intensities and volume fractions of all of them are written to one
+CSV table.
+"""
+import argparse
+import csv
+import fnmatch
+import logging
+import os
+import sys
+from concurrent import futures
+
+import numpy as np
+
+from module.H5File import INDEX_GROUP
+from module.engine.BackgroundEngine import BK_METHODS
+from module.engine.PolesFigureEngine import PolesFigureEngine
+
+PF_TYPE = 'PolesFigurePlot'
+# Groups of the library which do not hold samples.
+SKIPPED_GROUPS = (INDEX_GROUP, 'Recipe')
+# Order of the peaks returned by the peak search.
+MT_LABELS = ('MT-A', 'MT-D', 'MT-C', 'MT-B')
+
+
+def find_data_sets(h5_file, patterns=None):
+    """List the poles figure data sets of a library.
+
+    The data sets linked several times are listed under each of their
+    paths, as each path is a sample of the library.
+    :param h5_file: The path of the library.
+    :param patterns: list of fnmatch patterns of the paths, all if None.
+    :return: Sorted list of the paths.
+    """
+    import h5py
+
+    paths = []
+
+    def walk(grp):
+        for name, item in grp.items():
+            if isinstance(item, h5py.Group):
+                if name not in SKIPPED_GROUPS:
+                    walk(item)
+            elif item.attrs.get('TYPE') == PF_TYPE:
+                paths.append(grp.name.rstrip('/') + '/' + name)
+
+    with h5py.File(h5_file, 'r') as fh:
+        walk(fh)
+    if patterns:
+        paths = [
+            i for i in paths
+            if any(fnmatch.fnmatch(i.lstrip('/'), j.lstrip('/'))
+                   for j in patterns)]
+    return sorted(paths)
+
+
+def process_data_set(h5_file, path, thickness, beam_int, sq_sz=(16, 16),
+                     bk_method="Mode"):
+    """Integrate the micro-twin peaks of one poles figure.
+
+    :param h5_file: The path of the library.
+    :param path: The path of the data set in the library.
+    :param thickness: The thickness of the sample (Angstrom).
+    :param beam_int: The beam intensity.
+    :param sq_sz: The size of the integration squares.
+    :param bk_method: The background estimator, see BK_METHODS.
+    :return: dict, a row of the result table.
+    """
+    import h5py
+
+    with h5py.File(h5_file, 'r') as fh:
+        data = fh[path][()]
+        attr = dict(fh[path].attrs)
+
+    engine = PolesFigureEngine(data, attr)
+    int_vsot_bg_m, ind_l, _ = engine.sq_pk_integrate(
+        list(sq_sz), bk_method=bk_method)
+    v = abs(float(attr['VIT_ANGLE']))
+    _, volume_fraction_matrix = engine.int2fraction(
+        int_vsot_bg_m, ind_l, thickness, beam_int, v)
+
+    row = {
+        'Library': h5_file,
+        'Data set': path,
+        'Background': engine.background_intensity(bk_method),
+    }
+    for label, i, f, (phi, chi) in zip(
+            MT_LABELS, int_vsot_bg_m, volume_fraction_matrix, ind_l):
+        row['Int ' + label] = i
+        row['VF ' + label] = f
+        row['Phi ' + label] = phi
+        row['Chi ' + label] = chi
+    row['Int MT'] = np.sum(int_vsot_bg_m)
+    row['VF MT'] = np.sum(volume_fraction_matrix)
+    return row
+
+
+def columns():
+    """The columns of the result table."""
+    res = ['Library', 'Data set', 'Background']
+    for i in ('Int', 'VF', 'Phi', 'Chi'):
+        res += ['{0} {1}'.format(i, j) for j in MT_LABELS]
+        if i in ('Int', 'VF'):
+            res.append('{0} MT'.format(i))
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Micro-twin volume fractions of the poles figures of "
+                    "HDF5 libraries, without GUI.")
+    parser.add_argument('libraries', nargs='+', help="HDF5 libraries.")
+    parser.add_argument(
+        '-p', '--path', nargs='+', default=None,
+        help="Patterns of the data set paths, e.g. \"campaign/*\".")
+    parser.add_argument(
+        '-o', '--output', default="fractions.csv", help="Output CSV file.")
+    parser.add_argument(
+        '-t', '--thickness', type=float, default=900.,
+        help="Thickness of the samples (Angstrom).")
+    parser.add_argument(
+        '-b', '--beam-int', type=float, default=100000.,
+        help="Beam intensity.")
+    parser.add_argument(
+        '-s', '--square', type=int, nargs=2, default=(16, 16),
+        metavar=('SX', 'SY'), help="Size of the integration squares.")
+    parser.add_argument(
+        '--bk-method', default="Mode", choices=list(BK_METHODS),
+        help="Background estimation.")
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=os.cpu_count(),
+        help="Number of processes, default to the number of CPUs.")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    tasks = [
+        (i, j) for i in args.libraries for j in find_data_sets(i, args.path)]
+    if not tasks:
+        logging.error("No poles figure found.")
+        return 1
+
+    rows = {}
+    n_failed = 0
+    with futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        future_d = {
+            executor.submit(
+                process_data_set, i, j, args.thickness, args.beam_int,
+                args.square, args.bk_method): (i, j)
+            for (i, j) in tasks
+        }
+        for future in futures.as_completed(future_d):
+            try:
+                rows[future_d[future]] = future.result()
+            except Exception as e:
+                n_failed += 1
+                logging.error("{0}:{1}: {2}".format(*future_d[future], e))
+            else:
+                logging.info("{0}:{1} done.".format(*future_d[future]))
+
+    with open(args.output, 'w', newline='') as fp:
+        writer = csv.DictWriter(
+            fp, fieldnames=columns(), dialect='excel', delimiter=";")
+        writer.writeheader()
+        for i in tasks:
+            if i in rows:
+                writer.writerow(rows[i])
+
+    logging.info("{0}/{1} poles figures written to {2}.".format(
+        len(rows), len(tasks), args.output))
+    return 1 if n_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Transform RSM files to the Q space without GUI.
+
+Example:
+    python RSMBatch.py data/ "campaign/**/*.raw" -o rsm_out -f h5 -i png
+
+Each RSM file found in the inputs (files, directories or glob patterns) is
+regridded in a process pool, the Qx/Qz axes and the intensity are written
+to <output>/<name>.npz or .h5, and the map is rendered to <output>/<name>.png
+unless "--image none". <name> is the path of the file relative to the
+directory searched, or to the fixed part of the glob pattern, so the files
+of different sub directories do not overwrite each other.
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+from collections import Counter
+from concurrent import futures
+
+import numpy as np
+
+from module.engine.RSMEngine import RSM_MODES, rsm_regrid
+
+SUPP_TYPE = (".raw", ".uxd")
+
+
+def find_inputs(inputs):
+    """Expand the input files, directories and glob patterns.
+
+    :param inputs: list of str.
+    :return: Sorted list of (file, name) of the supported files, without
+    duplicates. name is the path of the file relative to the directory
+    searched, without extension.
+    """
+    files = {}
+    for i in inputs:
+        if os.path.isdir(i):
+            for path, sub_dirs, file_names in os.walk(i):
+                for j in file_names:
+                    file = os.path.join(path, j)
+                    files.setdefault(file, os.path.relpath(file, i))
+        elif os.path.isfile(i):
+            files.setdefault(i, os.path.basename(i))
+        else:
+            parts = i.replace('\\', '/').split('/')
+            fixed = []
+            for part in parts[:-1]:
+                if glob.has_magic(part):
+                    break
+                fixed.append(part)
+            root = '/'.join(fixed) or os.curdir
+            for file in glob.glob(i, recursive=True):
+                files.setdefault(file, os.path.relpath(file, root))
+    return sorted(
+        (i, os.path.splitext(j)[0]) for (i, j) in files.items()
+        if os.path.splitext(i)[1].lower() in SUPP_TYPE)
+
+
+def find_files(inputs):
+    """The supported files of the inputs, see find_inputs."""
+    return [i for i, _ in find_inputs(inputs)]
+
+
+def read_type(file):
+    """The TYPE of a data file read from its headers only, None if the
+    reader has to read the whole file."""
+    if os.path.splitext(file)[1].lower() != ".raw":
+        return None
+    from module.RawFile import RawFile
+    reader = RawFile()
+    reader.get_file(file)
+    return reader.get_header().get('TYPE')
+
+
+def read_file(file):
+    """Read a data file with the reader of its extension."""
+    if os.path.splitext(file)[1].lower() == ".uxd":
+        from module.UxdFile import UxdFile as Reader
+    else:
+        from module.RawFile import RawFile as Reader
+    reader = Reader()
+    reader.get_file(file)
+    return reader.get_data()
+
+
+def save_image(file, xi, yi, zi, extent):
+    """Render the map as RSMProc does, without pyplot."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.colors import LogNorm
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 10))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    im = ax.imshow(
+        zi, origin='lower', norm=LogNorm(10, 100), extent=list(extent))
+    ax.set_xlabel("$Q_x$ ($Å^{-1}$)", fontsize=16)
+    ax.set_ylabel("$Q_z$ ($Å^{-1}$)", fontsize=16)
+    ax.tick_params(labelsize=16)
+    cb = figure.colorbar(
+        im, ax=ax, format="%.2e", extend='max', pad=.015, fraction=.039)
+    cb.ax.tick_params(labelsize=16)
+    cb.set_label(r'Intensity $(Counts\ per\ second)$', fontsize=16)
+    figure.savefig(file, dpi=200, bbox_inches='tight')
+
+
+def process_file(file, output, data_format="npz", image="png",
+                 mode=RSM_MODES[0], omega_shift=0., name=None):
+    """Transform one RSM file and write the results.
+
+    :param file: The path of the RSM file.
+    :param output: The output directory.
+    :param data_format: "npz" or "h5".
+    :param image: The image extension, "none" for no image.
+    :param mode: "Triangulation" or "Structured", see rsm_regrid.
+    :param omega_shift: Subtracted from omega (deg).
+    :param name: The output path relative to output, without extension,
+    the file name by default.
+    :return: list of the written files, empty if the file is not a RSM.
+    """
+    if read_type(file) not in (None, 'RSMPlot'):
+        return []
+    data, attr = read_file(file)
+    if attr.get('TYPE') != 'RSMPlot':
+        return []
+
+    xi, yi, zi, extent = rsm_regrid(
+        data, attr['TWOTHETA'], attr['OMEGA'], attr['PHI'],
+        omega_shift=omega_shift, method=mode)
+
+    if name is None:
+        name = os.path.splitext(os.path.basename(file))[0]
+    name = os.path.join(output, name)
+    os.makedirs(os.path.dirname(name), exist_ok=True)
+    written = []
+    if data_format == "h5":
+        import h5py
+        with h5py.File(name + ".h5", 'w') as fh:
+            for k, v in (('x', xi), ('y', yi), ('z', zi)):
+                fh.create_dataset(k, data=v, compression="lzf")
+            fh.attrs['source'] = os.path.abspath(file)
+            fh.attrs['OMEGA_SHIFT'] = omega_shift
+            fh.attrs['RSM_MODE'] = mode
+        written.append(name + ".h5")
+    else:
+        np.savez(name + ".npz", x=xi, y=yi, z=zi)
+        written.append(name + ".npz")
+    if image != "none":
+        save_image(name + "." + image, xi, yi, zi, extent)
+        written.append(name + "." + image)
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Transform RSM files to the Q space without GUI.")
+    parser.add_argument(
+        'inputs', nargs='+',
+        help="RSM files, directories or glob patterns (.raw, .uxd).")
+    parser.add_argument(
+        '-o', '--output', default="rsm_out", help="Output directory.")
+    parser.add_argument(
+        '-f', '--format', default="npz", choices=("npz", "h5"),
+        help="Format of the Qx/Qz/intensity arrays.")
+    parser.add_argument(
+        '-i', '--image', default="png",
+        help='Extension of the rendered image, "none" to skip it.')
+    parser.add_argument(
+        '-m', '--mode', default=RSM_MODES[0], choices=RSM_MODES[:2],
+        help="Regridding method.")
+    parser.add_argument(
+        '--omega-shift', type=float, default=0., help="Omega shift (deg).")
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=os.cpu_count(),
+        help="Number of processes, default to the number of CPUs.")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    files = find_inputs(args.inputs)
+    if not files:
+        logging.error("No RSM file found.")
+        return 1
+    names = Counter(os.path.normcase(j) for _, j in files)
+    duplicates = sorted(i for i, n in names.items() if n > 1)
+    if duplicates:
+        logging.error("Different files would be written to {0}.".format(
+            ", ".join(duplicates)))
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    n_failed = 0
+    n_skipped = 0
+    with futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        future_d = {
+            executor.submit(
+                process_file, i, args.output, args.format, args.image,
+                args.mode, args.omega_shift, j): i
+            for (i, j) in files
+        }
+        for future in futures.as_completed(future_d):
+            try:
+                written = future.result()
+            except Exception as e:
+                n_failed += 1
+                logging.error("{0}: {1}".format(future_d[future], e))
+            else:
+                if not written:
+                    n_skipped += 1
+                    logging.info("{0}: skipped, not a RSM.".format(
+                        future_d[future]))
+                else:
+                    logging.info("{0} -> {1}".format(
+                        future_d[future], ", ".join(written)))
+
+    logging.info("{0}/{1} files transformed.".format(
+        len(files) - n_failed - n_skipped, len(files)))
+    return 1 if n_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
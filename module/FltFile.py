@@ -32,30 +32,33 @@ class FltFile(FileModule):
     def get_data(self):
         logging.debug("Transform data to ndarray...")
         with open(self.file, 'rb') as fp:
-            try_head = fp.read(500)
-            try_scan_dict = self.decode_head(try_head)
-            fp.seek(0, 0)
-            stuck_size = (
-                    int(try_scan_dict['ResolutionX']) *
-                    int(try_scan_dict['ResolutionY']) *
-                    4
-            )
-            head = fp.read()[0: -stuck_size]
-
-            attr = self.decode_head(head)
-
-            attr['Type'] = 'raw_afm'
-
-            fp.seek(0, 0)
-            raw_data = fp.read()[-stuck_size:]
-
-            import struct
-
-            unpacked_data_l = [struct.unpack('f', raw_data[k:k + 4])
-                               for k in range(0, len(raw_data), 4)]
-            data = [i[0] for i in unpacked_data_l]
-            data = np.asarray(data).reshape(
-                int(attr['ResolutionX']),
-                int(attr['ResolutionY']))
+            content = fp.read()
+
+        # The header is decoded line by line, once, until the image which
+        # fills the end of the file.
+        attr = {}
+        stuck_size = None
+        pos = 0
+        end = len(content)
+        while pos < end:
+            line_end = content.find(b'\r\n', pos, end)
+            if line_end < 0:
+                line_end = end
+            attr.update(self.decode_head(content[pos:line_end]))
+            pos = line_end + 2
+            if stuck_size is None and {'ResolutionX', 'ResolutionY'} <= set(
+                    attr):
+                res_x = int(attr['ResolutionX'])
+                res_y = int(attr['ResolutionY'])
+                stuck_size = res_x * res_y * 4
+                end = len(content) - stuck_size
+        if stuck_size is None:
+            raise Exception("No resolution in the header.")
+
+        attr['Type'] = 'raw_afm'
+
+        data = np.frombuffer(
+            content, dtype='<f4', offset=len(content) - stuck_size
+        ).reshape(res_x, res_y).astype(np.float64)
 
         return data, attr
@@ -1,9 +1,53 @@
+import hashlib
 import logging
 
 import numpy
 
 from module.Module import FileModule
 
+# Storage profile of each data TYPE.
+# chunks: "rows" to chunk along whole rows of the data, i.e. whole omega
+# scans of a RSM and whole chi rings of a poles figure, True to let h5py
+# guess, None for contiguous storage.
+# compression: None, "lzf" or "gzip" with compression_opts the level.
+# shuffle: Apply the byte shuffle filter before compression.
+STORAGE_PROFILES = {
+    'default': {
+        'chunks': True, 'compression': "gzip", 'compression_opts': None,
+        'shuffle': False},
+    'RSMPlot': {
+        'chunks': "rows", 'compression': "lzf", 'compression_opts': None,
+        'shuffle': False},
+    'PolesFigurePlot': {
+        'chunks': "rows", 'compression': "lzf", 'compression_opts': None,
+        'shuffle': True},
+    'raw_afm': {
+        'chunks': "rows", 'compression': "gzip", 'compression_opts': 1,
+        'shuffle': True},
+    'SingleScan': {
+        'chunks': None, 'compression': None, 'compression_opts': None,
+        'shuffle': False},
+    'RockingCurve': {
+        'chunks': None, 'compression': None, 'compression_opts': None,
+        'shuffle': False},
+}
+# Target size of a chunk in bytes for the "rows" layout.
+CHUNK_BYTES = 256 * 1024
+
+# Hidden group of the library holding a hard link to every imported data,
+# named by the content hash of the data set. The later imports of the same
+# data are virtual data sets mapping it, with their own attributes.
+INDEX_GROUP = ".index"
+# Attribute of the imported data sets holding their key in the index. The
+# attribute of the same key on the index group counts the virtual data sets
+# mapping the entry.
+INDEX_KEY = "_INDEX_KEY"
+# Attributes identifying a scan besides its intensities.
+HASH_KEYS = (
+    'TYPE', 'STEPPING_DRIVE1', 'STEPPING_DRIVE2', 'STEP_TIME', 'STEP_SIZE',
+    'OMEGA', 'TWOTHETA', 'KHI', 'PHI', 'DRV_1', 'DRV_2',
+)
+
 
 class H5File(FileModule):
     """The module to support H5File.
@@ -29,16 +73,75 @@ class H5File(FileModule):
     def get_data(self):
         pass
 
+    @staticmethod
+    def get_profile(attr, profile=None):
+        """Get the storage profile of the data.
+
+        :param attr: The attributes of the data, its TYPE select the profile.
+        :param profile: The name of a profile in STORAGE_PROFILES or a dict,
+        overwrite the choice by TYPE.
+        :return: dict
+        """
+        if profile is None:
+            profile = attr.get('TYPE', 'default')
+        if isinstance(profile, str):
+            profile = STORAGE_PROFILES.get(
+                profile, STORAGE_PROFILES['default'])
+        return dict(STORAGE_PROFILES['default'], **profile)
+
+    @staticmethod
+    def chunk_shape(shape, itemsize, chunks):
+        """Get the chunks argument of create_dataset.
+
+        :param shape: The shape of the data.
+        :param itemsize: The size in bytes of an element.
+        :param chunks: The chunks of a storage profile.
+        :return: tuple, True or None
+        """
+        if chunks != "rows":
+            return chunks
+        if len(shape) < 2 or not all(shape):
+            return True
+        row_bytes = int(numpy.prod(shape[1:])) * itemsize
+        rows = min(shape[0], max(1, CHUNK_BYTES // row_bytes))
+        return (rows,) + tuple(shape[1:])
+
+    @staticmethod
+    def content_hash(data, attr):
+        """Hash the data with the attributes identifying the scan.
+
+        :param data: ndarray
+        :param attr: The attributes, only the HASH_KEYS are used.
+        :return: str, hex digest
+        """
+        sha = hashlib.sha1()
+        data = numpy.ascontiguousarray(data)
+        sha.update("{0}{1}".format(data.dtype.str, data.shape).encode())
+        sha.update(data.data)
+        for k in HASH_KEYS:
+            if k in attr:
+                value = numpy.ascontiguousarray(attr[k])
+                sha.update("{0}{1}{2}".format(
+                    k, value.dtype.str, value.shape).encode())
+                sha.update(value.data)
+        return sha.hexdigest()
+
     def set_data(self, data, attr, *args, **kwargs):
         """
 
         :param data:
         :param attr:
+        :param profile: Optional, the storage profile, see get_profile.
+        :param is_dedup: Optional, default True. If the same data is already
+        in the library, a virtual data set mapping it is created instead of a
+        copy. Only the data is shared, each data set has its attributes.
         :return:
         """
         path = kwargs['path']
         name = kwargs['name']
         is_force = kwargs['is_force'] if 'is_force' in kwargs else False
+        profile = self.get_profile(attr, kwargs.get('profile'))
+        is_dedup = kwargs['is_dedup'] if 'is_dedup' in kwargs else True
         if isinstance(data, numpy.ndarray):
             logging.debug("This is a numpy array instant.")
             if isinstance(self.fh[path], self.h5py.Dataset):
@@ -50,16 +153,25 @@ class H5File(FileModule):
 
             if name in grp and isinstance(grp[name], self.h5py.Dataset):
                 if is_force:
-                    del grp[name]
+                    self.delete(grp[name].name)
                 else:
                     raise FileExistsError
 
-            dt = grp.create_dataset(
-                name,
-                data=data,
-                chunks=True,
-                compression="gzip",
-            )
+            dt = None
+            if is_dedup:
+                key = self.content_hash(data, attr)
+                index = self.fh.require_group(INDEX_GROUP)
+                if key in index:
+                    logging.debug("Mapping the same data {0}.".format(
+                        index[key].name))
+                    dt = self._create_virtual(grp, name, index[key])
+                    index.attrs[key] = index.attrs.get(key, 0) + 1
+
+            if dt is None:
+                dt = self._create_dataset(grp, name, data, profile)
+                if is_dedup:
+                    index[key] = dt
+                    dt.attrs[INDEX_KEY] = key
 
             for i in attr.keys():
                 logging.debug("Writing {0}: {1}".format(i, attr[i]))
@@ -67,9 +179,12 @@ class H5File(FileModule):
                 try:
                     if isinstance(attr[i], numpy.ndarray):
                         dt.attrs.create(i, data=attr[i])
+                    elif isinstance(attr[i], str):
+                        # Fixed size fields of raw files are null padded.
+                        dt.attrs[i] = attr[i].rstrip('\x00')
                     else:
                         dt.attrs[i] = attr[i]
-                except TypeError:
+                except (TypeError, ValueError):
                     logging.debug("Fail to write {0}: {1}".format(i, attr[i]))
 
         else:
@@ -77,6 +192,77 @@ class H5File(FileModule):
                 "Unknown input data type."
                 "Only ndarray could be written into h5file")
 
+    def _create_dataset(self, grp, name, data, profile):
+        """A data set of grp stored with the storage profile."""
+        is_filtered = profile['compression'] or profile['shuffle']
+        chunks = self.chunk_shape(
+            data.shape, data.dtype.itemsize, profile['chunks'])
+        if is_filtered and chunks is None:
+            chunks = True
+        return grp.create_dataset(
+            name,
+            data=data,
+            chunks=chunks,
+            compression=profile['compression'],
+            compression_opts=profile['compression_opts'],
+            shuffle=profile['shuffle'],
+        )
+
+    def _create_virtual(self, grp, name, source):
+        """A data set of grp mapping the whole source data set."""
+        layout = self.h5py.VirtualLayout(source.shape, source.dtype)
+        layout[...] = self.h5py.VirtualSource(
+            '.', source.name, source.shape, source.dtype)
+        return grp.create_virtual_dataset(name, layout)
+
+    def delete(self, path):
+        """Delete a data set or a group of the library, with the
+        deduplicated data which is no longer used.
+        """
+        keys = self._index_keys(path)
+        del self.fh[path]
+        self._release(keys)
+
+    def _index_keys(self, path):
+        """The index entries used by the data sets under path, as a list of
+        (key, is_virtual). Only the deleted tree is visited.
+        """
+        if isinstance(self.fh.get(path, getlink=True), self.h5py.SoftLink):
+            return []
+        item = self.fh[path]
+        if isinstance(item, self.h5py.Group):
+            return [
+                i for name in item
+                for i in self._index_keys(item.name + '/' + name)]
+        if item.is_virtual:
+            prefix = "/{0}/".format(INDEX_GROUP)
+            return [
+                (i.dset_name[len(prefix):], True)
+                for i in item.virtual_sources()
+                if i.dset_name.startswith(prefix)]
+        if INDEX_KEY in item.attrs:
+            return [(item.attrs[INDEX_KEY], False)]
+        return []
+
+    def _release(self, keys):
+        """Remove the index entries of keys neither linked outside the index
+        nor mapped by a virtual data set.
+        """
+        if not keys or INDEX_GROUP not in self.fh:
+            return
+        index = self.fh[INDEX_GROUP]
+        for key, is_virtual in keys:
+            if is_virtual and key in index.attrs:
+                index.attrs[key] -= 1
+            if key not in index:
+                continue
+            if (self.h5py.h5o.get_info(index[key].id).rc <= 1 and
+                    not index.attrs.get(key, 0)):
+                logging.debug("Removing the unused data {0}.".format(key))
+                del index[key]
+                if key in index.attrs:
+                    del index.attrs[key]
+
             # def get_recipe_plot(self):
             #     """
             #     Plot recipe in current axis.
@@ -7,9 +7,6 @@ from functools import partial
 import numpy
 import numpy as np
 from PyQt5 import QtCore, QtWidgets, QtGui
-from matplotlib import pyplot as plt
-from matplotlib.backends.backend_qt5agg import (
-    FigureCanvasQTAgg as FigureCanvas)
 
 
 class Module(QtCore.QObject):
@@ -168,6 +165,8 @@ class ProcModule(Module):
         event.accept()
 
     def _build_plot_widget(self):
+        from matplotlib.backends.backend_qt5agg import (
+            FigureCanvasQTAgg as FigureCanvas)
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setSizePolicy(QtWidgets.QSizePolicy.Expanding,
                                   QtWidgets.QSizePolicy.Expanding)
@@ -235,6 +234,7 @@ class ProcModule(Module):
         pass
 
     def save_image(self):
+        from matplotlib import pyplot as plt
         plt.figure(self.figure.number)
         tp_d = self.figure.canvas.get_supported_filetypes()
         filter_s = ";;".join(["{0} (*.{1})".format(tp_d[i], i) for i in tp_d])
@@ -267,6 +267,7 @@ class ProcModule(Module):
             pass
 
     def save_to_clipboard(self):
+        from matplotlib import pyplot as plt
         plt.figure(self.figure.number)
         buf = io.BytesIO()
         plt.savefig(buf)
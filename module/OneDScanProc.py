@@ -7,6 +7,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 from PyQt5 import QtCore, QtGui, QtWidgets
 from module.Module import ProcModule
+from module.engine.OneDScanEngine import (
+    FUN_DICT, OneDScanEngine, gaussian_func, lorentzian_func,
+    pseudo_voigt_func, voigt_func)
 
 
 class OneDScanProc(ProcModule):
@@ -160,72 +163,30 @@ class OneDScanProc(ProcModule):
 
     def set_data(self, data, attr, *args, **kwargs):
         super(OneDScanProc, self).set_data(data, attr, *args, **kwargs)
-        x = data[0, :][~np.isnan(data[1, :])]
-        y = data[1, :][~np.isnan(data[1, :])]
-        self.data = np.vstack((x, y))
+        self.data = OneDScanEngine(data).data
         self.attr = attr
 
         return self
 
     @property
-    def fun_dict(self):
-        return {
-            'pseudo voigt': self.pseudo_voigt_func,
-            'voigt': self.voigt_func,
-            'lorentz': self.lorentzian_func,
-            'gaussian': self.gaussian_func,
-        }
-
-    @staticmethod
-    def gaussian_func(x, alpha, x0=0):
-        """ Return Gaussian line shape at x with HWHM alpha """
-        return np.sqrt(np.log(2) / np.pi) / alpha * np.exp(
-            -((x - x0) / alpha)**2 * np.log(2))
-
-    @staticmethod
-    def lorentzian_func(x, gamma, x0=0):
-        """ Return Lorentzian line shape at x with HWHM gamma """
-        return gamma / np.pi / ((x - x0)**2 + gamma**2)
-
-    @staticmethod
-    def voigt_func(x, alpha, gamma, x0=0):
-        from scipy.special._ufuncs import wofz
-        """
-        Return the Voigt line shape at x with Lorentzian component HWHM
-        gamma and Gaussian component HWHM alpha.
-        """
-        sigma = alpha / np.sqrt(2 * np.log(2))
-        wofz_v = np.real(
-            wofz((((x - x0) - 14.22) + 1j * gamma) / sigma / np.sqrt(2)))
-
-        return wofz_v / sigma / np.sqrt(2 * np.pi)
-
-    @staticmethod
-    def pseudo_voigt_func(x, alpha, gamma, mu, x0=0):
-        def gaussian_func(x, alpha):
-            """ Return Gaussian line shape at x with HWHM alpha """
-            return np.sqrt(np.log(2) / np.pi) / alpha * np.exp(
-                -(x / alpha)**2 * np.log(2))
+    def _engine(self):
+        """The computation engine sharing the data of this processor."""
+        engine = OneDScanEngine()
+        engine.data = self.data
+        engine.attr = self.attr
+        return engine
 
-        def lorentzian_func(x, gamma):
-            """ Return Lorentzian line shape at x with HWHM gamma """
-            return gamma / np.pi / (x**2 + gamma**2)
+    @property
+    def fun_dict(self):
+        return FUN_DICT
 
-        return mu * gaussian_func(x - x0, alpha) + (
-            1 - mu) * lorentzian_func(x - x0, gamma)
+    gaussian_func = staticmethod(gaussian_func)
+    lorentzian_func = staticmethod(lorentzian_func)
+    voigt_func = staticmethod(voigt_func)
+    pseudo_voigt_func = staticmethod(pseudo_voigt_func)
 
     def _binning_data(self, bin_width=5):
-        from scipy.stats import binned_statistic
-
-        y, _, _ = binned_statistic(
-            self.data[0, :],
-            self.data[1, :],
-            statistic='median',
-            bins=int(np.floor(len(self.data[1, :]) / bin_width)))
-        x = self.data[0, :][::bin_width]
-        f = lambda a, b: (len(a) > len(b) and (a[:len(b)], b)) or (a, b[:len(a)])
-        (x, y) = f(x, y)
-        self.data = np.vstack((x, y))
+        self.data = self._engine.binning(bin_width)
         self.repaint(True)
 
     def _fit(self, fit_fun='pseudo voigt', is_plot=True):
@@ -233,40 +194,24 @@ class OneDScanProc(ProcModule):
         Fit the y data with selected function and plot.
         :return:
         """
-        from scipy.optimize import curve_fit
-        from functools import partial
         if not hasattr(self, 'data'):
             return
 
-        x = self.data[0, :]
-        y = self.data[1, :]
-
-        fit_fun = self.fun_dict[fit_fun]
-        x0 = self._x_shift_to_centre()
-        fit_fun = partial(fit_fun, x0=x0)
-        logging.debug("X shift value is %s" % -x0)
-
-        popt, pcov = curve_fit(fit_fun, x, y)
-        plt.figure(self.figure.number)
-
-        fun_max = fit_fun(0, *popt)
-        p = np.abs(fit_fun(x, *popt) - fun_max / 2).argsort()[:2]
-        fwhm = np.abs(self.data[0, :][p[0]] - self.data[0, :][p[1]])
-        extra_res = (fun_max, fwhm)
+        x, y_fit, extra_res = self._engine.fit(fit_fun)
 
         if is_plot:
             plt.figure(self.figure.number)
             if 'disable_log_y' in self.param and self.param['disable_log_y']:
                 plt.plot(
                     x,
-                    fit_fun(x, *popt),
+                    y_fit,
                     linewidth=1,
                     color='C3',
                 )
             else:
                 self.figure.axes[0].semilogy(
                     x,
-                    fit_fun(x, *popt),
+                    y_fit,
                     linewidth=1,
                     color='C1',
                 )
@@ -274,23 +219,14 @@ class OneDScanProc(ProcModule):
 
         self._recent_fit_res = extra_res
 
-        return x, fit_fun(x, *popt), extra_res
+        return x, y_fit, extra_res
 
     def _sum(self):
-        x = self.data[0, :]
-        y = self.data[1, :]
-        sum_val = 0
-        for idx, _ in enumerate(x):
-            if idx < len(x) - 1:
-                sum_val += (x[idx+1] - x[idx]) * (y[idx+1] + y[idx])/2
-
-        return sum_val
+        return self._engine.sum()
 
     def _filter(self):
         logging.debug("Butter Filter...")
-        from scipy import signal
-        arg = signal.butter(5, 0.1)
-        self.data[1, :] = signal.filtfilt(*arg, self.data[1, :], method="gust")
+        self._engine.filter()
         self.refresh_canvas.emit(True)
 
     def _on_press(self, event):
@@ -305,42 +241,19 @@ class OneDScanProc(ProcModule):
             if r_p < l_p:
                 l_p, r_p = r_p, l_p
             logging.debug("Selected peak from {0} to {1}".format(l_p, r_p))
-
-            def l_func(x_i, l_p_i, r_p_i):
-                y_l = self.data[1, :][np.abs(self.data[0, :] - l_p_i).argmin()]
-                y_r = self.data[1, :][np.abs(self.data[0, :] - r_p_i).argmin()]
-                return (y_r - y_l) / (r_p_i - l_p_i) * (x_i - l_p_i) + y_l
-
-            diff = np.asarray([l_func(x, l_p, r_p) for x in self.data[0, :]])
-
-            self.data[1, :] -= diff
-            self.data[1, :] -= self.data[1, :].min()
-            self.data[0, :] -= self.data[0, :][np.argmax(self.data[1, :])]
+            self._engine.baseline(l_p, r_p)
             self.refresh_canvas.emit(True)
 
             self.canvas.mpl_disconnect(self.cid_press)
             self._peak_side_point = []
 
     def _x_shift_to_centre(self):
-        return self.data[0, :][np.argmax(self.data[1, :])]
+        return self._engine.x_shift_to_centre()
 
-    def     _target(self, mode='auto', is_plot=True):
+    def _target(self, mode='auto', is_plot=True):
 
         if mode == 'auto':
-            rg = 50
-            l_p = self.data[0, :][rg]
-            r_p = self.data[0, :][-rg]
-
-            def l_func(x_i, l_p_i, r_p_i):
-                y_l = self.data[1, :][rg]
-                y_r = self.data[1, :][-rg]
-                return (y_r - y_l) / (r_p_i - l_p_i) * (x_i - l_p_i) + y_l
-
-            diff = np.asarray([l_func(x, l_p, r_p) for x in self.data[0, :]])
-
-            self.data[1, :] -= diff
-            self.data[1, :] -= self.data[1, :].min()
-            self.data[0, :] -= self._x_shift_to_centre()
+            self._engine.target()
             if is_plot:
                 self.refresh_canvas.emit(True)
         elif mode == 'manual':
@@ -348,14 +261,4 @@ class OneDScanProc(ProcModule):
                                                      self._on_press)
 
     def get_max(self, mode='direct'):
-        if mode == 'direct':
-            return np.max(self.data[1, :])
-        elif mode == 'fit':
-            self._target(is_plot=False)
-            _, _, extra_res = self._fit(fit_fun='pseudo_voigt', is_plot=0)
-            try:
-                step_time = self.attr['_STEPTIME']
-            except KeyError:
-                step_time = 1
-            intensity = extra_res[0] * extra_res[1] / step_time
-            return intensity
+        return self._engine.get_max(mode)
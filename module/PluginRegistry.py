@@ -0,0 +1,206 @@
+"""Discovery of the readers and processors of the module package.
+
+The plugin files are parsed, not imported, so that the discovery does not
+load Qt, matplotlib or scipy. A plugin is the class named as its file,
+which inherits from FileModule (reader) or ProcModule (processor), maybe
+through another plugin. Its name and supp_type are read from the string
+literals returned by the properties, the class name is used otherwise.
+
+The result is cached in a YAML file with the modification time of each
+plugin file, only the files changed since are parsed again.
+"""
+import ast
+import importlib
+import logging
+import os
+
+import yaml
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+READER = 'reader'
+PROCESSOR = 'processor'
+BASE_KIND = {'FileModule': READER, 'ProcModule': PROCESSOR}
+
+
+def parse_plugin(file):
+    """Read the plugin class of a module file without importing it.
+
+    :param file: The path of the .py file.
+    :return: dict with 'bases', 'name' and 'supp_type', None if the file
+    has no class named as the file.
+    """
+    cls_name = os.path.splitext(os.path.basename(file))[0]
+    with open(file, 'rb') as fh:
+        tree = ast.parse(fh.read(), filename=file)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == cls_name:
+            break
+    else:
+        return None
+
+    info = {
+        'bases': [
+            i.id if isinstance(i, ast.Name) else getattr(i, 'attr', '')
+            for i in node.bases],
+        'name': cls_name,
+        'supp_type': [],
+    }
+    for item in node.body:
+        if not (isinstance(item, ast.FunctionDef) and
+                item.name in ('name', 'supp_type')):
+            continue
+        returns = [i for i in item.body if isinstance(i, ast.Return)]
+        try:
+            value = ast.literal_eval(returns[0].value)
+        except (IndexError, ValueError, TypeError, SyntaxError):
+            logging.debug("{0}.{1} is not a literal.".format(
+                cls_name, item.name))
+            continue
+        if item.name == 'name' and isinstance(value, str):
+            info['name'] = value
+        elif item.name == 'supp_type':
+            info['supp_type'] = (
+                [value] if isinstance(value, str) else
+                [str(i) for i in value])
+
+    return info
+
+
+def load_plugin(plugin):
+    """Import the class of a plugin.
+
+    :param plugin: The module (and class) name, e.g. "RawFile".
+    """
+    return getattr(importlib.import_module('module.' + plugin), plugin)
+
+
+class PluginRegistry(object):
+    """The readers and processors, by extension and scan TYPE.
+
+    The plugin classes are imported when they are first asked for, then
+    kept.
+    """
+
+    def __init__(self, module_dir=MODULE_DIR, cache_file=None):
+        """
+        :param module_dir: The directory of the plugin files.
+        :param cache_file: The YAML cache of the discovery, not kept if
+        None.
+        """
+        self.module_dir = module_dir
+        self.cache_file = cache_file
+        self.plugins = {}
+        self._files = {}
+        self._types = {}
+        self._classes = {}
+
+    def scan(self):
+        """Discover the plugins, parse only the files changed since the
+        cached discovery.
+
+        :return: self
+        """
+        cache = {}
+        if self.cache_file and os.path.isfile(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as fh:
+                    cache = yaml.safe_load(fh) or {}
+            except (OSError, yaml.YAMLError) as e:
+                logging.warning("Ignore the plugin cache: {0}".format(e))
+
+        files = {}
+        is_changed = False
+        with os.scandir(self.module_dir) as it:
+            for entry in it:
+                stem, extension = os.path.splitext(entry.name)
+                if (extension != '.py' or not entry.is_file() or
+                        stem.startswith('_')):
+                    continue
+                mtime = entry.stat().st_mtime
+                cached = cache.get(stem)
+                if cached and cached['mtime'] == mtime:
+                    files[stem] = cached
+                    continue
+                is_changed = True
+                try:
+                    info = parse_plugin(entry.path)
+                except (OSError, SyntaxError) as e:
+                    logging.warning("Cannot parse {0}: {1}".format(
+                        entry.path, e))
+                    info = None
+                files[stem] = {'mtime': mtime, 'info': info}
+        is_changed = is_changed or set(files) != set(cache)
+
+        self._files = files
+        self._resolve()
+        if is_changed and self.cache_file:
+            try:
+                with open(self.cache_file, 'w') as fh:
+                    yaml.safe_dump(files, fh, default_flow_style=False)
+            except OSError as e:
+                logging.warning("Cannot write the plugin cache: {0}".format(e))
+
+        return self
+
+    def _resolve(self):
+        """Find the kind of each plugin class through its bases."""
+        infos = {k: v['info'] for k, v in self._files.items() if v['info']}
+
+        def kind(cls_name, seen=()):
+            if cls_name in BASE_KIND:
+                return BASE_KIND[cls_name]
+            if cls_name not in infos or cls_name in seen:
+                return None
+            for i in infos[cls_name]['bases']:
+                res = kind(i, seen + (cls_name,))
+                if res:
+                    return res
+            return None
+
+        self.plugins = {}
+        self._types = {}
+        for cls_name, info in infos.items():
+            plugin_kind = kind(cls_name)
+            if plugin_kind is None:
+                continue
+            self.plugins[cls_name] = dict(
+                info, kind=plugin_kind, supp_type=list(info['supp_type']))
+            for i in info['supp_type']:
+                self._types.setdefault(i, cls_name)
+
+    def add(self, file):
+        """Register a new plugin file of the module directory.
+
+        :return: The plugin information, None if it is not a plugin.
+        """
+        stem = os.path.splitext(os.path.basename(file))[0]
+        self._classes.pop(stem, None)
+        self.scan()
+        return self.plugins.get(stem)
+
+    def update_types(self, type_dict):
+        """Map extensions and scan types to plugins, overriding the
+        supp_type of the plugins, e.g. with TYPE_DICT of the config.
+
+        :param type_dict: dict of extension or TYPE: plugin name.
+        """
+        self._types.update(type_dict)
+
+    def get_name(self, supp_type):
+        """The plugin of an extension or a scan TYPE.
+
+        :raise KeyError: if no plugin supports it.
+        """
+        return self._types[supp_type]
+
+    def get_class(self, supp_type):
+        """The plugin class of an extension or a scan TYPE.
+
+        :raise KeyError: if no plugin supports it.
+        """
+        plugin = self._types[supp_type]
+        try:
+            return self._classes[plugin]
+        except KeyError:
+            cls = self._classes[plugin] = load_plugin(plugin)
+            return cls
@@ -10,8 +10,10 @@ import io
 from matplotlib.colors import LogNorm
 
 from module.Module import ProcModule
-from module.OneDScanProc import OneDScanProc
-from module.RawFile import RawFile
+from module.Widgets import IntensityInputWidget
+from module.engine.BackgroundEngine import BK_METHODS
+from module.engine.PolesFigureEngine import (
+    PolesFigureEngine, i_theory)
 
 RO2 = 7.94E-30
 LAMBDA = 1.5418E-10  # Cu-1 wavelength
@@ -56,11 +58,13 @@ class PolesFigureProc(ProcModule):
             ('SQUARE_SY', "16"),
             ('PHI_OFFSET', "0"),
             ('BEAM_INT', "100000"),
+            ('BK_METHOD', "Mode"),
         ])
 
         self.xi = None
         self.yi = None
         self._gridded_flag = False
+        self._engine = PolesFigureEngine()
 
         self._build_plot_widget()
 
@@ -186,6 +190,16 @@ class PolesFigureProc(ProcModule):
         )
         phi_offset_input_layout.addWidget(phi_offset_line_edit)
 
+        bk_method_input_layout = QtWidgets.QVBoxLayout()
+        bk_method_input_layout.addWidget(
+            QtWidgets.QLabel('Background estimation:'))
+        bk_method_combo_box = QtWidgets.QComboBox()
+        bk_method_combo_box.addItems(BK_METHODS)
+        bk_method_combo_box.setCurrentText(self.param['BK_METHOD'])
+        bk_method_combo_box.currentTextChanged.connect(
+            partial(self._upt_param, 'BK_METHOD'))
+        bk_method_input_layout.addWidget(bk_method_combo_box)
+
         config_layout.addWidget(advanced_selection_q_checkbox)
         config_layout.addWidget(polar_draw_q_checkbox)
         config_layout.addLayout(intensity_input_layout)
@@ -195,6 +209,7 @@ class PolesFigureProc(ProcModule):
         config_layout.addLayout(square_sx_input_layout)
         config_layout.addLayout(square_sy_input_layout)
         config_layout.addLayout(phi_offset_input_layout)
+        config_layout.addLayout(bk_method_input_layout)
 
         return config_widget
 
@@ -209,7 +224,6 @@ class PolesFigureProc(ProcModule):
 
     @QtCore.pyqtSlot(bool)
     def repaint(self, message):
-        from scipy.interpolate import griddata
         """
         This function is called when the canvas need repainting(including the
         first time painting).
@@ -223,40 +237,10 @@ class PolesFigureProc(ProcModule):
         except KeyError:
             v_min = 10
             v_max = 10000
-        try:
-            ver_min = int(self.attr['DRV_2'].min())
-            ver_max = int(self.attr['DRV_2'].max())
-            hor_min = int(self.attr['DRV_1'].min())
-            hor_max = int(self.attr['DRV_1'].max())
-            phi_offset = int(self.param['PHI_OFFSET'])
-        except KeyError:
-            ver_min = np.int64(self.attr['phi_min'])
-            ver_max = np.int64(self.attr['phi_max'])
-            hor_min = np.int64(self.attr['khi_min'])
-            hor_max = np.int64(self.attr['khi_max'])
-            phi_offset = np.int64(self.param['PHI_OFFSET'])
+        ver_min, ver_max, hor_min, hor_max = self._engine.limits
+        phi_offset = int(self.param['PHI_OFFSET'])
         plt.figure(self.figure.number)
-        h, v = self.data.shape
-        x = np.arange(ver_min, ver_max + 1, 1)
-        y = np.arange(hor_min, hor_max + 1, 1)
-
-        xx, yy = np.meshgrid(
-            x,
-            y,
-        )
-        x_r = np.linspace(ver_min, ver_max, v)
-        y_r = np.linspace(hor_min, hor_max, h)
-        xx_r, yy_r = np.meshgrid(
-            x_r,
-            y_r
-        )
-        self._gridded_data = griddata(
-            (xx_r.flatten(), yy_r.flatten()),
-            self.data.flatten(),
-            (xx, yy),
-            method='nearest',
-        )
-        logging.info("Gridded")
+        self._gridded_data = self._engine.grid()
 
         if self.param["POLAR_AXIS"]:
             ax2d = plt.gcf().add_subplot(111, polar=True)
@@ -339,6 +323,12 @@ class PolesFigureProc(ProcModule):
             'motion_notify_event', self.on_motion_show_data)
 
     # External methods.
+    def set_data(self, data, attr, *args, **kwargs):
+        super(PolesFigureProc, self).set_data(data, attr, *args, **kwargs)
+        self._engine.set_data(self.data, self.attr)
+
+        return self
+
     def plot(self):
         """Plot Image."""
         self.repaint("")
@@ -347,43 +337,7 @@ class PolesFigureProc(ProcModule):
 
         return self.plot_widget
 
-    @staticmethod
-    def i_theory(i_0, v, theta, omega, th, index):
-        """
-
-        :param i_0: The source intensity
-        :param v: angular velocity
-        :param theta: tth/2(emergence angle)
-        :param omega: omega(incident angle)
-        :param th: thickness of sample
-        :param index: correction coefficient
-        :return:
-        """
-        RO2 = 7.94E-30  # scattering cross section of electron
-        LAMBDA = 1.5418E-10  # X-ray beam length
-        F_GAP = 12684.62554  # unit cell structure factor (GaP)
-        L = 1 / np.sin(2 * theta)  # Lorentz factor
-        P = (1 + np.cos(2 * theta) ** 2) / 2  # Polarization factor
-        V_A = 5.4506E-10 ** 3  # volume of the crystal
-        U = 1000000 / 37.6416  # mu
-        c_0 = (
-                np.sin(2 * theta - omega) /
-                (np.sin(2 * theta - omega) + np.sin(omega))
-        )
-        c_1 = (
-                1 -
-                np.exp(
-                    - U * th / 1E10 *
-                    (
-                            1 / np.sin(omega) + 1 / np.sin(2 * theta - omega)
-                    )
-                )
-        )
-
-        c_2 = RO2 * LAMBDA ** 3 * F_GAP * P * L / V_A ** 2
-        i_theo = i_0 * c_0 * c_1 * c_2 * index / (v * U)
-
-        return i_theo
+    i_theory = staticmethod(i_theory)
 
     # Canvas Event
     def _on_press(self, event):
@@ -458,72 +412,14 @@ class PolesFigureProc(ProcModule):
         ind_l: The middle position of square. Same format as outer_index_list.
             Format: [[chi1, phi1], [chi2, phi2], [chi3, phi3], [chi4, phi4]]
         """
-        from scipy.ndimage.filters import gaussian_filter
-        from skimage import img_as_float
-        from skimage.morphology import reconstruction
-        from skimage.measure import label, regionprops
-        from skimage.filters import threshold_niblack
-        from skimage.segmentation import clear_border
-        from skimage.morphology import closing, square
-        from skimage import feature
-
-        n, bins = np.histogram(
-            self._gridded_data.ravel(),
-            bins=int(self._gridded_data.max() - self._gridded_data.min()),
-        )
-        bk_int = bins[np.argmax(n)]
-
-        image = img_as_float(self._gridded_data)
-        try:
-            ver_min = int(self.attr['DRV_2'].min())
-            ver_max = int(self.attr['DRV_2'].max())
-            hor_min = int(self.attr['DRV_1'].min())
-            hor_max = int(self.attr['DRV_1'].max())
-        except KeyError:
-            ver_min = np.int64(self.attr['phi_min'])
-            ver_max = np.int64(self.attr['phi_max'])
-            hor_min = np.int64(self.attr['khi_min'])
-            hor_max = np.int64(self.attr['khi_max'])
-
-        image = gaussian_filter(image, 1, mode='nearest')
-
-        h = 0.2
-        seed = image - h
-        mask = image
-        # Dilate image to remove noise.
-        dilated = reconstruction(seed, mask, method='dilation')
-        # Use local threshold to identify all the close area.
-        thresh = threshold_niblack(dilated, window_size=27, k=0.05)
-        # Select large closed area.
-        bw = closing(image > thresh, square(3))
-        # Remove area connected to bord.
-        cleared = clear_border(bw)
-
-        # label area.
-        label_image = label(cleared)
-        l, w = image.shape
-        binary_img = np.zeros(shape=(l, w))
-        int_vsot_bg_m = []
-        ind_l = []
-        for i in regionprops(label_image, self._gridded_data):
-            if i.area >= 100:
-                for k in i.coords:
-                    int_sum = np.sum(i.intensity_image) - i.area * bk_int
-                    if int_sum > 0:
-                        binary_img[k[0] + hor_min, k[1] + ver_min] = 1
-                        int_vsot_bg_m.append(int_sum)
-                        ind_l.append(i.weighted_centroid)
-        int_vsot_bg_m = np.asarray(int_vsot_bg_m)
+        int_vsot_bg_m, ind_l, edge = self._engine.poly_pk_integrate(
+            self.param['BK_METHOD'])
+        ver_min, ver_max, hor_min, hor_max = self._engine.limits
 
         # Draw edge of peaks.
-        edges2 = feature.canny(binary_img, sigma=2)  # Find the edge.
-        edge = np.full([l, w], np.nan)  # Create new image and fill with nan.
-        edge[np.where(edges2 > 1e-2)] = 100000000  # Set edge to 1.
-
         plt.figure(self.figure.number)
-        # plt.clf()
         plt.imshow(
-            np.roll(np.roll(edge, -hor_min, axis=0), -ver_min, axis=1),
+            edge,
             origin='lower',
             extent=[ver_min, ver_max, hor_min, hor_max],
         )
@@ -546,51 +442,18 @@ class PolesFigureProc(ProcModule):
         ind_l: The middle position of square. Same format as outer_index_list.
         sq_ins_l: The square plot handle.
         """
-        int_data = self._gridded_data
         try:
-            ver_min = np.int64(self.attr['phi_min'])
-            hor_min = np.int64(self.attr['khi_min'])
             sq_sz_l = [int(self.param['Square Sx']),
                        int(self.param['Square Sy'])]
         except KeyError:
-            ver_min = int(self.attr['DRV_2'].min())
-            hor_min = int(self.attr['DRV_1'].min())
             sq_sz_l = [int(self.param['SQUARE_SX']),
                        int(self.param['SQUARE_SY'])]
 
-        if 'outer_index_list' in kwargs:
-            ind_l = kwargs['outer_index_list']
-        else:
-            ind_l = self._sq_pk_search()
-        # Create Square instances.
-        in_sq_l = [
-            Square(
-                i,
-                sq_sz_l,
-                int_m=int_data,
-                lm_t=(ver_min, hor_min),
-                color='C3',
-            )
-            for i in ind_l
-        ]
+        int_vsot_bg_m, ind_l, sq_ins_l = self._engine.sq_pk_integrate(
+            sq_sz_l, kwargs.get('outer_index_list'), self.param['BK_METHOD'])
         # Draw squares.
         if repaint:
-            [i.plot() for i in in_sq_l]
-
-        logging.debug("Square size - {0}".format(sq_sz_l))
-        logging.debug("Square centre - {0}".format(ind_l))
-
-        n, bins = np.histogram(
-            self._gridded_data.ravel(),
-            bins=int(self._gridded_data.max() - self._gridded_data.min()),
-        )
-        bk_int = bins[np.argmax(n)]
-
-        logging.info("Background Intensity: {0}".format(bk_int))
-
-        int_vsot_bg_m = np.asarray([i - bk_int for i in in_sq_l])
-        sq_ins_l = in_sq_l
-        if repaint:
+            [i.plot() for i in sq_ins_l]
             self.canvas.draw()
 
         try:
@@ -613,72 +476,7 @@ class PolesFigureProc(ProcModule):
         return int_vsot_bg_m, ind_l, sq_ins_l
 
     def _sq_pk_search(self):
-        from scipy.ndimage.filters import gaussian_filter, maximum_filter
-        from scipy.ndimage.morphology import generate_binary_structure
-
-        def sort_index_list(index_list):
-            """
-            Sort index list to fit ABCD micro-Twins, where chi of A is max.
-            :param index_list: list for each point with form [chi, khi]
-            :return: sorted list.
-            """
-            phi_sorted_l = sorted(index_list, key=lambda pair: pair[0])
-            chi_index_list = [l[1] for l in phi_sorted_l]
-            shifted_index_int = chi_index_list.index(max(chi_index_list))
-            from collections import deque
-            phi_deque = deque(phi_sorted_l)
-            phi_deque.rotate(-shifted_index_int)
-            sorted_index_list = list(phi_deque)
-
-            logging.debug("index list before sort:{0}".format(index_list))
-            logging.debug(
-                "index list after sort:{0}".format(sorted_index_list)
-            )
-            return sorted_index_list
-
-        int_data_m = self._gridded_data
-        try:
-            ver_min = np.int64(self.attr['phi_min'])
-            hor_min = np.int64(self.attr['khi_min'])
-
-        except KeyError:
-            ver_min = int(self.attr['DRV_2'].min())
-            hor_min = int(self.attr['DRV_1'].min())
-
-        neighborhood = generate_binary_structure(2, 2)
-        for i in range(3):
-            int_data_m = gaussian_filter(int_data_m, 4, mode='nearest')
-        local_max = (
-                maximum_filter(int_data_m,
-                               footprint=neighborhood) == int_data_m
-        )
-        index = np.asarray(np.where(local_max))
-        ft_index_list = [[i, j] for (i, j) in zip(index[1, :], index[0, :])]
-
-        chi_threshold = 40
-        ft_index_list = [i for i in ft_index_list if i[1] < chi_threshold]
-
-        in_sq_l = [
-            Square(i, [10, 10], int_data_m, (ver_min, hor_min))
-            for i in ft_index_list
-        ]
-        ot_sq_l = [
-            Square(i, [20, 20], int_data_m, (ver_min, hor_min))
-            for i in ft_index_list
-        ]
-
-        int_list = [k - i for (i, k) in zip(in_sq_l, ot_sq_l)]
-        ft_index_list = [
-                            x for (y, x)
-                            in sorted(zip(int_list, ft_index_list),
-                                      key=lambda pair: pair[0])
-                        ][-4:]
-        ft_index_list = sort_index_list(ft_index_list)
-
-        while len(ft_index_list) < 4:
-            ft_index_list.append([0, 0])
-
-        return ft_index_list
+        return self._engine.sq_pk_search()
 
     # Intensity to volume fraction
 
@@ -702,17 +500,8 @@ class PolesFigureProc(ProcModule):
             th = int(self.param['THICKNESS'])
             bm_int = float(self.param['BEAM_INT'])
             v = abs(float(self.attr['VIT_ANGLE']))
-        omega = [
-            (np.pi / 2 - np.arccos(
-                np.cos(np.deg2rad(chi[1])) * np.sin(np.deg2rad(14.22))))
-            for chi in ind_l]
-        cor_eff = [334.3835417, 437.8887181, 702.504497, 583.5963464]
-
-        i_theo_l = [
-            self.i_theory(bm_int, v, i, i, th, k) for i, k in zip(omega, cor_eff)]
-
-        # volume_fraction_matrix = int_vsot_bg_m / i_theo_l * 100
-        volume_fraction_matrix = int_vsot_bg_m * np.asarray([5.741E-05, 4.828E-05, 3.203E-05, 3.537E-05])
+        i_theo_l, volume_fraction_matrix = self._engine.int2fraction(
+            int_vsot_bg_m, ind_l, th, bm_int, v)
 
         self._show_res_wd = self._res_dialog(
             int_vsot_bg_m,
@@ -834,157 +623,3 @@ class PolesFigureProc(ProcModule):
         _show_res_wd.resize(w, h)
 
         return _show_res_wd
-
-
-class Square(object):
-    def __init__(
-            self,
-            cr_l,
-            sz_t,
-            int_m=None,
-            lm_t=(0, 0),
-            color='b',
-    ):
-        self.cr_l = cr_l  # Centre position of the square
-        self.sz_t = sz_t  # Size of the square
-        self.int_m = int_m
-        self.lm_t = lm_t
-        self.color = color
-        self._fh = None
-
-    def lim(self):
-        if self.int_m is None:
-            x_min = self.cr_l[0] - self.sz_t[0] / 2
-            x_max = self.cr_l[0] + self.sz_t[0] / 2
-            y_min = self.cr_l[1] - self.sz_t[1] / 2
-            y_max = self.cr_l[1] + self.sz_t[1] / 2
-        else:
-            w, h = self.int_m.shape
-            x_min = max(0, int(np.floor(self.cr_l[0] - self.sz_t[0] / 2)))
-            x_max = min(int(np.floor(self.cr_l[0] + self.sz_t[0] / 2)), h)
-            y_min = max(0, int(np.floor(self.cr_l[1] - self.sz_t[1] / 2)))
-            y_max = min(int(np.floor(self.cr_l[1] + self.sz_t[1] / 2)), w)
-
-        return x_min, x_max, y_min, y_max
-
-    def plot(self, **kwargs):
-        from matplotlib.patches import Rectangle
-        x_min, x_max, y_min, y_max = self.lim()
-        (x_lmt, y_lmt) = self.lm_t
-        self._fh = plt.gca().add_patch(
-            Rectangle(
-                xy=(x_min + x_lmt, y_min + y_lmt),
-                width=x_max - x_min,
-                height=y_max - y_min,
-                linewidth=1,
-                fill=False,
-                color=self.color,
-                **kwargs
-            )
-        )
-
-    def move(self, direction_tuple):
-        self.remove()
-        self.cr_l = [i + j for (i, j) in zip(self.cr_l, list(direction_tuple))]
-        self.plot()
-
-    @property
-    def intensity_image(self):
-        x_min, x_max, y_min, y_max = self.lim()
-        if self.int_m is None:
-            raise AttributeError("Need intensity matrix.")
-        intensity_result_matrix = self.int_m[y_min:y_max, x_min:x_max]
-        peak_intensity_int = np.sum(intensity_result_matrix)
-
-        return peak_intensity_int
-
-    @property
-    def points(self):
-        x_min, x_max, y_min, y_max = self.lim()
-
-        return (y_max - y_min) * (x_max - x_min)
-
-    def remove(self):
-        """
-        Remove the the square _lines.
-        :return: None
-        """
-        try:
-            self._fh.remove()
-        except ValueError as e:
-            logging.debug(str(e))
-            logging.debug("Could not find the square.")
-
-    def __sub__(self, x):
-        if isinstance(x, Square):
-            pk_int = self.intensity_image
-            pk_pt = self.points
-            x_pk_int = x.intensity_image
-            x_pk_pt = x.points
-            bg_noise_float = (pk_int - x_pk_int) / (pk_pt - x_pk_pt)
-
-            return pk_int - pk_pt * bg_noise_float
-        elif isinstance(x, (float, int, np.int, np.float)):
-            pk_int = self.intensity_image
-            pk_pt = self.points
-            return pk_int - pk_pt * x
-        else:
-            return NotImplemented
-
-    def __contains__(self, item):
-        """
-        Check if the point is in the square.
-        :param item: the position of point [x,y].
-        :return: The boolean value.
-        """
-        x_min, x_max, y_min, y_max = self.lim()
-        (x_limit, y_limit) = self.lm_t
-        if (
-                x_min + x_limit < item[0] < x_max + x_limit and
-                y_min + y_limit < item[1] < y_max + y_limit):
-            return True
-        else:
-            return False
-
-
-class IntensityInputWidget(QtWidgets.QVBoxLayout):
-    def __init__(self, linked_param):
-        super().__init__()
-
-        self._int_line_edit = QtWidgets.QLineEdit(
-            str(linked_param['BEAM_INT']))
-        self._int_line_edit.textChanged.connect(
-            partial(linked_param.__setitem__, 'BEAM_INT'))
-        q_int_button = self._int_line_edit.addAction(
-            QtGui.QIcon(QtGui.QPixmap('icons/more.png')),
-            QtWidgets.QLineEdit.TrailingPosition
-        )
-        q_int_button.triggered.connect(self._get_beam_intensity)
-
-        self.addWidget(QtWidgets.QLabel("Beam Intensity"))
-        self.addWidget(self._int_line_edit)
-
-    def _get_beam_intensity(self):
-        def file2int(i):
-            file_instance = RawFile()
-            file_instance.get_file(i)
-            data, attr = file_instance.get_data()
-            del file_instance
-
-            scan_instance = OneDScanProc()
-            scan_instance.set_data(data, attr)
-            maxmium_int = scan_instance.get_max(mode='direct')
-
-            return maxmium_int
-
-        file_names = QtWidgets.QFileDialog.getOpenFileNames(
-            caption='Open intensity file...',
-            directory="/",
-            filter="Raw file (*.raw)"
-        )
-        source_file_list = file_names[0]
-        if not source_file_list:
-            return
-        int_l = [file2int(str(i)) for i in source_file_list]
-        beam_int = np.mean(np.asarray(int_l))*8940
-        self._int_line_edit.setText(str(beam_int))
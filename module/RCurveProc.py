@@ -7,7 +7,7 @@ import numpy as np
 from PyQt5 import QtCore, QtWidgets, QtGui
 
 from module.OneDScanProc import OneDScanProc
-from module.RawFile import RawFile
+from module.Widgets import IntensityInputWidget
 
 
 class RCurveProc(OneDScanProc):
@@ -346,49 +346,6 @@ class RCurveProc(OneDScanProc):
     #     event.accept()
 
 
-class IntensityInputWidget(QtWidgets.QVBoxLayout):
-    def __init__(self, linked_param):
-        super().__init__()
-
-        self._int_line_edit = QtWidgets.QLineEdit(
-            str(linked_param['BEAM_INT']))
-        self._int_line_edit.textChanged.connect(
-            partial(linked_param.__setitem__, 'BEAM_INT'))
-        q_int_button = self._int_line_edit.addAction(
-            QtGui.QIcon(QtGui.QPixmap('icons/more.png')),
-            QtWidgets.QLineEdit.TrailingPosition
-        )
-        q_int_button.triggered.connect(self._get_beam_intensity)
-
-        self.addWidget(QtWidgets.QLabel("Beam Intensity"))
-        self.addWidget(self._int_line_edit)
-
-    def _get_beam_intensity(self):
-        def file2int(i):
-            file_instance = RawFile()
-            file_instance.get_file(i)
-            data, attr = file_instance.get_data()
-            del file_instance
-
-            scan_instance = OneDScanProc()
-            scan_instance.set_data(data, attr)
-            maxmium_int = scan_instance.get_max(mode='direct')
-
-            return maxmium_int
-
-        file_names = QtWidgets.QFileDialog.getOpenFileNames(
-            caption='Open intensity file...',
-            directory="/",
-            filter="Raw file (*.raw)"
-        )
-        source_file_list = file_names[0]
-        if not source_file_list:
-            return
-        int_l = [file2int(str(i)) for i in source_file_list]
-        beam_int = np.mean(np.asarray(int_l))*8940
-        self._int_line_edit.setText(str(beam_int))
-
-
 class HKLInputComboBox(QtWidgets.QVBoxLayout):
     def __init__(self, linked_dict):
         super().__init__()
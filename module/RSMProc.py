@@ -11,8 +11,8 @@ from matplotlib.colors import LogNorm
 
 from module.Module import BasicToolBar, ProcModule
 from module.OneDScanProc import OneDScanProc
+from module.engine.RSMEngine import LAMBDA, RSM_MODES, angle2q, rsm_regrid
 
-LAMBDA = 0.154055911278
 LATTICE_GAP = 0.54505
 
 
@@ -40,7 +40,8 @@ class RSMProc(ProcModule):
 
         self.param = {
             "OMEGA_SHIFT": "0",
-            "ENABLE_ABSOLUTE_MODE": True
+            "ENABLE_ABSOLUTE_MODE": True,
+            "RSM_MODE": RSM_MODES[0],
         }
         self.figure = plt.figure(figsize=(10, 10))
         self._build_plot_widget()
@@ -148,6 +149,19 @@ class RSMProc(ProcModule):
             partial(self._upt_param, "ENABLE_ABSOLUTE_MODE"))
         config_layout.addWidget(enable_absolute_mode_button)
 
+        rsm_mode_layout = QtWidgets.QVBoxLayout()
+        rsm_mode_layout.addWidget(QtWidgets.QLabel('Rendering mode:'))
+        rsm_mode_combo_box = QtWidgets.QComboBox()
+        rsm_mode_combo_box.addItems(RSM_MODES)
+        rsm_mode_combo_box.setCurrentText(self.param["RSM_MODE"])
+        rsm_mode_combo_box.setStatusTip(
+            "Structured and Mesh use the measured grid, "
+            "they are faster for large maps")
+        rsm_mode_combo_box.currentTextChanged.connect(
+            partial(self._upt_param, "RSM_MODE"))
+        rsm_mode_layout.addWidget(rsm_mode_combo_box)
+        config_layout.addLayout(rsm_mode_layout)
+
         return config_widget
 
     def _configuration(self):
@@ -168,10 +182,7 @@ class RSMProc(ProcModule):
         ]))
         # ====================================================================
 
-        from scipy.interpolate import griddata
-        int_data = self.data.copy()
-        w, h = int_data.shape
-
+        int_data = self.data
         try:
             tth = self.attr['two_theta_data'][0].copy()
         except KeyError:
@@ -186,9 +197,10 @@ class RSMProc(ProcModule):
         except KeyError:
             phi = self.attr['PHI']
 
+        omega_shift = 0.
         if self.param['OMEGA_SHIFT']:
             try:
-                omega -= float(self.param['OMEGA_SHIFT'])
+                omega_shift = float(self.param['OMEGA_SHIFT'])
             except ValueError:
                 pass
 
@@ -201,30 +213,28 @@ class RSMProc(ProcModule):
         else:
             hkl = hkl[0]
         self.attr['HKL'] = np.asarray(hkl)
-        tth, omega = np.meshgrid(tth, omega)
-        s_mod = 4.*np.pi / LAMBDA * np.sin(np.radians(tth / 2.)) / 10
-        psi = omega - tth / 2.
-        s_x = s_mod * np.sin(np.radians(psi))
-        s_z = s_mod * np.cos(np.radians(psi))
-
-        s_x = -s_x if abs(phi) < 2 else s_x
-
-        xi = np.linspace(s_x.min(), s_x.max(), w)
-        yi = np.linspace(s_z.min(), s_z.max(), h)
-        xx, yy = np.meshgrid(xi, yi)
-        zi = griddata(
-            (s_x.flatten(), s_z.flatten()),
-            int_data.flatten(), (xx, yy),
-            method='linear')
+        mode = self.param["RSM_MODE"]
+        xi, yi, zi, extent = rsm_regrid(
+            int_data, tth, omega, phi, omega_shift=omega_shift,
+            method="Triangulation" if mode == "Triangulation" else
+            "Structured")
 
         self.figure.clf()
         plt.figure(self.figure.number)
-        im = plt.imshow(
-            zi,
-            origin='lower',
-            norm=LogNorm(10, 100),
-            extent=[s_x.min(), s_x.max(),
-                    s_z.min(), s_z.max()])
+        if mode == "Mesh":
+            s_x, s_z = angle2q(tth, omega, omega_shift, abs(phi) < 2)
+            im = plt.pcolormesh(
+                s_x, s_z, int_data,
+                shading='nearest',
+                norm=LogNorm(10, 100))
+            plt.gca().set_xlim(extent[:2])
+            plt.gca().set_ylim(extent[2:])
+        else:
+            im = plt.imshow(
+                zi,
+                origin='lower',
+                norm=LogNorm(10, 100),
+                extent=list(extent))
 
         plt.xlabel("$Q_x$ ($Å^{-1}$)", fontsize=16)
         plt.ylabel("$Q_z$ ($Å^{-1}$)", fontsize=16)
@@ -352,7 +362,7 @@ class RSMProc(ProcModule):
         y_max = min(y_max, width)
         x_max = min(x_max, length)
         if self.param['ENABLE_ABSOLUTE_MODE']:
-            s_data[np.isnan(s_data)] = 0
+            s_data = np.where(np.isnan(s_data), 0, s_data)
 
         data_x = s_data[y, :] if width_x < 1e-10 else np.sum(
             s_data[y_min:y_max, :], axis=0)
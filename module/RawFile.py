@@ -2,6 +2,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import logging
+import mmap
 import os
 import re
 import struct
@@ -31,10 +32,169 @@ TBL_STEPPING_DRIVERS = {
     130: ("psd fast scan", "TWOTHETA")
 }
 
+# The RAW and RAW2 versions only record coupled two theta scans.
+LOCKED_COUPLED = 0
+
+STRUCT_CODE = {'u2': 'H', 'u4': 'I', 'f4': 'f', 'f8': 'd'}
+
+
+class HeaderSchema(object):
+    """Declarative layout of a binary header.
+
+    The field table is compiled once into a numpy dtype, to decode many
+    headers at once, and a struct.Struct, to decode a single header with one
+    call. The bytes not listed in the table are skipped.
+    """
+
+    def __init__(self, fields, itemsize):
+        """
+        :param fields: list of (offset, dtype, name), dtype is a little
+        endian numpy type string such as '<u4', '<f8' or 'S10'.
+        :param itemsize: The size of the header in bytes.
+        """
+        self.fields = sorted(fields)
+        self.itemsize = itemsize
+        self.names = [name for _, _, name in self.fields]
+        self.dtype = np.dtype({
+            'names': self.names,
+            'formats': [fmt for _, fmt, _ in self.fields],
+            'offsets': [offset for offset, _, _ in self.fields],
+            'itemsize': itemsize,
+        })
+
+        fmt_l = ['<']
+        pos = 0
+        for offset, fmt, _ in self.fields:
+            if offset > pos:
+                fmt_l.append('{0}x'.format(offset - pos))
+            if fmt.startswith('S'):
+                fmt_l.append('{0}s'.format(fmt[1:]))
+            else:
+                fmt_l.append(STRUCT_CODE[fmt[1:]])
+            pos = offset + np.dtype(fmt).itemsize
+        if itemsize > pos:
+            fmt_l.append('{0}x'.format(itemsize - pos))
+        self.struct = struct.Struct(''.join(fmt_l))
+        assert self.struct.size == itemsize
+
+    def unpack(self, buffer, offset=0):
+        """Decode one header into a dict, strings are decoded as str."""
+        values = self.struct.unpack_from(buffer, offset)
+        return {
+            name: (value.decode(CODE) if isinstance(value, bytes) else value)
+            for name, value in zip(self.names, values)
+        }
+
+    def records(self, buffer, offsets):
+        """Decode the headers at offsets into a structured array."""
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        return raw[
+            offsets[:, None] + np.arange(self.itemsize)
+        ].view(self.dtype)[:, 0]
+
+
+# RAW1.01, 712 bytes file header following the "RAW1.01\0" magic.
+FILE_SCHEMA_V3 = HeaderSchema([
+    (8, '<u4', '_FILE_STATUS_CODE'),
+    (12, '<u4', 'RANGE_CNT'),
+    (16, 'S10', 'DATE'),
+    (26, 'S10', 'TIME'),
+    (36, 'S72', 'USER'),
+    (108, 'S218', 'SITE'),
+    (326, 'S60', 'SAMPLE_ID'),
+    (386, 'S160', 'COMMENT'),
+    (608, 'S4', 'ANODE_MATERIAL'),
+    (616, '<f8', 'ALPHA_AVERAGE'),
+    (624, '<f8', 'ALPHA1'),
+    (632, '<f8', 'ALPHA2'),
+    (640, '<f8', 'BETA'),
+    (648, '<f8', 'ALPHA_RATIO'),
+    (664, '<u4', 'MEASUREMENT TIME'),
+], 712)
+
+# RAW1.01, 304 bytes range header, followed by the supplementary headers and
+# STEPS float32 intensities.
+RANGE_SCHEMA_V3 = HeaderSchema([
+    (0, '<u4', 'HEADER_LEN'),
+    (4, '<u4', 'STEPS'),
+    (8, '<f8', 'OMEGA'),
+    (16, '<f8', 'TWOTHETA'),
+    (24, '<f8', 'KHI'),
+    (32, '<f8', 'PHI'),
+    (40, '<f8', 'X'),
+    (48, '<f8', 'Y'),
+    (56, '<f8', 'Z'),
+    (96, '<u4', 'DETECTOR'),
+    (100, '<f4', 'HIGH_VOLTAGE'),
+    (104, '<f4', 'AMPLIFIER_GAIN'),
+    (108, '<f4', 'DISCRIMINATOR_1_LOWER_LEVEL'),
+    (144, '<f8', 'AU1'),
+    (152, '<f8', 'AU2'),
+    (160, '<f8', 'AU3'),
+    (168, '<u4', 'SCAN_MODE'),
+    (176, '<f8', 'STEP_SIZE'),
+    (184, '<f8', 'STEP_SIZE_B'),
+    (192, '<f4', 'STEP_TIME'),
+    (196, '<u4', '_STEPPING_DRIVE_CODE'),
+    (204, '<f4', 'ROTATION_SPEED [rpm]'),
+    (212, '<f4', 'TEMP_RATE'),
+    (216, '<f4', 'TEMP_DELAY'),
+    (224, '<f4', 'GENERATOR_VOLTAGE'),
+    (228, '<f4', 'GENERATOR_CURRENT'),
+    (240, '<f8', 'USED_LAMBDA'),
+    (248, '<u4', '_VARYINGPARAMS'),
+    (252, '<u4', '_DATUM_LENGTH'),
+    (256, '<u4', 'SUPPLEMENTARY_HEADERS_SIZE'),
+], 304)
+
+# RAW2, 256 bytes file header.
+FILE_SCHEMA_V2 = HeaderSchema([
+    (4, '<u2', 'RANGE_CNT'),
+    (168, 'S20', 'DATE_TIME'),
+    (188, 'S2', 'ANODE_MATERIAL'),
+    (190, '<f4', 'ALPHA1'),
+    (194, '<f4', 'ALPHA2'),
+    (198, '<f4', 'ALPHA_RATIO'),
+    (210, '<f4', 'MEASUREMENT TIME'),
+], 256)
+
+# RAW2, range header of HEADER_LEN (at least 48) bytes.
+RANGE_SCHEMA_V2 = HeaderSchema([
+    (0, '<u2', 'HEADER_LEN'),
+    (2, '<u2', 'STEPS'),
+    (8, '<f4', 'STEP_TIME'),
+    (12, '<f4', 'STEP_SIZE'),
+    (16, '<f4', 'TWOTHETA'),
+    (46, '<u2', 'TEMP_IN_K'),
+], 48)
+
+# RAW, 152 bytes range header. The file only has the "RAW " magic, which
+# some versions repeat before every range.
+RANGE_SCHEMA_V1 = HeaderSchema([
+    (0, '<u4', 'STEPS'),
+    (4, '<f4', 'STEP_TIME'),
+    (8, '<f4', 'STEP_SIZE'),
+    (12, '<u4', 'SCAN_MODE'),
+    (20, '<f4', 'TWOTHETA'),
+    (24, '<f4', 'OMEGA'),
+    (28, '<f4', 'KHI'),
+    (32, '<f4', 'PHI'),
+    (36, 'S32', 'SAMPLE_NAME'),
+    (68, '<f4', 'ALPHA1'),
+    (72, '<f4', 'ALPHA2'),
+    (148, '<u4', 'FOLLOWING_RANGE'),
+], 152)
+
+# Common header of the RangeTable, all versions are converted to it.
+RANGE_HEADER_V3 = RANGE_SCHEMA_V3.dtype
+
 
 class RawFile(FileModule):
     def __init__(self):
         super(RawFile, self).__init__()
+        # Memory map the file instead of reading it scan by scan.
+        self.use_mmap = True
 
     @property
     def name(self):
@@ -47,125 +207,201 @@ class RawFile(FileModule):
     def get_data(self):
         logging.debug("Transform .raw file data to ndarray...")
 
-        meta_header, scans = self.parser_file()
+        meta_header, table = self.parser_table()
+        data, attr = self.assemble(meta_header, table)
+        # data and attr are copies, the map of the file is not needed anymore.
+        table.close()
+
+        return data, attr
+
+    @staticmethod
+    def assemble(meta_header, table):
+        """Classify the table and copy its intensity into the data array.
+
+        :param meta_header: The file header dict.
+        :param table: RangeTable of the file.
+        :return: data ndarray and attr dict, as get_data.
+        """
+        attr, table = RawFile.classify(meta_header, table)
+
+        header = table.header
+        if attr['TYPE'] in ('SingleScan', 'RockingCurve'):
+            # Every range is a part of the scan, with its own start, step
+            # size, steps and counting time.
+            drv = attr['STEPPING_DRIVE1']
+            drv_x = []
+            int_y = []
+            for idx in range(len(table)):
+                intensity = table.row(idx)
+                start = float(header[drv][idx])
+                steps = int(header['STEPS'][idx])
+                drv_x.append(np.linspace(
+                    start, start + float(header['STEP_SIZE'][idx]) * steps,
+                    steps)[:len(intensity)])
+                int_y.append(intensity / float(header['STEP_TIME'][idx]))
+            drv_x = np.concatenate(drv_x)
+            order = np.argsort(drv_x, kind='stable')
+            data = np.vstack((drv_x[order], np.concatenate(int_y)[order]))
+        else:
+            data = table.to_array(float(header['STEP_TIME'][0]))
 
+        return data, attr
+
+    def get_header(self):
+        """Describe the file without reading the intensity blocks.
+
+        Only the file header and the range headers are read, the data blocks
+        are skipped with seek.
+        :return: attr dict as get_data, with the sample metadata, the TYPE,
+        the stepping drives and the (min, max) of every angle in
+        ANGULAR_RANGE.
+        """
+        with open(self.file, 'rb') as file_handle:
+            is_version3 = file_handle.read(7).decode(CODE) == "RAW1.01"
+            if is_version3:
+                meta_header = self.load_meta_version3(file_handle)
+                table = RangeTable.from_file(
+                    file_handle, meta_header['RANGE_CNT'])
+        if not is_version3:
+            meta_header, table = self.parser_table()
+            table.close()
+
+        attr, table = self.classify(meta_header, table)
+
+        header = table.header
+        scan_end = header['STEP_SIZE'] * header['STEPS']
+        drv_l = [attr.get('STEPPING_DRIVE2', attr.get('STEPPING_DRIVE1'))]
+        if attr['TYPE'] == 'RSMPlot':
+            drv_l = ['TWOTHETA']
+        attr['ANGULAR_RANGE'] = {}
+        for axis in ('OMEGA', 'TWOTHETA', 'KHI', 'PHI'):
+            start = header[axis].astype(np.float64)
+            end = start + scan_end if axis in drv_l else start
+            attr['ANGULAR_RANGE'][axis] = (
+                float(min(start.min(), end.min())),
+                float(max(start.max(), end.max())))
+
+        return attr
+
+    @staticmethod
+    def classify(meta_header, table):
+        """Identify the scan type from the range headers.
+
+        Only the headers are used, so the table could come from get_header.
+        :param meta_header: The file header dict.
+        :param table: RangeTable of the file.
+        :return: attr dict and the table of the ranges to keep.
+        """
         attr = meta_header.copy()
 
-        if not scans:
+        if not len(table):
             raise Exception("Empty Dataset.")
 
-        if not all([
-                i._STEPPING_DRIVE_CODE == scans[0]._STEPPING_DRIVE_CODE
-                for i in scans
-        ]):
+        if not table.is_uniform('_STEPPING_DRIVE_CODE'):
             raise Exception("Different Scan Type in this file.")
 
-        step_code = scans[0]._STEPPING_DRIVE_CODE
+        step_code = int(table.header['_STEPPING_DRIVE_CODE'][0])
 
         if step_code in (129, 130):
             # RSM Scan
-            attr['STEPS'] = int(scans[0].STEPS)
-            attr['STEP_SIZE'] = float(scans[0].STEP_SIZE)
-            theta_start = float(scans[0].TWOTHETA)
-            if not all(i.PHI == scans[0].PHI for i in scans):
+            if not table.is_uniform('PHI'):
                 raise Exception("The Phi is inconsistent.")
-            if not all(i.TWOTHETA == scans[0].TWOTHETA for i in scans):
+            if not table.is_uniform('TWOTHETA'):
                 logging.error("The Two Theta is inconsistent.")
-                if 1:
-                    scans = [
-                        i for i in scans if i.TWOTHETA == scans[0].TWOTHETA
-                    ]
-            if not all(i.STEP_SIZE == scans[0].STEP_SIZE for i in scans):
-                raise Exception("The Step Size is inconsistent.")
-            if not all(i.STEPS == scans[0].STEPS for i in scans):
-                raise Exception("The Steps is inconsistent.")
+                table = table.select('TWOTHETA')
+            table.check_uniform('STEP_SIZE', 'STEPS')
+            header = table.header
+
+            attr['STEPS'] = int(header['STEPS'][0])
+            attr['STEP_SIZE'] = float(header['STEP_SIZE'][0])
+            theta_start = float(header['TWOTHETA'][0])
 
             attr['TYPE'] = 'RSMPlot'
-            attr['PHI'] = float(scans[0].PHI)
+            attr['PHI'] = float(header['PHI'][0])
             attr['STEPPING_DRIVE1'] = 'OMEGA'
-            attr['OMEGA'] = np.asarray([float(i.OMEGA) for i in scans])
+            attr['OMEGA'] = header['OMEGA'].astype(np.float64)
             attr['TWOTHETA'] = np.linspace(
                 theta_start, theta_start + attr['STEP_SIZE'] * attr['STEPS'],
                 attr['STEPS'])
-            for i in scans:
-                if len(i.intensity) < len(scans[0].intensity):
-                    diff = len(scans[0].intensity) - len(i.intensity)
-                    i.intensity = np.pad(
-                        np.asarray(i.intensity), (0, diff),
-                        'constant',
-                        constant_values=(0, 0)).tolist()
-            data = (np.asanyarray([i.intensity
-                                   for i in scans]) / scans[0].STEP_TIME)
-        elif step_code is 13:
+        elif step_code == 13:
             raise Exception("Unknown Scan Type")
         else:
-            if len(scans) == 1:
+            header = table.header
+            stepping_drive1 = None
+            if len(table) > 1:
+                drivers = ['KHI', 'PHI', 'X', 'Y', 'Z', 'AU1', 'AU2', 'AU3']
+                for drv in drivers:
+                    if header[drv][0] != header[drv][1]:
+                        stepping_drive1 = drv
+                        table.check_uniform('STEP_SIZE', 'STEPS', 'STEP_TIME')
+                        break
+                else:
+                    # The ranges are parts of the same scan, they are joined
+                    # along the scan axis by get_data.
+                    logging.info(
+                        "No drive is stepped between the ranges, "
+                        "the {0} ranges are joined.".format(len(table)))
+
+            if stepping_drive1 is None:
                 drv = TBL_STEPPING_DRIVERS[step_code][1]
-                attr['STEP_TIME'] = float(scans[0].STEP_TIME)
+                attr['STEP_TIME'] = float(header['STEP_TIME'][0])
                 attr['STEPPING_DRIVE1'] = drv
-                attr['STEP_SIZE'] = float(scans[0].STEP_SIZE)
+                attr['STEP_SIZE'] = float(header['STEP_SIZE'][0])
                 attr['TYPE'] = 'SingleScan'
 
-                drv_x = np.linspace(
-                    float(scans[0].header[drv]),
-                    float(scans[0].header[drv]) +
-                    float(scans[0].STEP_SIZE) * int(scans[0].STEPS),
-                    int(scans[0].STEPS))
-                data = np.vstack(
-                    (drv_x,
-                     np.asarray(scans[0].intensity) / attr['STEP_TIME']))
-
-                if step_code is 3:
+                if step_code == 3:
                     attr['TYPE'] = "RockingCurve"
             else:
-                if not all(i.STEP_SIZE == scans[0].STEP_SIZE for i in scans):
-                    raise Exception("The Step Size is inconsistent.")
-                if not all(i.STEPS == scans[0].STEPS for i in scans):
-                    raise Exception("The Steps is inconsistent.")
-                if not all(i.STEP_TIME == scans[0].STEP_TIME for i in scans):
-                    raise Exception("The Step Time is inconsistent.")
-                drivers = ['KHI', 'PHI', 'X', 'Y', 'Z', 'AUX1', 'AUX2', 'AUX3']
-                for drv in drivers:
-                    if scans[0].header[drv] != scans[1].header[drv]:
-                        attr['STEPPING_DRIVE1'] = drv
-                        attr['STEPPING_DRIVE2'] = \
-                        TBL_STEPPING_DRIVERS[step_code][1]
-                        break
+                attr['STEPPING_DRIVE1'] = stepping_drive1
+                attr['STEPPING_DRIVE2'] = TBL_STEPPING_DRIVERS[step_code][1]
+
+                table = table.select(attr['STEPPING_DRIVE2'])
+                header = table.header
 
-                drv_2_n = attr['STEPPING_DRIVE2']
-                if not all(i.header[drv_2_n] == scans[0].header[drv_2_n]
-                           for i in scans):
-                    if 1:
-                        scans = [
-                            i for i in scans
-                            if i.header[drv_2_n] == scans[0].header[drv_2_n]
-                        ]
-
-                attr['DRV_1'] = np.asarray(
-                    [float(i.header[attr['STEPPING_DRIVE1']]) for i in scans])
+                attr['DRV_1'] = header[attr['STEPPING_DRIVE1']].astype(
+                    np.float64)
                 attr['DRV_2'] = np.linspace(
-                    float(scans[0].header[attr['STEPPING_DRIVE2']]),
-                    float(scans[0].header[attr['STEPPING_DRIVE2']]) +
-                    float(scans[0].STEP_SIZE) * int(scans[0].STEPS),
-                    int(scans[0].STEPS))
+                    float(header[attr['STEPPING_DRIVE2']][0]),
+                    float(header[attr['STEPPING_DRIVE2']][0]) +
+                    float(header['STEP_SIZE'][0]) * int(header['STEPS'][0]),
+                    int(header['STEPS'][0]))
                 attr['TYPE'] = 'TwoDPlot'
-                for i in scans:
-                    if len(i.intensity) < len(scans[0].intensity):
-                        diff = len(scans[0].intensity) - len(i.intensity)
-                        i.intensity = np.pad(
-                            np.asarray(i.intensity), (0, diff),
-                            'constant',
-                            constant_values=(0, 0)).tolist()
-                data = (np.asanyarray([i.intensity for i in scans]) / float(
-                    scans[0].STEP_TIME))
 
                 if attr['STEPPING_DRIVE1'] == "KHI":
                     if attr['STEPPING_DRIVE2'] == 'PHI':
                         attr['TYPE'] = 'PolesFigurePlot'
                         attr['VIT_ANGLE'] = float(
-                            scans[0].STEP_SIZE / scans[0].STEP_TIME)
+                            header['STEP_SIZE'][0] / header['STEP_TIME'][0])
 
-        return data, attr
+        return attr, table
+
+    def parser_table(self):
+        """Read the file into a meta header dict and a RangeTable.
+
+        With use_mmap the file is memory mapped and the range headers are
+        decoded in one pass, otherwise the RAW1.01 table is built from the
+        ScanBulk list of parser_file.
+        """
+        with open(self.file, 'rb') as file_handle:
+            _version = file_handle.read(4).decode(CODE)
+            if _version == "RAW1":
+                _version = _version + file_handle.read(3).decode(CODE)
+            if _version not in ("RAW ", "RAW2", "RAW1.01"):
+                raise Exception("Unknown raw file version.")
+            if _version == "RAW1.01" and self.use_mmap:
+                return self.map_version3(file_handle)
+            elif _version != "RAW1.01":
+                file_handle.seek(0, os.SEEK_SET)
+                if self.use_mmap:
+                    buffer = mmap.mmap(
+                        file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    buffer = file_handle.read()
+                if _version == "RAW ":
+                    return self.table_version1(buffer)
+                return self.table_version2(buffer)
+        meta_header, scans = self.parser_file()
+        return meta_header, RangeTable.from_scans(scans)
 
     def parser_file(self):
         """Factory method for diffrent version of raw files."""
@@ -174,7 +410,7 @@ class RawFile(FileModule):
             if _version == "RAW1":
                 _version = _version + file_handle.read(3).decode(CODE)
             assert _version in ("RAW ", "RAW2", "RAW1.01")
-            if _version == 'RAW':
+            if _version == 'RAW ':
                 return self.load_version1(file_handle)
             elif _version == 'RAW2':
                 return self.load_version2(file_handle)
@@ -184,63 +420,87 @@ class RawFile(FileModule):
     @staticmethod
     def load_version1(file_handle):
         """Parser version.RAW ."""
-        meta_header = {'FORMAT_VERSION': "v1"}
+        file_handle.seek(0, os.SEEK_SET)
+        meta_header, table = RawFile.table_version1(file_handle.read())
 
-        return meta_header,
+        return meta_header, table.scans()
 
     @staticmethod
     def load_version2(file_handle):
         """Parser version.RAW2."""
-        meta_header = {'FORMAT_VERSION': "v2"}
+        file_handle.seek(0, os.SEEK_SET)
+        meta_header, table = RawFile.table_version2(file_handle.read())
 
-        return meta_header,
+        return meta_header, table.scans()
+
+    @staticmethod
+    def table_version1(buffer):
+        """Decode a version.RAW file into a meta header and a RangeTable.
+
+        The ranges are chained by FOLLOWING_RANGE, there is no file header.
+        """
+        schema = RANGE_SCHEMA_V1
+        size = len(buffer)
+        head_offsets = []
+        data_offsets = []
+        pos = 4
+        following_range = 1
+        while following_range:
+            if head_offsets and buffer[pos:pos + 4] == b"RAW ":
+                pos += 4
+            if pos + schema.itemsize > size:
+                raise Exception("Unexpected end of file.")
+            steps, = struct.unpack_from('<I', buffer, pos)
+            following_range, = struct.unpack_from('<I', buffer, pos + 148)
+            head_offsets.append(pos)
+            data_offsets.append(pos + schema.itemsize)
+            pos = data_offsets[-1] + 4 * steps
+
+        records = schema.records(buffer, head_offsets)
+        # Angles which were not recorded are set to -1e6.
+        for k in ('OMEGA', 'KHI', 'PHI'):
+            records[k][records[k] == -1e6] = 0
+
+        meta_header = {
+            'FORMAT_VERSION': "v1",
+            'RANGE_CNT': len(records),
+            'SAMPLE_ID': records['SAMPLE_NAME'][0].decode(CODE),
+            'ALPHA1': float(records['ALPHA1'][0]),
+            'ALPHA2': float(records['ALPHA2'][0]),
+        }
+
+        return meta_header, RangeTable.from_records(
+            records, buffer, data_offsets, LOCKED_COUPLED)
+
+    @staticmethod
+    def table_version2(buffer):
+        """Decode a version.RAW2 file into a meta header and a RangeTable."""
+        meta_header = {'FORMAT_VERSION': "v2"}
+        meta_header.update(FILE_SCHEMA_V2.unpack(buffer))
+
+        size = len(buffer)
+        head_offsets = []
+        data_offsets = []
+        pos = FILE_SCHEMA_V2.itemsize
+        for _ in range(meta_header['RANGE_CNT']):
+            if pos + RANGE_SCHEMA_V2.itemsize > size:
+                raise Exception("Unexpected end of file.")
+            header_len, steps = struct.unpack_from('<HH', buffer, pos)
+            if header_len < RANGE_SCHEMA_V2.itemsize:
+                raise Exception("Wrong range header length.")
+            head_offsets.append(pos)
+            data_offsets.append(pos + header_len)
+            pos = data_offsets[-1] + 4 * steps
+
+        records = RANGE_SCHEMA_V2.records(buffer, head_offsets)
+
+        return meta_header, RangeTable.from_records(
+            records, buffer, data_offsets, LOCKED_COUPLED)
 
     @staticmethod
     def load_version3(file_handle):
         """Parser version.RAW1.01."""
-        file_handle.seek(8, os.SEEK_SET)
-        meta_header = {}
-        meta_header['FORMAT_VERSION'] = "v3"
-        meta_header['_FILE_STATUS_CODE'] = struct.unpack(
-            'I', file_handle.read(4))[0]
-        meta_header['RANGE_CNT'] = struct.unpack('I', file_handle.read(4))[0]
-        meta_header['DATE'] = file_handle.read(10).decode(CODE)
-        meta_header['TIME'] = file_handle.read(10).decode(CODE)
-        meta_header['USER'] = file_handle.read(72).decode(CODE)
-        meta_header['SITE'] = file_handle.read(218).decode(CODE)
-        meta_header['SAMPLE_ID'] = file_handle.read(60).decode(CODE)
-        meta_header['COMMENT'] = file_handle.read(160).decode(CODE)
-        file_handle.seek(2, os.SEEK_CUR)  # Error in File Design
-        file_handle.seek(4, os.SEEK_CUR)  # goniometer code
-        file_handle.seek(4, os.SEEK_CUR)  # goniometer stage code
-        file_handle.seek(4, os.SEEK_CUR)  # sample loader code
-        file_handle.seek(4, os.SEEK_CUR)  # goniometer controller code
-        file_handle.seek(4, os.SEEK_CUR)  # (R4) goniometer radius
-        file_handle.seek(4, os.SEEK_CUR)  # (R4) fixed divergence...
-        file_handle.seek(4, os.SEEK_CUR)  # (R4) fixed sample slit...
-        file_handle.seek(4, os.SEEK_CUR)  # primary Soller slit
-        file_handle.seek(4, os.SEEK_CUR)  # primary monochromator
-        file_handle.seek(4, os.SEEK_CUR)  # (R4) fixed anti-scatter...
-        file_handle.seek(4, os.SEEK_CUR)  # (R4) fixed detector slit...
-        file_handle.seek(4, os.SEEK_CUR)  # secondary Soller slit
-        file_handle.seek(4, os.SEEK_CUR)  # fixed thin film attachment
-        file_handle.seek(4, os.SEEK_CUR)  # beta filter
-        file_handle.seek(4, os.SEEK_CUR)  # secondary monochromator
-        meta_header["ANODE_MATERIAL"] = file_handle.read(4).decode(CODE)
-        file_handle.seek(4, os.SEEK_CUR)  # unused
-        meta_header["ALPHA_AVERAGE"] = struct.unpack('d',
-                                                     file_handle.read(8))[0]
-        meta_header["ALPHA1"] = struct.unpack('d', file_handle.read(8))[0]
-        meta_header["ALPHA2"] = struct.unpack('d', file_handle.read(8))[0]
-        meta_header["BETA"] = struct.unpack('d', file_handle.read(8))[0]
-        meta_header["ALPHA_RATIO"] = struct.unpack('d', file_handle.read(8))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # (C4) unit name
-        file_handle.seek(4, os.SEEK_CUR)  # (R4) intensity beta: a1
-        meta_header["MEASUREMENT TIME"] = struct.unpack(
-            'I', file_handle.read(4))[0]
-        file_handle.seek(43, os.SEEK_CUR)  # unused
-        file_handle.seek(1, os.SEEK_CUR)  # hardware dependency...
-        assert file_handle.tell() == 712
+        meta_header = RawFile.load_meta_version3(file_handle)
 
         scans = [
             ScanBulk(file_handle) for _ in range(meta_header['RANGE_CNT'])
@@ -248,80 +508,289 @@ class RawFile(FileModule):
 
         return meta_header, scans
 
+    @staticmethod
+    def map_version3(file_handle):
+        """Parser version.RAW1.01 through a memory map of the file."""
+        meta_header = RawFile.load_meta_version3(file_handle)
+        buffer = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return meta_header, RangeTable.from_buffer(
+            buffer, file_handle.tell(), meta_header['RANGE_CNT'])
+
+    @staticmethod
+    def load_meta_version3(file_handle):
+        """Read the 712 bytes file header of version.RAW1.01."""
+        file_handle.seek(0, os.SEEK_SET)
+        meta_header = {'FORMAT_VERSION': "v3"}
+        meta_header.update(
+            FILE_SCHEMA_V3.unpack(file_handle.read(FILE_SCHEMA_V3.itemsize)))
+        assert file_handle.tell() == 712
+
+        return meta_header
+
+
+class RangeTable(object):
+    """Headers and intensities of all the ranges in a raw file.
+
+    header is a structured array with one RANGE_HEADER_V3 record per range.
+    When all the ranges share the same layout, intensity is a 2-D view into
+    the file buffer. Otherwise it is None, and the float32 blocks are located
+    by data_offsets and steps in buffer. A table read by from_file only has
+    the header. When buffer is a memory map, it stays open until close.
+    """
+    CONSISTENCY_MSG = {
+        'PHI': "The Phi is inconsistent.",
+        'STEP_SIZE': "The Step Size is inconsistent.",
+        'STEPS': "The Steps is inconsistent.",
+        'STEP_TIME': "The Step Time is inconsistent.",
+    }
+
+    def __init__(self, header, intensity=None, buffer=None,
+                 data_offsets=None, steps=None):
+        self.header = header
+        self.intensity = intensity
+        self.buffer = buffer
+        self.data_offsets = data_offsets
+        self.steps = steps
+
+    def __len__(self):
+        return len(self.header)
+
+    def close(self):
+        """Close the memory map of the file, if the table reads one.
+
+        The header is copied first, the intensity is not available anymore.
+        """
+        buffer = self.buffer
+        self.header = np.array(self.header)
+        self.intensity = None
+        self.buffer = None
+        self.data_offsets = None
+        self.steps = None
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    def __getitem__(self, index):
+        if self.intensity is not None:
+            return RangeTable(self.header[index], self.intensity[index])
+        if self.buffer is None:
+            return RangeTable(self.header[index])
+        return RangeTable(
+            self.header[index],
+            buffer=self.buffer,
+            data_offsets=self.data_offsets[index],
+            steps=self.steps[index])
+
+    def is_uniform(self, field):
+        """If the field has the same value in every range."""
+        return bool(np.all(self.header[field] == self.header[field][0]))
+
+    def check_uniform(self, *fields):
+        for field in fields:
+            if not self.is_uniform(field):
+                raise Exception(self.CONSISTENCY_MSG.get(
+                    field, "The {0} is inconsistent.".format(field)))
+
+    def select(self, field):
+        """Keep only the ranges sharing the field value of the first one."""
+        if self.is_uniform(field):
+            return self
+        return self[self.header[field] == self.header[field][0]]
+
+    @classmethod
+    def from_buffer(cls, buffer, offset, range_cnt):
+        """Decode the ranges of a RAW1.01 file from a buffer.
+
+        :param buffer: The file content, normally a mmap.
+        :param offset: Position of the first range header.
+        :param range_cnt: Number of ranges recorded in the file header.
+        :return: RangeTable
+        """
+        size = len(buffer)
+        header_len = RANGE_HEADER_V3.itemsize
+        # Only the STEPS and the supplementary header size are needed to
+        # find the next range.
+        head_offsets = np.empty(range_cnt, dtype=np.int64)
+        data_offsets = np.empty(range_cnt, dtype=np.int64)
+        steps_l = np.empty(range_cnt, dtype=np.int64)
+        pos = offset
+        for idx in range(range_cnt):
+            if pos + header_len > size:
+                raise Exception("Unexpected end of file.")
+            steps, = struct.unpack_from('<I', buffer, pos + 4)
+            supp_size, = struct.unpack_from('<I', buffer, pos + 256)
+            head_offsets[idx] = pos
+            data_offsets[idx] = pos + header_len + supp_size
+            steps_l[idx] = steps
+            pos = data_offsets[idx] + 4 * steps
+
+        strides = np.diff(head_offsets)
+        if range_cnt > 1 and np.all(strides == strides[0]):
+            stride = int(strides[0])
+        elif range_cnt == 1:
+            stride = int(pos - head_offsets[0])
+        else:
+            stride = None
+
+        if stride is not None:
+            header = np.ndarray(
+                shape=(range_cnt,), dtype=RANGE_HEADER_V3, buffer=buffer,
+                offset=int(head_offsets[0]), strides=(stride,))
+        else:
+            header = RANGE_SCHEMA_V3.records(buffer, head_offsets)
+
+        if (stride is not None and pos <= size and
+                np.all(steps_l == steps_l[0]) and np.all(
+                    data_offsets - head_offsets == data_offsets[0] - offset)):
+            intensity = np.ndarray(
+                shape=(range_cnt, int(steps_l[0])), dtype='<f4',
+                buffer=buffer, offset=int(data_offsets[0]),
+                strides=(stride, 4))
+            return cls(header, intensity, buffer=buffer)
+
+        # Ragged ranges, or a truncated file where the last range is cut at
+        # the end of the buffer.
+        steps_l = np.clip(
+            np.minimum(steps_l, (size - data_offsets) // 4), 0, None)
+
+        return cls(
+            header, buffer=buffer, data_offsets=data_offsets, steps=steps_l)
+
+    @classmethod
+    def from_file(cls, file_handle, range_cnt):
+        """Read only the range headers of a RAW1.01 file.
+
+        :param file_handle: File positioned at the first range header.
+        :param range_cnt: Number of ranges recorded in the file header.
+        :return: RangeTable without intensity.
+        """
+        header_len = RANGE_HEADER_V3.itemsize
+        chunks = []
+        for _ in range(range_cnt):
+            chunk = file_handle.read(header_len)
+            if len(chunk) < header_len:
+                raise Exception("Unexpected end of file.")
+            steps, = struct.unpack_from('<I', chunk, 4)
+            supp_size, = struct.unpack_from('<I', chunk, 256)
+            chunks.append(chunk)
+            file_handle.seek(supp_size + 4 * steps, os.SEEK_CUR)
+
+        return cls(np.frombuffer(b''.join(chunks), dtype=RANGE_HEADER_V3))
+
+    @classmethod
+    def from_records(cls, records, buffer, data_offsets, step_code=None):
+        """Build the table from the range headers of another version.
+
+        :param records: Structured array, the fields sharing a name with
+        RANGE_HEADER_V3 are copied, the others are left to 0.
+        :param buffer: The file content.
+        :param data_offsets: Position of the intensity block of each range.
+        :param step_code: The _STEPPING_DRIVE_CODE of all the ranges, for
+        the versions which do not record it.
+        :return: RangeTable
+        """
+        header = np.zeros(len(records), dtype=RANGE_HEADER_V3)
+        if step_code is not None:
+            header['_STEPPING_DRIVE_CODE'] = step_code
+        for k in records.dtype.names:
+            if k in RANGE_HEADER_V3.names:
+                header[k] = records[k]
+        data_offsets = np.asarray(data_offsets, dtype=np.int64)
+        steps = np.clip(np.minimum(
+            header['STEPS'].astype(np.int64),
+            (len(buffer) - data_offsets) // 4), 0, None)
+
+        return cls(
+            header, buffer=buffer, data_offsets=data_offsets, steps=steps)
+
+    @classmethod
+    def from_scans(cls, scans):
+        """Build the table from the ScanBulk list of parser_file."""
+        header = np.zeros(len(scans), dtype=RANGE_HEADER_V3)
+        for idx, scan in enumerate(scans):
+            for k in header.dtype.names:
+                if k in scan.header:
+                    header[k][idx] = scan.header[k]
+        steps = np.asarray([len(i.intensity) for i in scans], dtype=np.int64)
+        data_offsets = 4 * np.concatenate(([0], np.cumsum(steps)[:-1]))
+        buffer = np.concatenate(
+            [np.asarray(i.intensity, dtype='<f4') for i in scans] +
+            [np.empty(0, dtype='<f4')])
+
+        return cls(
+            header, buffer=buffer.tobytes(), data_offsets=data_offsets,
+            steps=steps)
+
+    def scans(self):
+        """The ranges as a list of ScanBulk."""
+        return [
+            ScanBulk.from_header(
+                {k: record[k].item() for k in RANGE_HEADER_V3.names
+                 if k not in ('HEADER_LEN', 'SUPPLEMENTARY_HEADERS_SIZE')},
+                tuple(np.frombuffer(
+                    self.buffer, dtype='<f4', count=int(count),
+                    offset=int(offset)).tolist()))
+            for record, offset, count in zip(
+                self.header, self.data_offsets, self.steps)
+        ]
+
+    def row(self, index):
+        """The intensity of one range, with its own number of steps.
+
+        :param index: The index of the range.
+        :return: 1-D float64 array.
+        """
+        if self.intensity is not None:
+            return self.intensity[index].astype(np.float64)
+        return np.frombuffer(
+            self.buffer, dtype='<f4', count=int(self.steps[index]),
+            offset=int(self.data_offsets[index])).astype(np.float64)
+
+    def to_array(self, step_time=1.):
+        """Intensity per second of all the ranges as a 2-D float array.
+
+        The output is allocated once, short ranges are padded with 0 to the
+        length of the first range.
+        :param step_time: The counting time of each step.
+        :return: ndarray with shape (ranges, steps)
+        """
+        if self.intensity is not None:
+            return np.divide(self.intensity, step_time, dtype=np.float64)
+
+        width = int(self.steps[0]) if len(self) else 0
+        data = np.zeros((len(self), width), dtype=np.float64)
+        steps = np.minimum(self.steps, width)
+        for idx, (offset, count) in enumerate(zip(self.data_offsets, steps)):
+            data[idx, :count] = np.frombuffer(
+                self.buffer, dtype='<f4', count=int(count), offset=int(offset))
+        data /= step_time
+
+        return data
+
 
 class ScanBulk(object):
     """Record each scan in the raw file."""
 
     def __init__(self, file_handle):
-        header = {}
-        header_len = struct.unpack('I', file_handle.read(4))[0]  # address 0
-        assert header_len == 304
-        header["STEPS"] = struct.unpack('I', file_handle.read(4))[0]
-        header["OMEGA"] = struct.unpack('d', file_handle.read(8))[0]
-        header["TWOTHETA"] = struct.unpack('d', file_handle.read(8))[0]
-        header["KHI"] = struct.unpack('d', file_handle.read(8))[0]
-        header["PHI"] = struct.unpack('d', file_handle.read(8))[0]
-        header["X"] = struct.unpack('d', file_handle.read(8))[0]
-        header["Y"] = struct.unpack('d', file_handle.read(8))[0]
-        header["Z"] = struct.unpack('d', file_handle.read(8))[0]
-        file_handle.seek(8, os.SEEK_CUR)  # address 64
-        file_handle.seek(6, os.SEEK_CUR)  # address 72
-        file_handle.seek(2, os.SEEK_CUR)  # address 78
-        file_handle.seek(8, os.SEEK_CUR)  # (R8) variable antiscat.
-        file_handle.seek(6, os.SEEK_CUR)  # address 88
-        # unused                   # address 94
-        file_handle.seek(2, os.SEEK_CUR)
-        header["DETECTOR"] = struct.unpack('I', file_handle.read(4))[0]
-        header["HIGH_VOLTAGE"] = struct.unpack('f', file_handle.read(4))[0]
-        header["AMPLIFIER_GAIN"] = struct.unpack('f', file_handle.read(4))[0]
-        header["DISCRIMINATOR_1_LOWER_LEVEL"] = struct.unpack(
-            'f', file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # address 112
-        file_handle.seek(4, os.SEEK_CUR)  # address 116
-        file_handle.seek(8, os.SEEK_CUR)  # address 120
-        file_handle.seek(4, os.SEEK_CUR)  # address 128
-        file_handle.seek(4, os.SEEK_CUR)  # address 132
-        file_handle.seek(5, os.SEEK_CUR)  # address 136
-        # unused                   # address 141
-        file_handle.seek(3, os.SEEK_CUR)
-        header["AU1"] = struct.unpack('d', file_handle.read(8))[0]
-        header["AU2"] = struct.unpack('d', file_handle.read(8))[0]
-        header["AU3"] = struct.unpack('d', file_handle.read(8))[0]
-        header["SCAN_MODE"] = struct.unpack('I', file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # address 176
-        header["STEP_SIZE"] = struct.unpack('d', file_handle.read(8))[0]
-        header["STEP_SIZE_B"] = struct.unpack('d', file_handle.read(8))[0]
-        header["STEP_TIME"] = struct.unpack('f', file_handle.read(4))[0]
-        header["_STEPPING_DRIVE_CODE"] = struct.unpack('I',
-                                                       file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # address 204
-        header["ROTATION_SPEED [rpm]"] = struct.unpack('f',
-                                                       file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # address 212
-        header["TEMP_RATE"] = struct.unpack('f', file_handle.read(4))[0]
-        header["TEMP_DELAY"] = struct.unpack('f', file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)
-        header["GENERATOR_VOLTAGE"] = struct.unpack('f',
-                                                    file_handle.read(4))[0]
-        header["GENERATOR_CURRENT"] = struct.unpack('f',
-                                                    file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # address 232
-        # unused                  # address 236
-        file_handle.seek(4, os.SEEK_CUR)
-        header["USED_LAMBDA"] = struct.unpack('d', file_handle.read(8))[0]
-        header['_VARYINGPARAMS'] = struct.unpack('I', file_handle.read(4))[0]
-        header['_DATUM_LENGTH'] = struct.unpack('I', file_handle.read(4))[0]
-        supplementary_headers_size = struct.unpack('I', file_handle.read(4))[0]
-        file_handle.seek(4, os.SEEK_CUR)  # address 260
-        file_handle.seek(4, os.SEEK_CUR)  # address 264
-
-        file_handle.seek(4, os.SEEK_CUR)  # address 268
-        file_handle.seek(8, os.SEEK_CUR)  # address 272
-        file_handle.seek(24, os.SEEK_CUR)  # address 280
+        header = RANGE_SCHEMA_V3.unpack(
+            file_handle.read(RANGE_SCHEMA_V3.itemsize))
+        assert header.pop('HEADER_LEN') == 304
+        supplementary_headers_size = header.pop('SUPPLEMENTARY_HEADERS_SIZE')
         if supplementary_headers_size:
             file_handle.seek(supplementary_headers_size, os.SEEK_CUR)
-        self.intensity = struct.unpack(
+        intensity = struct.unpack(
             str(header["STEPS"]) + "f", file_handle.read(4 * header["STEPS"]))
+        self._set(header, intensity)
+
+    @classmethod
+    def from_header(cls, header, intensity):
+        """Build the scan from a decoded header dict."""
+        scan = cls.__new__(cls)
+        scan._set(header, intensity)
+        return scan
+
+    def _set(self, header, intensity):
+        self.intensity = intensity
         self.header = header
         for k, value in header.items():
             setattr(self, k, value)
@@ -1,10 +1,10 @@
 import matplotlib.pyplot as plt
-import numpy as np
 from PyQt5 import QtCore, QtWidgets, QtGui
 from matplotlib.backends.backend_qt5agg import (
     FigureCanvasQTAgg as FigureCanvas)
 
 from module.Module import ProcModule
+from module.engine.AFMEngine import AFMEngine
 
 
 class TwoDAFMProc(ProcModule):
@@ -87,54 +87,12 @@ class TwoDAFMProc(ProcModule):
         return self.plot_widget
 
     def _align_rows(self, repaint=True):
-        int_m = self.data
-        mask_m = [[np.median(int_m[i])] * len(int_m[0])
-                  for i in range(len(int_m))]
-
-        mask_m = np.asanyarray(mask_m)
-
-        self.data = int_m - mask_m
+        self.data = AFMEngine(self.data).align_rows()
         if repaint:
             self.refresh_canvas.emit(True)
 
     def _sub_bk(self, repaint=True):
-        import scipy.linalg
-        int_m = self.data
-        x, y = int_m.shape
-        # regular grid covering the domain of the data
-        x, y = np.meshgrid(np.arange(0, int(x), 1),
-                           np.arange(0, int(y), 1))
-        xx = x.flatten()
-        yy = y.flatten()
-        data = np.c_[xx, yy, int_m.flatten()]
-
-        order = 2  # 1: linear, 2: quadratic
-        if order == 1:
-            # best-fit linear plane
-            A = np.c_[data[:, 0], data[:, 1], np.ones(data.shape[0])]
-            C, _, _, _ = scipy.linalg.lstsq(A, data[:, 2])  # coefficients
-
-            Z = np.dot(
-                np.c_[xx, yy, np.ones(xx.shape)], C).reshape(int_m.shape)
-
-        elif order == 2:
-            # best-fit quadratic curve
-            A = np.c_[
-                np.ones(data.shape[0]),
-                data[:, :2],
-                np.prod(data[:, :2], axis=1),
-                data[:, :2] ** 2]
-            C, _, _, _ = scipy.linalg.lstsq(A, data[:, 2])
-
-            # evaluate it on a grid
-            Z = np.dot(
-                np.c_[np.ones(xx.shape), xx, yy, xx * yy, xx ** 2, yy ** 2],
-                C).reshape(int_m.shape)
-        else:
-            return
-
-        # return int_m - Z
-        self.data = int_m - Z
+        self.data = AFMEngine(self.data).sub_bk(order=2)
         if repaint:
             self.refresh_canvas.emit(True)
 
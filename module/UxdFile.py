@@ -1,5 +1,3 @@
-import re
-
 import numpy as np
 
 from module.Module import FileModule
@@ -22,30 +20,19 @@ class UxdFile(FileModule):
 
     def get_data(self):
         with open(self.file, 'r') as file_handle:
-            data_list = [line.strip() for line in file_handle]
-        from itertools import groupby, filterfalse
-
-        data_list = [
-            list(g) for k, g in groupby(data_list, lambda x: x.startswith(";"))
-        ]
-        data_list = list(
-            filterfalse(lambda x: x[0].startswith(";"), data_list)
-        )
-
-        header = {
-            i.split('=')[0].strip(): i.split('=')[1].strip()
-            for i in data_list[0] if i.startswith("_")
-        }
+            data_list = self.read_blocks(file_handle)
+
+        header = dict(data_list[0][0])
         attr = {}
         if "_TYPE" in header:
             data_list = data_list[1:]
         else:
             data_list = data_list[4:]
 
-            for k in data_list[0]:
+            for k, value in data_list[0][0]:
                 if k.startswith("_DRIVE"):
-                    driver = k.split('=')[1]
-            if re.search("psd", driver.lower()):
+                    driver = value
+            if "psd" in driver.lower():
                 header['_TYPE'] = 'RSMPlot'
                 header['_STEPPING_DRIVE1'] = 'OMEGA'
                 header['_STEPPING_DRIVE2'] = TBL_STEPPING_DRIVERS[driver]
@@ -114,29 +101,61 @@ class UxdFile(FileModule):
 
         return data, attr
 
+    @staticmethod
+    def read_blocks(file_handle):
+        """Split the file into the blocks between the comment lines.
+
+        Each block is a tuple of its "_KEY=value" pairs, in file order, and
+        of its numeric rows as a 2D ndarray. Only one pass is done over the
+        file and the rows of a block are converted in one call.
+        """
+        blocks = []
+        pairs, rows, in_block = [], [], False
+        for line in file_handle:
+            line = line.strip()
+            if line.startswith(";"):
+                if in_block:
+                    blocks.append((pairs, UxdFile._rows2array(rows)))
+                    pairs, rows, in_block = [], [], False
+                continue
+            in_block = True
+            if line.startswith("_"):
+                key, _, value = line.partition('=')
+                pairs.append((key.strip(), value.strip()))
+            elif line[:1].isdigit() or line.startswith("-"):
+                rows.append(line)
+        if in_block:
+            blocks.append((pairs, UxdFile._rows2array(rows)))
+        return blocks
+
+    @staticmethod
+    def _rows2array(rows):
+        if not rows:
+            return np.empty((0, 0))
+        values = np.fromstring(" ".join(rows), sep=" ")
+        if values.size % len(rows):
+            raise ValueError("Inconsistent number of columns.")
+        return values.reshape(len(rows), -1)
+
     @staticmethod
     def two_d_data(data_list, index):
-        try:
-            data = [[
-                float(j.split('\t')[index]) for j in value
-                if (re.match('\d', j) or j.startswith("-"))
-            ] for value in data_list]
-        except (ValueError, IndexError):
-            data = [
-                [float(j.split()[index]) for j in value
-                 if (re.match('\d', j) or j.startswith("-"))]
-                for value in data_list]
-        data = [i for i in data if i]
+        data = [value[:, index] for _, value in data_list if value.size]
         data = np.asanyarray(data)
         return data
 
     @staticmethod
     def one_d_data(data_list, key_word):
-        # one_d_data([["A=0"], ["B=3"], ["A=1"]], "A") -> array([0, 1])
-        data = [
-            [float(j.split('=')[1]) for j in value if j.startswith(key_word)]
-            for value in data_list]
-        data = np.asarray([i[0] if len(i) > 0 else 0 for i in data])
+        # one_d_data([([("A", "0")], ...), ([("B", "3")], ...),
+        #     ([("A", "1")], ...)], "A") -> array([0, 0, 1])
+        data = []
+        for pairs, _ in data_list:
+            for key, value in pairs:
+                if key == key_word:
+                    data.append(float(value))
+                    break
+            else:
+                data.append(0)
+        data = np.asarray(data)
         return data
 
 
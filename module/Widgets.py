@@ -0,0 +1,37 @@
+"""Input widgets shared by the processors."""
+from functools import partial
+
+from PyQt5 import QtWidgets, QtGui
+
+
+class IntensityInputWidget(QtWidgets.QVBoxLayout):
+    def __init__(self, linked_param):
+        super().__init__()
+
+        self._int_line_edit = QtWidgets.QLineEdit(
+            str(linked_param['BEAM_INT']))
+        self._int_line_edit.textChanged.connect(
+            partial(linked_param.__setitem__, 'BEAM_INT'))
+        q_int_button = self._int_line_edit.addAction(
+            QtGui.QIcon(QtGui.QPixmap('icons/more.png')),
+            QtWidgets.QLineEdit.TrailingPosition
+        )
+        q_int_button.triggered.connect(self._get_beam_intensity)
+
+        self.addWidget(QtWidgets.QLabel("Beam Intensity"))
+        self.addWidget(self._int_line_edit)
+
+    def _get_beam_intensity(self):
+        from module.engine.CalibrationEngine import BEAM_CALIBRATION
+
+        file_names = QtWidgets.QFileDialog.getOpenFileNames(
+            caption='Open intensity file...',
+            directory="/",
+            filter="Raw file (*.raw)"
+        )
+        source_file_list = file_names[0]
+        if not source_file_list:
+            return
+        beam_int = BEAM_CALIBRATION.beam_intensity(
+            [str(i) for i in source_file_list])
+        self._int_line_edit.setText(str(beam_int))
@@ -0,0 +1,64 @@
+"""Leveling of the AFM images, without Qt."""
+import numpy as np
+
+
+class AFMEngine(object):
+    """The computations of TwoDAFMProc on a 2D height map."""
+
+    def __init__(self, data=None):
+        self.data = None if data is None else np.asarray(data[()])
+
+    def align_rows(self):
+        """Subtract the median of each row."""
+        int_m = self.data
+        mask_m = [[np.median(int_m[i])] * len(int_m[0])
+                  for i in range(len(int_m))]
+
+        mask_m = np.asanyarray(mask_m)
+
+        self.data = int_m - mask_m
+
+        return self.data
+
+    def sub_bk(self, order=2):
+        """
+        Subtract the best-fit plane or quadratic surface.
+        :param order: 1: linear, 2: quadratic
+        """
+        import scipy.linalg
+        int_m = self.data
+        x, y = int_m.shape
+        # regular grid covering the domain of the data
+        x, y = np.meshgrid(np.arange(0, int(x), 1),
+                           np.arange(0, int(y), 1))
+        xx = x.flatten()
+        yy = y.flatten()
+        data = np.c_[xx, yy, int_m.flatten()]
+
+        if order == 1:
+            # best-fit linear plane
+            A = np.c_[data[:, 0], data[:, 1], np.ones(data.shape[0])]
+            C, _, _, _ = scipy.linalg.lstsq(A, data[:, 2])  # coefficients
+
+            Z = np.dot(
+                np.c_[xx, yy, np.ones(xx.shape)], C).reshape(int_m.shape)
+
+        elif order == 2:
+            # best-fit quadratic curve
+            A = np.c_[
+                np.ones(data.shape[0]),
+                data[:, :2],
+                np.prod(data[:, :2], axis=1),
+                data[:, :2] ** 2]
+            C, _, _, _ = scipy.linalg.lstsq(A, data[:, 2])
+
+            # evaluate it on a grid
+            Z = np.dot(
+                np.c_[np.ones(xx.shape), xx, yy, xx * yy, xx ** 2, yy ** 2],
+                C).reshape(int_m.shape)
+        else:
+            return self.data
+
+        self.data = int_m - Z
+
+        return self.data
@@ -0,0 +1,110 @@
+"""Background intensity of the 2D maps, without Qt.
+
+All estimators ignore NaN and keep their memory bounded by the size of the
+map, whatever its intensity range.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+# Largest number of histogram bins used by bk_mode.
+MAX_BINS = 4096
+
+
+def _finite(data):
+    data = np.asarray(data, dtype=np.float64).ravel()
+    return data[np.isfinite(data)]
+
+
+def bk_mode(data, max_bins=MAX_BINS):
+    """The most frequent intensity, at a resolution of one count.
+
+    The unit bins are counted in groups of at most max_bins, then the unit
+    bins of the groups, most populated first, while a group holds at least
+    as many points as the best unit bin so far. So a strong peak does not
+    need one bin per count up to its maximum. The result is the lower edge
+    of the bin, as np.histogram(data, bins=int(max - min)).
+
+    :param data: The intensity map.
+    :param max_bins: The largest number of bins counted at once.
+    :return: float
+    """
+    data = _finite(data)
+    if not data.size:
+        return np.nan
+    lo, hi = data.min(), data.max()
+    n_bins = int(hi - lo)
+    if n_bins < 1:
+        return lo
+    width = (hi - lo) / n_bins
+    index = ((data - lo) * (n_bins / (hi - lo))).astype(np.intp)
+    np.minimum(index, n_bins - 1, out=index)
+
+    factor = -(-n_bins // max_bins)
+    if factor == 1:
+        return lo + np.argmax(np.bincount(index)) * width
+
+    groups = index // factor
+    group_count = np.bincount(groups)
+    best_count, best_bin = 0, n_bins
+    for group in np.argsort(-group_count, kind='stable'):
+        if group_count[group] < best_count:
+            break
+        count = np.bincount(index[groups == group] - group * factor)
+        unit_bin = group * factor + np.argmax(count)
+        # On a tie the lowest bin is kept, as np.argmax on all the bins.
+        if count.max() > best_count or (
+                count.max() == best_count and unit_bin < best_bin):
+            best_count, best_bin = count.max(), unit_bin
+    return lo + best_bin * width
+
+
+def bk_sigma_clip(data, sigma=3., max_iter=5):
+    """The median of the intensities within sigma standard deviations of
+    the median, iterated until no point is rejected.
+
+    :return: float
+    """
+    data = _finite(data)
+    if not data.size:
+        return np.nan
+    for _ in range(max_iter):
+        median = np.median(data)
+        kept = data[np.abs(data - median) <= sigma * data.std()]
+        if not kept.size or kept.size == data.size:
+            break
+        data = kept
+    return np.median(data)
+
+
+def bk_percentile(data, q=50.):
+    """The q-th percentile of the intensities.
+
+    :return: float
+    """
+    data = _finite(data)
+    if not data.size:
+        return np.nan
+    return np.percentile(data, q)
+
+
+BK_METHODS = OrderedDict([
+    ("Mode", bk_mode),
+    ("Sigma clip", bk_sigma_clip),
+    ("Percentile", bk_percentile),
+])
+
+
+def background(data, method="Mode", **kwargs):
+    """Estimate the background intensity of a map.
+
+    :param data: The intensity map.
+    :param method: A key of BK_METHODS.
+    :param kwargs: Passed to the estimator.
+    :return: float
+    """
+    try:
+        estimator = BK_METHODS[method]
+    except KeyError:
+        raise TypeError("Unknown background method {0}.".format(method))
+    return float(estimator(data, **kwargs))
@@ -0,0 +1,83 @@
+"""Beam intensity calibration from direct beam scans, without Qt.
+
+The maximum of each scan is kept by file path and modification time, so
+calibrating again against the same reference files does not read them.
+"""
+import logging
+import os
+import threading
+from concurrent import futures
+
+import numpy as np
+
+# Ratio of the beam intensity to the maximum of the attenuated direct beam.
+BEAM_FACTOR = 8940
+
+
+def direct_beam_max(file):
+    """The maximum intensity of a direct beam scan.
+
+    :param file: The path of the RAW file.
+    :return: float
+    """
+    from module.RawFile import RawFile
+    from module.engine.OneDScanEngine import OneDScanEngine
+
+    raw_file = RawFile()
+    raw_file.get_file(file)
+    data, attr = raw_file.get_data()
+    return float(OneDScanEngine(data, attr).get_max(mode='direct'))
+
+
+class BeamCalibration(object):
+    """Direct beam maxima of many files, read concurrently and cached."""
+
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers: The number of reading threads, default of
+        ThreadPoolExecutor if None.
+        """
+        self.max_workers = max_workers
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(file):
+        file = os.path.abspath(file)
+        return file, os.stat(file).st_mtime_ns
+
+    def maxima(self, files):
+        """The direct beam maximum of each file, in the order of files.
+
+        :param files: list of the paths of the RAW files.
+        :return: list of float
+        """
+        keys = [self._key(i) for i in files]
+        with self._lock:
+            missing = sorted(set(i for i in keys if i not in self._cache))
+        if missing:
+            logging.debug("Reading {0} direct beam files.".format(
+                len(missing)))
+            with futures.ThreadPoolExecutor(self.max_workers) as executor:
+                res = executor.map(direct_beam_max, [i[0] for i in missing])
+                res = dict(zip(missing, res))
+            with self._lock:
+                self._cache.update(res)
+        with self._lock:
+            return [self._cache[i] for i in keys]
+
+    def beam_intensity(self, files):
+        """The beam intensity calibrated on the mean of the maxima.
+
+        :param files: list of the paths of the RAW files.
+        :return: float
+        """
+        return float(np.mean(self.maxima(files)) * BEAM_FACTOR)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared by the widgets, so the cache lasts as long as the application.
+BEAM_CALIBRATION = BeamCalibration()
@@ -0,0 +1,208 @@
+"""Line shapes, fitting and baselines of the one dimension scans, without
+Qt."""
+import logging
+
+import numpy as np
+
+
+def gaussian_func(x, alpha, x0=0):
+    """ Return Gaussian line shape at x with HWHM alpha """
+    return np.sqrt(np.log(2) / np.pi) / alpha * np.exp(
+        -((x - x0) / alpha)**2 * np.log(2))
+
+
+def lorentzian_func(x, gamma, x0=0):
+    """ Return Lorentzian line shape at x with HWHM gamma """
+    return gamma / np.pi / ((x - x0)**2 + gamma**2)
+
+
+def voigt_func(x, alpha, gamma, x0=0):
+    """
+    Return the Voigt line shape at x with Lorentzian component HWHM
+    gamma and Gaussian component HWHM alpha.
+    """
+    from scipy.special import wofz
+    sigma = alpha / np.sqrt(2 * np.log(2))
+    wofz_v = np.real(
+        wofz((((x - x0) - 14.22) + 1j * gamma) / sigma / np.sqrt(2)))
+
+    return wofz_v / sigma / np.sqrt(2 * np.pi)
+
+
+def pseudo_voigt_func(x, alpha, gamma, mu, x0=0):
+    return mu * gaussian_func(x - x0, alpha) + (
+        1 - mu) * lorentzian_func(x - x0, gamma)
+
+
+FUN_DICT = {
+    'pseudo voigt': pseudo_voigt_func,
+    'voigt': voigt_func,
+    'lorentz': lorentzian_func,
+    'gaussian': gaussian_func,
+}
+
+
+def trapezoid(x, y):
+    """Integrate y over x with the trapezoidal rule."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return np.dot(np.diff(x), y[1:] + y[:-1]) / 2
+
+
+def linear_baseline(x, x_l, y_l, x_r, y_r):
+    """The line through (x_l, y_l) and (x_r, y_r), evaluated at x."""
+    return (y_r - y_l) / (x_r - x_l) * (np.asarray(x) - x_l) + y_l
+
+
+def poly_baseline(x, y, index, order=1):
+    """
+    The least squares polynomial through the points of index, evaluated
+    at x.
+    :param index: The indexes or the boolean mask of the background points.
+    :param order: The order of the polynomial.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    coef = np.polynomial.polynomial.polyfit(
+        x[index], np.asarray(y, dtype=np.float64)[index], order)
+    return np.polynomial.polynomial.polyval(x, coef)
+
+
+def centre(x, y):
+    """Shift x so that the maximum of y is at x = 0."""
+    return x - x[np.argmax(y)]
+
+
+class OneDScanEngine(object):
+    """The computations of OneDScanProc on a (2, n) array of x and y."""
+
+    def __init__(self, data=None, attr=None):
+        self.data = None
+        self.attr = {}
+        if data is not None:
+            self.set_data(data, attr)
+
+    def set_data(self, data, attr=None):
+        """Keep the points where the intensity is defined."""
+        data = np.asarray(data[()])
+        x = data[0, :][~np.isnan(data[1, :])]
+        y = data[1, :][~np.isnan(data[1, :])]
+        self.data = np.vstack((x, y))
+        self.attr = dict(attr or {})
+
+        return self
+
+    def binning(self, bin_width=5):
+        """Median of the intensity on bins of bin_width points."""
+        from scipy.stats import binned_statistic
+
+        y, _, _ = binned_statistic(
+            self.data[0, :],
+            self.data[1, :],
+            statistic='median',
+            bins=int(np.floor(len(self.data[1, :]) / bin_width)))
+        x = self.data[0, :][::bin_width]
+        f = lambda a, b: (len(a) > len(b) and (a[:len(b)], b)) or (a, b[:len(a)])
+        (x, y) = f(x, y)
+        self.data = np.vstack((x, y))
+
+        return self.data
+
+    def fit(self, fit_fun='pseudo voigt'):
+        """
+        Fit the y data with selected function.
+        :param fit_fun: The key of the line shape in FUN_DICT.
+        :return: x, the fitted y, (maximum, FWHM) of the fitted curve.
+        """
+        from scipy.optimize import curve_fit
+        from functools import partial
+
+        x = self.data[0, :]
+        y = self.data[1, :]
+
+        fit_fun = FUN_DICT[fit_fun]
+        x0 = self.x_shift_to_centre()
+        fit_fun = partial(fit_fun, x0=x0)
+        logging.debug("X shift value is %s" % -x0)
+
+        popt, pcov = curve_fit(fit_fun, x, y)
+
+        fun_max = fit_fun(0, *popt)
+        p = np.abs(fit_fun(x, *popt) - fun_max / 2).argsort()[:2]
+        fwhm = np.abs(x[p[0]] - x[p[1]])
+
+        return x, fit_fun(x, *popt), (fun_max, fwhm)
+
+    def sum(self):
+        """Integrated intensity with the trapezoidal rule."""
+        return trapezoid(self.data[0, :], self.data[1, :])
+
+    def filter(self):
+        """Butterworth filter of the intensity."""
+        from scipy import signal
+        arg = signal.butter(5, 0.1)
+        self.data[1, :] = signal.filtfilt(*arg, self.data[1, :], method="gust")
+
+        return self.data
+
+    def x_shift_to_centre(self):
+        return self.data[0, :][np.argmax(self.data[1, :])]
+
+    def _sub_baseline(self, diff):
+        self.data[1, :] -= diff
+        self.data[1, :] -= self.data[1, :].min()
+        self.data[0, :] = centre(self.data[0, :], self.data[1, :])
+
+        return self.data
+
+    def baseline(self, l_p, r_p):
+        """
+        Remove the line between the points nearest to l_p and r_p, and move
+        the maximum to x = 0.
+        """
+        if r_p < l_p:
+            l_p, r_p = r_p, l_p
+        x = self.data[0, :]
+        y = self.data[1, :]
+        y_l = y[np.abs(x - l_p).argmin()]
+        y_r = y[np.abs(x - r_p).argmin()]
+
+        return self._sub_baseline(linear_baseline(x, l_p, y_l, r_p, y_r))
+
+    def target(self, rg=50):
+        """
+        Remove the line between the points rg away from both ends, and move
+        the maximum to x = 0.
+        """
+        x = self.data[0, :]
+        y = self.data[1, :]
+
+        return self._sub_baseline(
+            linear_baseline(x, x[rg], y[rg], x[-rg], y[-rg]))
+
+    def poly_target(self, rg=50, order=2):
+        """
+        Remove the polynomial fitted on the rg points at both ends, and move
+        the maximum to x = 0.
+        """
+        x = self.data[0, :]
+        index = np.r_[:rg, x.size - rg:x.size]
+
+        return self._sub_baseline(
+            poly_baseline(x, self.data[1, :], index, order))
+
+    def get_max(self, mode='direct'):
+        """
+        :param mode: 'direct' for the maximum of the data, 'fit' for the
+        integrated intensity of the fitted pseudo voigt per second.
+        """
+        if mode == 'direct':
+            return np.max(self.data[1, :])
+        elif mode == 'fit':
+            self.target()
+            _, _, extra_res = self.fit(fit_fun='pseudo voigt')
+            try:
+                step_time = self.attr['_STEPTIME']
+            except KeyError:
+                step_time = 1
+            intensity = extra_res[0] * extra_res[1] / step_time
+            return intensity
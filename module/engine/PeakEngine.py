@@ -0,0 +1,105 @@
+"""Peak detection on the pole figures, without Qt.
+
+The candidates are kept as arrays: local maxima of the smoothed map, below
+a chi limit, scored on an integral image and pruned by non-maximum
+suppression, so the cost does not grow with Python objects per candidate.
+"""
+import numpy as np
+
+from module.engine.PolesFigureEngine import IntegralImage
+
+
+def box_limits(cr, sz, n):
+    """The limits of boxes of size sz centred on cr, clipped as Square.lim.
+
+    :param cr: Array of the centre positions on one axis.
+    :param sz: The size of the boxes on this axis.
+    :param n: The length of the axis.
+    :return: (min, max) arrays.
+    """
+    return (np.maximum(0, np.floor(cr - sz / 2).astype(np.intp)),
+            np.minimum(np.floor(cr + sz / 2).astype(np.intp), n))
+
+
+def box_score(integral, x, y, in_sz=(10, 10), out_sz=(20, 20)):
+    """The intensity of the outer boxes minus the background, estimated on
+    the ring between the inner and the outer boxes, as Square.__sub__.
+
+    :param integral: The IntegralImage of the map.
+    :param x: Array of the columns of the centres.
+    :param y: Array of the rows of the centres.
+    :return: Array of the intensities.
+    """
+    h, w = integral.shape
+    sums = []
+    points = []
+    for sz in (in_sz, out_sz):
+        x_min, x_max = box_limits(x, sz[0], w)
+        y_min, y_max = box_limits(y, sz[1], h)
+        sums.append(integral.sum(x_min, x_max, y_min, y_max))
+        points.append((x_max - x_min) * (y_max - y_min))
+    (in_int, out_int), (in_pt, out_pt) = sums, points
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bg_noise = (out_int - in_int) / (out_pt - in_pt)
+    return out_int - out_pt * bg_noise
+
+
+def non_max_suppression(x, y, score, n, min_distance):
+    """Keep the n best candidates, dropping those closer than min_distance
+    (in both directions) to a better one.
+
+    :return: The indexes of the kept candidates, best first.
+    """
+    score = np.where(np.isnan(score), -np.inf, score)
+    alive = np.ones(score.shape, dtype=bool)
+    kept = []
+    while len(kept) < n and alive.any():
+        i = np.argmax(np.where(alive, score, -np.inf))
+        kept.append(i)
+        alive &= ((np.abs(x - x[i]) >= min_distance) |
+                  (np.abs(y - y[i]) >= min_distance))
+    return np.asarray(kept, dtype=np.intp)
+
+
+def find_peaks(
+        int_m,
+        n=4,
+        sigma=4 * np.sqrt(3),
+        chi_max=40,
+        in_sz=(10, 10),
+        out_sz=(20, 20),
+        min_distance=None):
+    """
+    Find the n strongest peaks of a gridded pole figure.
+
+    The map is smoothed once with sigma, as three passes of sigma 4 would,
+    and only on the rows needed by the peaks below chi_max.
+    :param int_m: The gridded map, rows are chi and columns phi.
+    :param n: The number of peaks.
+    :param sigma: The sigma of the gaussian smoothing.
+    :param chi_max: The peaks are searched below this row.
+    :param in_sz: The size of the peak boxes.
+    :param out_sz: The size of the boxes including the background ring.
+    :param min_distance: The least distance between two peaks, half the
+    outer box by default.
+    :return: The [phi, chi] indexes, shape (k, 2) with k <= n, and the
+    intensities of the peaks, best first.
+    """
+    from scipy.ndimage import gaussian_filter, maximum_filter
+
+    int_m = np.asarray(int_m, dtype=np.float64)
+    # Rows reached by the outer boxes, plus the radius of the kernel so
+    # the smoothing of these rows does not see the cut.
+    n_rows = (chi_max + int(np.ceil(max(out_sz) / 2)) +
+              int(4 * sigma + 0.5) + 1)
+    int_m = gaussian_filter(int_m[:n_rows], sigma, mode='nearest')
+    local_max = maximum_filter(int_m, size=3) == int_m
+    local_max[chi_max:, :] = False
+    y, x = np.nonzero(local_max)
+
+    score = box_score(IntegralImage(int_m), x, y, in_sz, out_sz)
+    if min_distance is None:
+        min_distance = max(out_sz) / 2
+    kept = non_max_suppression(x, y, score, n, min_distance)
+
+    return np.stack((x[kept], y[kept]), axis=1), score[kept]
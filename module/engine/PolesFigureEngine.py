@@ -0,0 +1,481 @@
+"""Gridding and peak integration of the pole figures, without Qt."""
+import logging
+from collections import deque
+
+import numpy as np
+
+from module.engine.BackgroundEngine import background
+
+# Correction coefficients and intensity to volume fraction factors of the
+# micro-twins A, D, C, B.
+COR_EFF = [334.3835417, 437.8887181, 702.504497, 583.5963464]
+VF_FACTOR = [5.741E-05, 4.828E-05, 3.203E-05, 3.537E-05]
+
+
+def pf_limits(attr):
+    """
+    The phi and chi range of a pole figure.
+    :return: ver_min, ver_max (phi), hor_min, hor_max (chi).
+    """
+    try:
+        ver_min = int(attr['DRV_2'].min())
+        ver_max = int(attr['DRV_2'].max())
+        hor_min = int(attr['DRV_1'].min())
+        hor_max = int(attr['DRV_1'].max())
+    except KeyError:
+        ver_min = np.int64(attr['phi_min'])
+        ver_max = np.int64(attr['phi_max'])
+        hor_min = np.int64(attr['khi_min'])
+        hor_max = np.int64(attr['khi_max'])
+
+    return ver_min, ver_max, hor_min, hor_max
+
+
+def i_theory(i_0, v, theta, omega, th, index):
+    """
+
+    :param i_0: The source intensity
+    :param v: angular velocity
+    :param theta: tth/2(emergence angle)
+    :param omega: omega(incident angle)
+    :param th: thickness of sample
+    :param index: correction coefficient
+    :return:
+    """
+    RO2 = 7.94E-30  # scattering cross section of electron
+    LAMBDA = 1.5418E-10  # X-ray beam length
+    F_GAP = 12684.62554  # unit cell structure factor (GaP)
+    L = 1 / np.sin(2 * theta)  # Lorentz factor
+    P = (1 + np.cos(2 * theta) ** 2) / 2  # Polarization factor
+    V_A = 5.4506E-10 ** 3  # volume of the crystal
+    U = 1000000 / 37.6416  # mu
+    c_0 = (
+            np.sin(2 * theta - omega) /
+            (np.sin(2 * theta - omega) + np.sin(omega))
+    )
+    c_1 = (
+            1 -
+            np.exp(
+                - U * th / 1E10 *
+                (
+                        1 / np.sin(omega) + 1 / np.sin(2 * theta - omega)
+                )
+            )
+    )
+
+    c_2 = RO2 * LAMBDA ** 3 * F_GAP * P * L / V_A ** 2
+    i_theo = i_0 * c_0 * c_1 * c_2 * index / (v * U)
+
+    return i_theo
+
+
+def _nearest_index(x, x_min, x_max, n):
+    """
+    Index of the nearest of n points evenly spaced from x_min to x_max.
+    """
+    if n < 2 or x_max == x_min:
+        return np.zeros(len(x), dtype=np.intp)
+    index = np.rint((x - x_min) * ((n - 1) / (x_max - x_min)))
+    return np.clip(index, 0, n - 1).astype(np.intp)
+
+
+def region_stats(label_image, int_m):
+    """
+    The statistics of all labelled regions in one pass over the image.
+    :param label_image: The labels, 0 is the background.
+    :param int_m: The intensity map.
+    :return: dict of arrays, one value per label: 'label', 'area', 'sum' of
+    the intensity and intensity weighted 'centroid' as [col, row].
+    """
+    from scipy import ndimage
+
+    labels = np.arange(1, label_image.max() + 1)
+    area = np.bincount(label_image.ravel(), minlength=labels.size + 1)[1:]
+    int_sum = ndimage.sum_labels(int_m, label_image, labels)
+    centroid = np.asarray(
+        ndimage.center_of_mass(int_m, label_image, labels)).reshape(-1, 2)
+
+    return {
+        'label': labels,
+        'area': area,
+        'sum': np.asarray(int_sum, dtype=np.float64),
+        'centroid': centroid[:, ::-1],
+    }
+
+
+class PolesFigureEngine(object):
+    """The computations of PolesFigureProc on a (chi, phi) intensity map."""
+
+    def __init__(self, data=None, attr=None):
+        self.data = None
+        self.attr = {}
+        self.gridded_data = None
+        self._bk_int = {}
+        self._integral_image = None
+        if data is not None:
+            self.set_data(data, attr)
+
+    def set_data(self, data, attr=None):
+        self.data = np.asarray(data[()])
+        self.attr = dict(attr or {})
+        self.gridded_data = None
+        self._bk_int = {}
+        self._integral_image = None
+
+        return self
+
+    @property
+    def limits(self):
+        return pf_limits(self.attr)
+
+    def grid(self):
+        """
+        Nearest neighbour resampling of the map on the 1 degree grid of the
+        phi and chi range, computed once per data.
+
+        The measured points are evenly spaced between the limits, so the
+        nearest point is found on each axis by rounding, in linear time.
+        """
+        if self.gridded_data is None:
+            ver_min, ver_max, hor_min, hor_max = self.limits
+            h, v = self.data.shape
+            row = _nearest_index(np.arange(hor_min, hor_max + 1), hor_min,
+                                 hor_max, h)
+            col = _nearest_index(np.arange(ver_min, ver_max + 1), ver_min,
+                                 ver_max, v)
+            self.gridded_data = self.data[np.ix_(row, col)]
+            logging.info("Gridded")
+
+        return self.gridded_data
+
+    def integral_image(self):
+        """The IntegralImage of the gridded map, computed once per data."""
+        if self._integral_image is None:
+            self._integral_image = IntegralImage(self.grid())
+        return self._integral_image
+
+    def background_intensity(self, method="Mode"):
+        """
+        The background intensity of the gridded map, computed once per
+        method.
+        :param method: A key of BK_METHODS, default to the most frequent
+        intensity.
+        """
+        if method not in self._bk_int:
+            self._bk_int[method] = background(self.grid(), method)
+        return self._bk_int[method]
+
+    def poly_pk_integrate(self, bk_method="Mode"):
+        """
+        Integrate Peak intensity with polygon method.
+        :param bk_method: The background estimator, see BK_METHODS.
+        :return:
+        int_vsot_bg_m: The intensity of the peak without background 1*4 matrix
+        ind_l: The weighted centroid of each peak, [phi, chi] indexes as
+            sq_pk_search.
+        edge: The image of the peak edges, NaN elsewhere.
+        """
+        from scipy.ndimage import gaussian_filter
+        from skimage import img_as_float
+        from skimage.morphology import reconstruction
+        from skimage.measure import label
+        from skimage.filters import threshold_niblack
+        from skimage.segmentation import clear_border
+        from skimage.morphology import closing
+        try:
+            from skimage.morphology import footprint_rectangle
+        except ImportError:
+            # scikit-image < 0.25, square(3) is this footprint.
+            footprint_rectangle = lambda shape: np.ones(shape, dtype=np.uint8)
+        from skimage import feature
+
+        bk_int = self.background_intensity(bk_method)
+
+        image = img_as_float(self.grid())
+        ver_min, ver_max, hor_min, hor_max = self.limits
+
+        image = gaussian_filter(image, 1, mode='nearest')
+
+        h = 0.2
+        seed = image - h
+        mask = image
+        # Dilate image to remove noise.
+        dilated = reconstruction(seed, mask, method='dilation')
+        # Use local threshold to identify all the close area.
+        thresh = threshold_niblack(dilated, window_size=27, k=0.05)
+        # Select large closed area.
+        bw = closing(image > thresh, footprint_rectangle((3, 3)))
+        # Remove area connected to bord.
+        cleared = clear_border(bw)
+
+        # label area.
+        label_image = label(cleared)
+        l, w = image.shape
+        stats = region_stats(label_image, self.gridded_data)
+        int_sum = stats['sum'] - stats['area'] * bk_int
+        is_peak = (stats['area'] >= 100) & (int_sum > 0)
+        int_vsot_bg_m = int_sum[is_peak]
+        ind_l = [list(i) for i in stats['centroid'][is_peak]]
+
+        # Find the edge of peaks.
+        binary_img = np.isin(label_image, stats['label'][is_peak])
+        edges2 = feature.canny(binary_img, sigma=2)  # Find the edge.
+        edge = np.full([l, w], np.nan)  # Create new image and fill with nan.
+        edge[np.where(edges2 > 1e-2)] = 100000000  # Set edge to 1.
+
+        return int_vsot_bg_m, ind_l, edge
+
+    def sq_pk_integrate(self, sq_sz_l, outer_index_list=None,
+                        bk_method="Mode"):
+        """
+        Integrate Peak intensity with square method.
+        :param sq_sz_l: The size of the squares [sx, sy].
+        :param outer_index_list: The middle position of square. Used for set
+        up Square manually, searched by default.
+            Format: [[chi1, phi1], [chi2, phi2], [chi3, phi3], [chi4, phi4]]
+        :param bk_method: The background estimator, see BK_METHODS.
+        :return:
+        int_vsot_bg_m: The intensity of the peak without background 1*4 matrix
+        ind_l: The middle position of square. Same format as outer_index_list.
+        sq_ins_l: The Square instances.
+        """
+        ver_min, _, hor_min, _ = self.limits
+
+        if outer_index_list is not None:
+            ind_l = outer_index_list
+        else:
+            ind_l = self.sq_pk_search()
+        # Create Square instances.
+        in_sq_l = [
+            Square(
+                i,
+                sq_sz_l,
+                int_m=self.integral_image(),
+                lm_t=(ver_min, hor_min),
+                color='C3',
+            )
+            for i in ind_l
+        ]
+
+        logging.debug("Square size - {0}".format(sq_sz_l))
+        logging.debug("Square centre - {0}".format(ind_l))
+
+        bk_int = self.background_intensity(bk_method)
+
+        logging.info("Background Intensity: {0}".format(bk_int))
+
+        int_vsot_bg_m = np.asarray([i - bk_int for i in in_sq_l])
+
+        return int_vsot_bg_m, ind_l, in_sq_l
+
+    def sq_pk_search(self):
+        """
+        Search the four micro-twins peaks.
+        :return: list of [phi, chi] indexes, sorted as the ABCD micro-Twins.
+        """
+        from module.engine.PeakEngine import find_peaks
+
+        def sort_index_list(index_list):
+            """
+            Sort index list to fit ABCD micro-Twins, where chi of A is max.
+            :param index_list: list for each point with form [chi, khi]
+            :return: sorted list.
+            """
+            phi_sorted_l = sorted(index_list, key=lambda pair: pair[0])
+            chi_index_list = [l[1] for l in phi_sorted_l]
+            shifted_index_int = chi_index_list.index(max(chi_index_list))
+            phi_deque = deque(phi_sorted_l)
+            phi_deque.rotate(-shifted_index_int)
+            sorted_index_list = list(phi_deque)
+
+            logging.debug("index list before sort:{0}".format(index_list))
+            logging.debug(
+                "index list after sort:{0}".format(sorted_index_list)
+            )
+            return sorted_index_list
+
+        index, _ = find_peaks(self.grid(), n=4, chi_max=40)
+        ft_index_list = [list(i) for i in index]
+        ft_index_list = sort_index_list(ft_index_list)
+
+        while len(ft_index_list) < 4:
+            ft_index_list.append([0, 0])
+
+        return ft_index_list
+
+    @staticmethod
+    def int2fraction(int_vsot_bg_m, ind_l, th, bm_int, v):
+        """
+        Change the peak intensity to volume fraction.
+        :param int_vsot_bg_m: The intensity of the peaks without background.
+        :param ind_l: The position of the peaks [phi, chi].
+        :param th: The thickness of the sample.
+        :param bm_int: The beam intensity.
+        :param v: The angular velocity.
+        :return: The theoretical intensity and the volume fraction matrix.
+        """
+        omega = [
+            (np.pi / 2 - np.arccos(
+                np.cos(np.deg2rad(chi[1])) * np.sin(np.deg2rad(14.22))))
+            for chi in ind_l]
+
+        i_theo_l = [
+            i_theory(bm_int, v, i, i, th, k) for i, k in zip(omega, COR_EFF)]
+
+        # volume_fraction_matrix = int_vsot_bg_m / i_theo_l * 100
+        volume_fraction_matrix = int_vsot_bg_m * np.asarray(VF_FACTOR)
+
+        return i_theo_l, volume_fraction_matrix
+
+
+class IntegralImage(object):
+    """
+    Summed-area table of a 2D map, the sum over any rectangle is read in
+    O(1). NaN propagates to the rectangles which contain it, as np.sum.
+    """
+
+    def __init__(self, int_m):
+        int_m = np.asarray(int_m, dtype=np.float64)
+        self.shape = int_m.shape
+        nan_m = np.isnan(int_m)
+        self._table = self._cumsum(np.where(nan_m, 0, int_m))
+        self._nan_table = self._cumsum(nan_m) if nan_m.any() else None
+
+    @staticmethod
+    def _cumsum(int_m):
+        h, w = int_m.shape
+        table = np.zeros((h + 1, w + 1))
+        np.cumsum(int_m, axis=0, out=table[1:, 1:])
+        np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+        return table
+
+    @staticmethod
+    def _rect(table, x_min, x_max, y_min, y_max):
+        return (table[y_max, x_max] - table[y_min, x_max] -
+                table[y_max, x_min] + table[y_min, x_min])
+
+    def sum(self, x_min, x_max, y_min, y_max):
+        """
+        The sum of int_m[y_min:y_max, x_min:x_max], the limits could be
+        arrays of the same shape.
+        """
+        res = self._rect(self._table, x_min, x_max, y_min, y_max)
+        if self._nan_table is not None:
+            res = np.where(
+                self._rect(self._nan_table, x_min, x_max, y_min, y_max) > 0,
+                np.nan, res)
+        return res
+
+
+class Square(object):
+    def __init__(
+            self,
+            cr_l,
+            sz_t,
+            int_m=None,
+            lm_t=(0, 0),
+            color='b',
+    ):
+        self.cr_l = cr_l  # Centre position of the square
+        self.sz_t = sz_t  # Size of the square
+        self.int_m = int_m
+        self.lm_t = lm_t
+        self.color = color
+        self._fh = None
+
+    def lim(self):
+        if self.int_m is None:
+            x_min = self.cr_l[0] - self.sz_t[0] / 2
+            x_max = self.cr_l[0] + self.sz_t[0] / 2
+            y_min = self.cr_l[1] - self.sz_t[1] / 2
+            y_max = self.cr_l[1] + self.sz_t[1] / 2
+        else:
+            w, h = self.int_m.shape
+            x_min = max(0, int(np.floor(self.cr_l[0] - self.sz_t[0] / 2)))
+            x_max = min(int(np.floor(self.cr_l[0] + self.sz_t[0] / 2)), h)
+            y_min = max(0, int(np.floor(self.cr_l[1] - self.sz_t[1] / 2)))
+            y_max = min(int(np.floor(self.cr_l[1] + self.sz_t[1] / 2)), w)
+
+        return x_min, x_max, y_min, y_max
+
+    def plot(self, **kwargs):
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Rectangle
+        x_min, x_max, y_min, y_max = self.lim()
+        (x_lmt, y_lmt) = self.lm_t
+        self._fh = plt.gca().add_patch(
+            Rectangle(
+                xy=(x_min + x_lmt, y_min + y_lmt),
+                width=x_max - x_min,
+                height=y_max - y_min,
+                linewidth=1,
+                fill=False,
+                color=self.color,
+                **kwargs
+            )
+        )
+
+    def move(self, direction_tuple):
+        self.remove()
+        self.cr_l = [i + j for (i, j) in zip(self.cr_l, list(direction_tuple))]
+        self.plot()
+
+    @property
+    def intensity_image(self):
+        x_min, x_max, y_min, y_max = self.lim()
+        if self.int_m is None:
+            raise AttributeError("Need intensity matrix.")
+        if isinstance(self.int_m, IntegralImage):
+            return self.int_m.sum(x_min, x_max, y_min, y_max)
+        intensity_result_matrix = self.int_m[y_min:y_max, x_min:x_max]
+        peak_intensity_int = np.sum(intensity_result_matrix)
+
+        return peak_intensity_int
+
+    @property
+    def points(self):
+        x_min, x_max, y_min, y_max = self.lim()
+
+        return (y_max - y_min) * (x_max - x_min)
+
+    def remove(self):
+        """
+        Remove the the square _lines.
+        :return: None
+        """
+        try:
+            self._fh.remove()
+        except ValueError as e:
+            logging.debug(str(e))
+            logging.debug("Could not find the square.")
+
+    def __sub__(self, x):
+        if isinstance(x, Square):
+            pk_int = self.intensity_image
+            pk_pt = self.points
+            x_pk_int = x.intensity_image
+            x_pk_pt = x.points
+            bg_noise_float = (pk_int - x_pk_int) / (pk_pt - x_pk_pt)
+
+            return pk_int - pk_pt * bg_noise_float
+        elif isinstance(x, (float, int, np.integer, np.floating)):
+            pk_int = self.intensity_image
+            pk_pt = self.points
+            return pk_int - pk_pt * x
+        else:
+            return NotImplemented
+
+    def __contains__(self, item):
+        """
+        Check if the point is in the square.
+        :param item: the position of point [x,y].
+        :return: The boolean value.
+        """
+        x_min, x_max, y_min, y_max = self.lim()
+        (x_limit, y_limit) = self.lm_t
+        if (
+                x_min + x_limit < item[0] < x_max + x_limit and
+                y_min + y_limit < item[1] < y_max + y_limit):
+            return True
+        else:
+            return False
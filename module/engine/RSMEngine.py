@@ -0,0 +1,263 @@
+"""Q space mapping of the reciprocal space maps, without Qt."""
+import hashlib
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+LAMBDA = 0.154055911278
+
+# Number of regridded maps kept by rsm_regrid.
+RSM_CACHE_SIZE = 8
+_RSM_CACHE = OrderedDict()
+# Number of angular geometries, and of grids per geometry, whose
+# interpolation weights are kept.
+INTERPOLATOR_CACHE_SIZE = 2
+WEIGHTS_CACHE_SIZE = 4
+_INTERPOLATORS = OrderedDict()
+# Rendering modes of RSMProc, "Triangulation" and "Structured" regrid the
+# map, "Mesh" draws the measured grid as it is.
+RSM_MODES = ("Triangulation", "Structured", "Mesh")
+
+
+def _hash_arrays(*arrays):
+    sha = hashlib.sha1()
+    for i in arrays:
+        i = np.ascontiguousarray(i, dtype=np.float64)
+        sha.update(str(i.shape).encode())
+        sha.update(i.data)
+    return sha.hexdigest()
+
+
+def angle2q(tth, omega, omega_shift=0., is_phi_flip=False):
+    """Q coordinates of the (omega, two theta) grid.
+
+    :param tth: The two theta axis (deg).
+    :param omega: The omega axis (deg).
+    :param omega_shift: Subtracted from omega (deg).
+    :param is_phi_flip: Flip the Qx axis.
+    :return: s_x, s_z with the shape (omega, two theta).
+    """
+    tth, omega = np.meshgrid(tth, np.asarray(omega) - omega_shift)
+    s_mod = 4.*np.pi / LAMBDA * np.sin(np.radians(tth / 2.)) / 10
+    psi = omega - tth / 2.
+    s_x = s_mod * np.sin(np.radians(psi))
+    s_z = s_mod * np.cos(np.radians(psi))
+    return (-s_x if is_phi_flip else s_x), s_z
+
+
+def q2angle(s_x, s_z, omega_shift=0., is_phi_flip=False):
+    """Inverse of angle2q.
+
+    :return: two theta, omega (deg), NaN where out of reach.
+    """
+    s_x = -s_x if is_phi_flip else s_x
+    s_mod = np.hypot(s_x, s_z)
+    with np.errstate(invalid='ignore'):
+        tth = 2 * np.degrees(np.arcsin(s_mod * 10 * LAMBDA / (4. * np.pi)))
+    omega = np.degrees(np.arctan2(s_x, s_z)) + tth / 2. + omega_shift
+    return tth, omega
+
+
+def _fractional_index(axis, values):
+    """Fractional position of the values along a monotonic axis."""
+    index = np.arange(len(axis), dtype=np.float64)
+    if axis[0] > axis[-1]:
+        axis, index = axis[::-1], index[::-1]
+    return np.interp(values, axis, index, left=np.nan, right=np.nan)
+
+
+def rsm_structured(int_data, tth, omega, omega_shift=0., is_phi_flip=False,
+                   shape=None):
+    """Resample a RSM measured on a (omega, two theta) grid in Q space.
+
+    Each point of the regular Q grid is mapped back to (omega, two theta)
+    and the intensity is read by bilinear interpolation on the measured
+    grid, no triangulation is needed.
+
+    :return: xi, yi, zi, extent, zi is NaN outside the measured area.
+    """
+    tth = np.asarray(tth, dtype=np.float64)
+    omega = np.asarray(omega, dtype=np.float64)
+    int_data = np.asarray(int_data, dtype=np.float64)
+    s_x, s_z = angle2q(tth, omega, omega_shift, is_phi_flip)
+    w, h = tuple(shape or int_data.shape)
+    xi = np.linspace(s_x.min(), s_x.max(), w)
+    yi = np.linspace(s_z.min(), s_z.max(), h)
+    extent = (s_x.min(), s_x.max(), s_z.min(), s_z.max())
+
+    xx, yy = np.meshgrid(xi, yi)
+    tth_q, omega_q = q2angle(xx, yy, omega_shift, is_phi_flip)
+    f_row = _fractional_index(omega, omega_q)
+    f_col = _fractional_index(tth, tth_q)
+    mask = ~(np.isnan(f_row) | np.isnan(f_col))
+    f_row, f_col = f_row[mask], f_col[mask]
+
+    n_row, n_col = int_data.shape
+    row = np.minimum(f_row.astype(np.intp), max(n_row - 2, 0))
+    col = np.minimum(f_col.astype(np.intp), max(n_col - 2, 0))
+    t_row = f_row - row
+    t_col = f_col - col
+    row_1 = np.minimum(row + 1, n_row - 1)
+    col_1 = np.minimum(col + 1, n_col - 1)
+
+    zi = np.full(xx.shape, np.nan)
+    zi[mask] = (
+        (int_data[row, col] * (1 - t_col) + int_data[row, col_1] * t_col) *
+        (1 - t_row) +
+        (int_data[row_1, col] * (1 - t_col) + int_data[row_1, col_1] * t_col) *
+        t_row)
+    return xi, yi, zi, extent
+
+
+class RSMInterpolator(object):
+    """Linear interpolation of a RSM from the angular to the Q space.
+
+    The Delaunay triangulation of the measured points is built once for a
+    (two theta, omega) geometry. An omega shift rotates all the points
+    around the origin of the Q space and the phi flip mirrors them, so the
+    same triangulation is used with the query grid transformed back. The
+    barycentric weights of a query grid are kept as a sparse matrix, and
+    interpolating an intensity map is a matrix-vector product.
+    """
+
+    def __init__(self, tth, omega):
+        """
+        :param tth: The two theta axis (deg).
+        :param omega: The omega axis (deg), without shift.
+        """
+        from scipy.spatial import Delaunay
+
+        s_x, s_z = angle2q(tth, omega)
+        self.s_x = s_x.ravel()
+        self.s_z = s_z.ravel()
+        self.shape = s_x.shape
+        self.tri = Delaunay(np.column_stack((self.s_x, self.s_z)))
+        self._weights = OrderedDict()
+
+    def coordinates(self, omega_shift=0., is_phi_flip=False):
+        """The Q coordinates of the measured points.
+
+        :return: s_x, s_z, flatten.
+        """
+        cos, sin = np.cos(np.radians(omega_shift)), np.sin(
+            np.radians(omega_shift))
+        s_x = self.s_x * cos - self.s_z * sin
+        s_z = self.s_z * cos + self.s_x * sin
+        return (-s_x if is_phi_flip else s_x), s_z
+
+    def weights(self, omega_shift=0., is_phi_flip=False, shape=None):
+        """The interpolation weights of a regular grid of the Q space.
+
+        :param omega_shift: The omega shift (deg).
+        :param is_phi_flip: Flip the Qx axis.
+        :param shape: The (Qx, Qz) resolution, default to the data shape.
+        :return: xi, yi, weights as a sparse matrix, mask of the grid points
+        inside the measured area, extent.
+        """
+        from scipy import sparse
+
+        shape = tuple(shape or self.shape)
+        key = (float(omega_shift), bool(is_phi_flip), shape)
+        if key in self._weights:
+            self._weights.move_to_end(key)
+            return self._weights[key]
+
+        s_x, s_z = self.coordinates(omega_shift, is_phi_flip)
+        w, h = shape
+        xi = np.linspace(s_x.min(), s_x.max(), w)
+        yi = np.linspace(s_z.min(), s_z.max(), h)
+        extent = (s_x.min(), s_x.max(), s_z.min(), s_z.max())
+
+        # Back to the frame of the triangulation.
+        xx, yy = np.meshgrid(-xi if is_phi_flip else xi, yi)
+        cos, sin = np.cos(np.radians(omega_shift)), np.sin(
+            np.radians(omega_shift))
+        query = np.column_stack((
+            (xx * cos + yy * sin).ravel(), (yy * cos - xx * sin).ravel()))
+
+        simplex = self.tri.find_simplex(query)
+        mask = simplex >= 0
+        rows = np.flatnonzero(mask)
+        simplex = simplex[mask]
+        transform = self.tri.transform[simplex]
+        bary = np.einsum(
+            'nij,nj->ni', transform[:, :2], query[mask] - transform[:, 2])
+        bary = np.column_stack((bary, 1 - bary.sum(axis=1)))
+        weights = sparse.csr_matrix(
+            (bary.ravel(), (np.repeat(rows, 3),
+                            self.tri.simplices[simplex].ravel())),
+            shape=(len(query), len(self.s_x)))
+
+        self._weights[key] = (xi, yi, weights, mask.reshape(h, w), extent)
+        while len(self._weights) > WEIGHTS_CACHE_SIZE:
+            self._weights.popitem(last=False)
+        return self._weights[key]
+
+    def __call__(self, int_data, omega_shift=0., is_phi_flip=False,
+                 shape=None):
+        """Interpolate an intensity map on a regular grid of the Q space.
+
+        :return: xi, yi, zi, extent, zi is NaN outside the measured area.
+        """
+        xi, yi, weights, mask, extent = self.weights(
+            omega_shift, is_phi_flip, shape)
+        zi = weights.dot(np.ravel(int_data)).reshape(mask.shape)
+        zi[~mask] = np.nan
+        return xi, yi, zi, extent
+
+
+def get_interpolator(tth, omega):
+    """Get the RSMInterpolator of a geometry, reuse the last built ones."""
+    key = _hash_arrays(tth, omega)
+    if key in _INTERPOLATORS:
+        _INTERPOLATORS.move_to_end(key)
+    else:
+        _INTERPOLATORS[key] = RSMInterpolator(tth, omega)
+        while len(_INTERPOLATORS) > INTERPOLATOR_CACHE_SIZE:
+            _INTERPOLATORS.popitem(last=False)
+    return _INTERPOLATORS[key]
+
+
+def rsm_regrid(int_data, tth, omega, phi, shape=None, omega_shift=0.,
+               method="Triangulation"):
+    """Transform the RSM from angular space to a regular grid of Q space.
+
+    The results are cached on the data, angles, omega shift, phi sign and
+    resolution, the RSM_CACHE_SIZE last used are kept. The returned arrays
+    are read only, they are shared with the cache.
+
+    :param int_data: The intensity, omega along the first axis.
+    :param tth: The two theta axis (deg).
+    :param omega: The omega axis (deg).
+    :param phi: The phi angle (deg), the Qx axis is flipped if phi is ~0.
+    :param shape: The (Qx, Qz) resolution, default to the data shape.
+    :param omega_shift: Subtracted from omega (deg).
+    :param method: "Triangulation" for the linear interpolation of the
+    measured points, "Structured" for the bilinear lookup in the measured
+    grid, see rsm_structured.
+    :return: xi, yi, zi, extent
+    """
+    shape = tuple(shape or int_data.shape)
+    is_phi_flip = bool(abs(phi) < 2)
+    key = (_hash_arrays(int_data, tth, omega), float(omega_shift),
+           is_phi_flip, shape, method)
+    if key in _RSM_CACHE:
+        _RSM_CACHE.move_to_end(key)
+        logging.debug("Reuse the regridded RSM.")
+        return _RSM_CACHE[key]
+
+    if method == "Structured":
+        xi, yi, zi, extent = rsm_structured(
+            int_data, tth, omega, omega_shift, is_phi_flip, shape)
+    else:
+        xi, yi, zi, extent = get_interpolator(tth, omega)(
+            int_data, omega_shift, is_phi_flip, shape)
+
+    for i in (xi, yi, zi):
+        i.flags.writeable = False
+    _RSM_CACHE[key] = (xi, yi, zi, extent)
+    while len(_RSM_CACHE) > RSM_CACHE_SIZE:
+        _RSM_CACHE.popitem(last=False)
+
+    return _RSM_CACHE[key]
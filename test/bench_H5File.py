@@ -0,0 +1,84 @@
+"""Benchmark the storage profiles of H5File on the test data.
+
+Run from the repository root:
+    python -m test.bench_H5File [repeat]
+
+Every profile is used to write and read back the data of each test file,
+the throughput is reported in MB/s of uncompressed data with the ratio of
+the stored size.
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from module.H5File import H5File, STORAGE_PROFILES
+from module.RawFile import RawFile
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "test_data")
+# Codecs compared on top of the profiles.
+CODECS = {
+    'none': {'compression': None, 'shuffle': False},
+    'lzf': {'compression': "lzf", 'shuffle': False},
+    'lzf+shuffle': {'compression': "lzf", 'shuffle': True},
+    'gzip1+shuffle': {
+        'compression': "gzip", 'compression_opts': 1, 'shuffle': True},
+    'gzip4': {'compression': "gzip", 'compression_opts': 4},
+}
+
+
+def bench(data, attr, profile, repeat=5):
+    """Write and read the data with a profile.
+
+    :return: write MB/s, read MB/s, stored size / raw size
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lib = H5File()
+        lib.get_file(os.path.join(tmp_dir, "bench.h5"))
+        lib.fh.create_group("bench")
+
+        def write():
+            lib.set_data(data, attr, path="bench", name="data",
+                         is_force=True, profile=profile)
+            lib.fh.flush()
+
+        def read():
+            return lib.fh["bench/data"][()]
+
+        t_write = min(timeit.repeat(write, number=1, repeat=repeat))
+        t_read = min(timeit.repeat(read, number=1, repeat=repeat))
+        assert np.array_equal(read(), data)
+        ratio = lib.fh["bench/data"].id.get_storage_size() / data.nbytes
+        lib.fh.close()
+    mb = data.nbytes / 1e6
+    return mb / t_write, mb / t_read, ratio
+
+
+def main(repeat=5):
+    for file in sorted(os.listdir(DATA_DIR)):
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join(DATA_DIR, file))
+        data, attr = raw_file.get_data()
+        # The attributes are not benchmarked.
+        attr = {'TYPE': attr['TYPE']}
+        print("{0}: {1} {2}, {3:.2f} MB".format(
+            file, attr['TYPE'], data.shape, data.nbytes / 1e6))
+        profiles = dict(STORAGE_PROFILES)
+        for k, codec in CODECS.items():
+            profiles["rows/" + k] = dict(
+                STORAGE_PROFILES['default'], chunks="rows", **codec)
+        for k, profile in profiles.items():
+            chunks = H5File.chunk_shape(
+                data.shape, data.dtype.itemsize,
+                H5File.get_profile(attr, profile)['chunks'])
+            w, r, ratio = bench(data, attr, profile, repeat)
+            print("    {0:<18} chunks={1!s:<12} write {2:8.1f} MB/s  "
+                  "read {3:8.1f} MB/s  size {4:6.1%}".format(
+                      k, chunks, w, r, ratio))
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,76 @@
+"""Benchmark the import time of the program and of its plugins.
+
+Run from the repository root:
+    python -m test.bench_startup [repeat]
+
+Each statement is timed in a fresh interpreter, the median of the runs is
+reported. The exit status is 1 if the start up imports exceed
+STARTUP_BUDGET or load one of the LAZY_MODULES, which should only be
+imported when a scan is plotted.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported before the main window shows, H5File reads the library.
+STARTUP = "import Main, module.H5File"
+STARTUP_BUDGET = 0.6  # s
+LAZY_MODULES = ("matplotlib", "scipy", "skimage")
+STATEMENTS = [
+    ("python", "pass"),
+    ("startup", STARTUP),
+    ("RawFile", "import module.RawFile"),
+    ("engines", "import module.engine.OneDScanEngine, "
+                "module.engine.PolesFigureEngine, module.engine.RSMEngine"),
+    ("OneDScanProc", "import module.OneDScanProc"),
+    ("RSMProc", "import module.RSMProc"),
+    ("PolesFigureProc", "import module.PolesFigureProc"),
+    ("TwoDAFMProc", "import module.TwoDAFMProc"),
+]
+TIMER = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "{0}\n"
+    "t = time.perf_counter() - t\n"
+    "lazy = [i for i in {1!r} if i in sys.modules]\n"
+    "print(t, ','.join(lazy))\n"
+)
+
+
+def bench(statement, repeat=5):
+    """Time an import statement in fresh interpreters.
+
+    :return: median time (s), the lazy modules it loaded.
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", TIMER.format(statement, LAZY_MODULES)],
+            cwd=ROOT, env=env, universal_newlines=True)
+        t, _, lazy = out.strip().splitlines()[-1].partition(" ")
+        times.append(float(t))
+    return statistics.median(times), [i for i in lazy.split(",") if i]
+
+
+def main(repeat=5):
+    status = 0
+    for name, statement in STATEMENTS:
+        t, lazy = bench(statement, repeat)
+        print("{0:<16} {1:8.1f} ms  {2}".format(
+            name, t * 1e3, ", ".join(lazy)))
+        if statement == STARTUP:
+            if t > STARTUP_BUDGET:
+                print("Start up exceeds the budget of {0} s.".format(
+                    STARTUP_BUDGET))
+                status = 1
+            if lazy:
+                print("Start up imports {0}.".format(", ".join(lazy)))
+                status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(i) for i in sys.argv[1:2]]))
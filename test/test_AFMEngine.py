@@ -0,0 +1,28 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.engine.AFMEngine import AFMEngine
+
+
+class TestAFMEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_sub_bk(self):
+        x, y = np.meshgrid(np.arange(32), np.arange(32))
+        bk = 2 + 0.1 * x - 0.3 * y + 0.01 * x * y + 0.02 * x ** 2
+        engine = AFMEngine(bk)
+        np.testing.assert_allclose(engine.sub_bk(), 0, atol=1e-9)
+        np.testing.assert_allclose(engine.align_rows(), 0, atol=1e-9)
+
+    def test_align_rows(self):
+        data = np.random.RandomState(0).rand(8, 9)
+        res = AFMEngine(data + np.arange(8)[:, np.newaxis]).align_rows()
+        np.testing.assert_allclose(
+            res, data - np.median(data, axis=1)[:, np.newaxis])
+
+
+if __name__ == '__main__':
+    unittest.main()
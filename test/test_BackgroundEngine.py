@@ -0,0 +1,49 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.engine.BackgroundEngine import (
+    BK_METHODS, background, bk_mode, bk_percentile, bk_sigma_clip)
+
+
+class TestBackgroundEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_bk_mode(self):
+        rs = np.random.RandomState(0)
+        data = rs.poisson(40, (200, 300)).astype(np.float64)
+        n, bins = np.histogram(data, bins=int(data.max() - data.min()))
+        assert bk_mode(data) == bins[np.argmax(n)]
+
+        # A strong peak does not change the background, nor need a bin per
+        # count.
+        data[50:60, 100:110] = 1e7
+        data[0, 0] = np.nan
+        assert abs(bk_mode(data) - 40) <= 2
+        assert bk_mode(data, max_bins=16) == bk_mode(data)
+        assert bk_mode(np.full((3, 3), 5.)) == 5
+
+        # The most populated group of bins does not hold the mode.
+        data = np.r_[np.repeat(np.arange(245), 3), [6000.] * 200, [1e6]]
+        n, bins = np.histogram(data, bins=int(data.max() - data.min()))
+        assert bins[np.argmax(n)] == 6000
+        assert bk_mode(data) == 6000
+        assert bk_mode(data, max_bins=16) == 6000
+
+    def test_background(self):
+        rs = np.random.RandomState(0)
+        data = rs.normal(100, 5, (200, 300))
+        data[50:60, 100:110] = 1e5
+        assert abs(bk_sigma_clip(data) - 100) < 0.5
+        assert abs(bk_percentile(data) - 100) < 0.5
+        assert bk_percentile(data, 100) == 1e5
+        for i in BK_METHODS:
+            assert abs(background(data, i) - 100) < 2
+        with self.assertRaises(TypeError):
+            background(data, "Unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.engine.CalibrationEngine import (
+    BEAM_FACTOR, BeamCalibration, direct_beam_max)
+
+
+def write_beam_scan(file, intensity, step_time=2.):
+    """Write a RAW1.01 detector scan of the direct beam."""
+    head = bytearray(712)
+    head[:7] = b"RAW1.01"
+    struct.pack_into('<I', head, 12, 1)
+    range_head = bytearray(304)
+    struct.pack_into('<II', range_head, 0, 304, len(intensity))
+    struct.pack_into('<d', range_head, 16, -0.5)
+    struct.pack_into('<d', range_head, 176, 1. / len(intensity))
+    struct.pack_into('<fI', range_head, 192, step_time, 2)
+    with open(file, 'wb') as file_handle:
+        file_handle.write(bytes(head) + bytes(range_head) +
+                          np.asarray(intensity, dtype='<f4').tobytes())
+
+
+class TestCalibrationEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_beam_intensity(self):
+        x = np.linspace(-0.5, 0.5, 201)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = []
+            for i, amplitude in enumerate((40000, 50000, 60000)):
+                files.append(os.path.join(tmp_dir, "beam{0}.raw".format(i)))
+                write_beam_scan(
+                    files[-1], amplitude * np.exp(-x ** 2 / 0.001) + 10)
+            assert direct_beam_max(files[1]) == 25005
+
+            calibration = BeamCalibration(max_workers=2)
+            assert calibration.maxima(files) == [20005, 25005, 30005]
+            assert calibration.beam_intensity(files) == 25005 * BEAM_FACTOR
+
+            # Cached by path and modification time.
+            st = os.stat(files[0])
+            write_beam_scan(files[0], 80000 * np.exp(-x ** 2 / 0.001) + 10)
+            os.utime(files[0], ns=(st.st_atime_ns, st.st_mtime_ns))
+            assert calibration.maxima(files[:1]) == [20005]
+            os.utime(files[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+            assert calibration.maxima(files[:1]) == [40005]
+
+
+if __name__ == '__main__':
+    unittest.main()
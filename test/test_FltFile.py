@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.FltFile import FltFile
+
+
+class TestFltFile(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_get_data(self):
+        image = np.arange(12, dtype='<f4').reshape(3, 4) / 3
+        head = (
+            "[Parameter]\r\nResolutionX=3\r\nResolutionY=4\r\n"
+            "ScanRangeX=1.0\r\n[Data]\r\n"
+        ).encode('windows-1252')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "afm.flt")
+            with open(path, 'wb') as fp:
+                fp.write(head + image.tobytes())
+            FLT_FILE = FltFile()
+            FLT_FILE.get_file(path)
+            DATA, ATTR = FLT_FILE.get_data()
+        assert ATTR['ScanRangeX'] == '1.0'
+        assert ATTR['Type'] == 'raw_afm'
+        assert DATA.dtype == np.float64
+        assert np.array_equal(DATA, image)
+
+
+if __name__ == '__main__':
+    unittest.main()
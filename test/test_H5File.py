@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.H5File import H5File, INDEX_GROUP
+from module.RawFile import RawFile
+
+
+class TestH5File(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_set_data_profile(self):
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "002.raw"))
+        DATA, ATTR = RAW_FILE.get_data()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            LIB = H5File()
+            LIB.get_file(os.path.join(tmp_dir, "lib.h5"))
+            LIB.fh.create_group("grp")
+            LIB.set_data(DATA, ATTR, path="grp", name="002")
+            DT = LIB.fh["grp/002"]
+            # Whole omega scans in each chunk.
+            assert DT.chunks[1] == DATA.shape[1]
+            assert DT.compression == "lzf"
+            assert np.array_equal(DT[()], DATA)
+            assert DT.attrs['TYPE'] == 'RSMPlot'
+
+            LIB.set_data(DATA[0], {'TYPE': 'SingleScan'}, path="grp",
+                         name="scan", profile={'compression': None})
+            assert LIB.fh["grp/scan"].compression is None
+            self.assertRaises(
+                FileExistsError, LIB.set_data, DATA, ATTR, path="grp",
+                name="002")
+            LIB.fh.close()
+
+    def test_set_data_dedup(self):
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "PF.raw"))
+        DATA, ATTR = RAW_FILE.get_data()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            LIB = H5File()
+            LIB.get_file(os.path.join(tmp_dir, "lib.h5"))
+            for i in ("a", "b"):
+                LIB.fh.create_group(i)
+                LIB.set_data(DATA, ATTR, path=i, name="PF")
+            assert LIB.fh["b/PF"].is_virtual
+            assert np.array_equal(LIB.fh["b/PF"][()], LIB.fh["a/PF"][()])
+            assert len(LIB.fh[INDEX_GROUP]) == 1
+
+            ATTR['DRV_1'] = ATTR['DRV_1'] + 1
+            LIB.set_data(DATA, ATTR, path="b", name="PF2")
+            assert LIB.fh["a/PF"] != LIB.fh["b/PF2"]
+            assert len(LIB.fh[INDEX_GROUP]) == 2
+            LIB.fh.close()
+
+    def test_dedup_attrs(self):
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "PF.raw"))
+        DATA, ATTR = RAW_FILE.get_data()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            LIB = H5File()
+            LIB.get_file(os.path.join(tmp_dir, "lib.h5"))
+            for i in ("a", "b"):
+                LIB.fh.create_group(i)
+                LIB.set_data(DATA, ATTR, path=i, name="PF")
+            # The attributes of each sample are its own.
+            LIB.fh["a/PF"].attrs['TITLE'] = "edited a"
+            LIB.fh["b/PF"].attrs['TITLE'] = "edited b"
+            assert LIB.fh["a/PF"].attrs['TITLE'] == "edited a"
+
+            # The data stays while a sample maps it.
+            LIB.delete("a/PF")
+            assert len(LIB.fh[INDEX_GROUP]) == 1
+            assert np.array_equal(LIB.fh["b/PF"][()], DATA)
+            LIB.delete("b/PF")
+            assert len(LIB.fh[INDEX_GROUP]) == 0
+
+            # Re-importing does not bring back the deleted attributes.
+            LIB.set_data(DATA, ATTR, path="a", name="PF")
+            assert not LIB.fh["a/PF"].is_virtual
+            assert 'TITLE' not in LIB.fh["a/PF"].attrs
+            LIB.fh["a/PF"].attrs['TITLE'] = "edited again"
+            LIB.set_data(DATA, ATTR, path="b", name="PF")
+            assert 'TITLE' not in LIB.fh["b/PF"].attrs
+            assert np.array_equal(LIB.fh["b/PF"][()], DATA)
+
+            # Deleting a soft link or a group only releases what they held.
+            LIB.fh["a/link"] = LIB.h5py.SoftLink("/b/PF")
+            LIB.delete("a/link")
+            assert LIB.fh["b/PF"].is_virtual
+            LIB.set_data(DATA, ATTR, path="a", name="PF2")
+            LIB.delete("a")
+            assert len(LIB.fh[INDEX_GROUP]) == 1
+            LIB.delete("b")
+            assert len(LIB.fh[INDEX_GROUP]) == 0
+            assert not LIB.fh[INDEX_GROUP].attrs
+            LIB.fh.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
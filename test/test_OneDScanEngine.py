@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.engine.OneDScanEngine import (
+    OneDScanEngine, poly_baseline, trapezoid)
+
+
+class TestOneDScanEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_get_max(self):
+        x = np.linspace(-1, 1, 401)
+        y = 1000 * np.exp(-x ** 2 / 0.01) + 5 + 3 * x
+        y[10] = np.nan
+        engine = OneDScanEngine(np.vstack((x, y)), {'_STEPTIME': 2})
+        assert engine.data.shape == (2, 400)
+        assert engine.get_max() == np.nanmax(y)
+        assert abs(
+            engine.sum() - np.trapezoid(engine.data[1], engine.data[0])) < 1e-6
+
+        fit_max = engine.get_max(mode='fit')
+        assert abs(engine.x_shift_to_centre()) < 1e-12
+        assert engine.data[1].min() == 0
+        _, _, (fun_max, fwhm) = engine.fit()
+        assert abs(fit_max - fun_max * fwhm / 2) < 1e-6
+        assert abs(fwhm - 0.1665) < 0.01
+
+    def test_baseline(self):
+        x = np.linspace(-1, 1, 201)
+        peak = 100 * np.exp(-(x - 0.2) ** 2 / 0.001)
+        assert abs(trapezoid(x, x ** 2) - 2 / 3) < 1e-3
+        assert trapezoid([], []) == 0
+
+        engine = OneDScanEngine(np.vstack((x, peak + 5 + 3 * x)))
+        engine.baseline(0.9, -0.9)
+        np.testing.assert_allclose(engine.data[1], peak, atol=1e-9)
+        np.testing.assert_allclose(engine.data[0], x - 0.2, atol=1e-12)
+
+        engine = OneDScanEngine(np.vstack((x, peak + 5 + 3 * x)))
+        engine.target(rg=10)
+        np.testing.assert_allclose(engine.data[1], peak, atol=1e-9)
+
+        background = 5 + 3 * x - 4 * x ** 2
+        np.testing.assert_allclose(
+            poly_baseline(x, peak + background, np.abs(x) > 0.5, order=2),
+            background)
+        engine = OneDScanEngine(np.vstack((x, peak + background)))
+        engine.poly_target(rg=50, order=2)
+        np.testing.assert_allclose(engine.data[1], peak, atol=1e-9)
+
+    def test_without_qt(self):
+        code = (
+            "import sys\n"
+            "import module.engine.OneDScanEngine\n"
+            "import module.engine.PolesFigureEngine\n"
+            "import module.engine.AFMEngine\n"
+            "assert 'PyQt5' not in sys.modules\n"
+            "assert 'matplotlib' not in sys.modules\n"
+        )
+        subprocess.check_call(
+            [sys.executable, "-c", code], cwd=os.path.dirname(os.getcwd()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.RawFile import RawFile
+from module.engine.PeakEngine import find_peaks
+from module.engine.PolesFigureEngine import PolesFigureEngine
+
+
+class TestPeakEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_find_peaks(self):
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join("test_data", "PF.raw"))
+        data, attr = raw_file.get_data()
+
+        index, intensity = find_peaks(PolesFigureEngine(data, attr).grid())
+        assert index.tolist() == [[302, 11], [191, 17], [49, 18], [119, 22]]
+        assert np.all(np.diff(intensity) <= 0)
+
+    def test_non_max_suppression(self):
+        int_m = np.random.RandomState(0).poisson(50, (181, 1441)).astype(
+            float)
+        peaks = [[200, 10], [204, 12], [700, 30], [1300, 20], [900, 80]]
+        for (x, y), amplitude in zip(peaks, [900, 600, 700, 800, 2000]):
+            int_m[y - 4:y + 4, x - 4:x + 4] += amplitude
+
+        index, intensity = find_peaks(int_m, n=3, chi_max=40)
+        # The second box is merged into the first peak, the strongest box
+        # is beyond chi_max.
+        np.testing.assert_allclose(
+            np.sort(index[:, 0]), [201, 700, 1300], atol=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
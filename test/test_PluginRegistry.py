@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import yaml
+
+from module.PluginRegistry import PluginRegistry, PROCESSOR, READER
+
+PLUGIN = '''from module.Module import FileModule
+
+
+class Foo(FileModule):
+    @property
+    def name(self):
+        return "Foo reader"
+
+    @property
+    def supp_type(self):
+        return {0!r}
+'''
+
+
+class TestPluginRegistry(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_scan(self):
+        registry = PluginRegistry().scan()
+        assert registry.plugins['RawFile']['kind'] == READER
+        assert registry.plugins['RawFile']['supp_type'] == ['.raw']
+        assert registry.plugins['H5File']['supp_type'] == ['.h5']
+        assert registry.plugins['RCurveProc']['kind'] == PROCESSOR
+        assert registry.plugins['Material']['supp_type'] == []
+        for i in ('Module', 'PluginRegistry', 'GUI'):
+            assert i not in registry.plugins
+
+        registry.update_types({'RSMPlot': 'RSMProc'})
+        assert registry.get_name('RSMPlot') == 'RSMProc'
+        from module.RawFile import RawFile
+        assert registry.get_class('.raw') is RawFile
+        with self.assertRaises(KeyError):
+            registry.get_class('.unknown')
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            module_dir = os.path.join(tmp_dir, "module")
+            os.mkdir(module_dir)
+            plugin = os.path.join(module_dir, "Foo.py")
+            cache = os.path.join(tmp_dir, "plugins.yml")
+            with open(plugin, 'w') as fh:
+                fh.write(PLUGIN.format(".foo"))
+
+            registry = PluginRegistry(module_dir, cache).scan()
+            assert registry.plugins['Foo']['name'] == "Foo reader"
+            assert registry.get_name('.foo') == 'Foo'
+
+            # Unchanged files are read from the cache.
+            with open(cache) as fh:
+                cached = yaml.safe_load(fh)
+            cached['Foo']['info']['supp_type'] = ['.cached']
+            with open(cache, 'w') as fh:
+                yaml.safe_dump(cached, fh)
+            registry = PluginRegistry(module_dir, cache).scan()
+            assert registry.get_name('.cached') == 'Foo'
+
+            # Modified files are parsed again.
+            with open(plugin, 'w') as fh:
+                fh.write(PLUGIN.format((".bar", ".baz")))
+            mtime = cached['Foo']['mtime'] + 10
+            os.utime(plugin, (mtime, mtime))
+            registry = PluginRegistry(module_dir, cache).scan()
+            assert registry.plugins['Foo']['supp_type'] == ['.bar', '.baz']
+            with self.assertRaises(KeyError):
+                registry.get_name('.cached')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+import PolesFigureBatch
+from module.H5File import H5File
+from module.RawFile import RawFile
+
+
+class TestPolesFigureBatch(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lib_file = os.path.join(tmp_dir, "lib.h5")
+            lib = H5File()
+            lib.get_file(lib_file)
+            for i in ("002", "PF"):
+                raw_file = RawFile()
+                raw_file.get_file(os.path.join("test_data", i + ".raw"))
+                data, attr = raw_file.get_data()
+                for j in ("wafer1", "wafer2"):
+                    lib.fh.require_group(j)
+                    lib.set_data(data, attr, path=j, name=i)
+            lib.fh.close()
+
+            assert PolesFigureBatch.find_data_sets(lib_file) == [
+                "/wafer1/PF", "/wafer2/PF"]
+            assert PolesFigureBatch.find_data_sets(
+                lib_file, ["wafer2/*"]) == ["/wafer2/PF"]
+
+            out_file = os.path.join(tmp_dir, "fractions.csv")
+            assert PolesFigureBatch.main(
+                [lib_file, "-o", out_file, "-j", "2"]) == 0
+            with open(out_file, newline='') as fp:
+                rows = list(csv.DictReader(fp, delimiter=";"))
+            assert [i['Data set'] for i in rows] == [
+                "/wafer1/PF", "/wafer2/PF"]
+            np.testing.assert_allclose(
+                [float(rows[0]['Int ' + i])
+                 for i in PolesFigureBatch.MT_LABELS],
+                [11875, 14819, 22673, 13298])
+            assert float(rows[0]['Background']) == 74
+            assert rows[0]['VF MT'] == rows[1]['VF MT']
+
+
+if __name__ == '__main__':
+    unittest.main()
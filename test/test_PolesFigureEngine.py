@@ -0,0 +1,99 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.RawFile import RawFile
+from module.engine.PolesFigureEngine import (
+    IntegralImage, PolesFigureEngine, Square, region_stats)
+
+
+class TestPolesFigureEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_sq_pk_integrate(self):
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join("test_data", "PF.raw"))
+        data, attr = raw_file.get_data()
+
+        engine = PolesFigureEngine(data, attr)
+        assert engine.limits == (-30, 331, 0, 68)
+        gridded_data = engine.grid()
+        assert gridded_data.shape == (69, 362)
+
+        int_vsot_bg_m, ind_l, sq_ins_l = engine.sq_pk_integrate([16, 16])
+        assert len(ind_l) == len(sq_ins_l) == 4
+        assert [list(map(int, i)) for i in ind_l] == [
+            [119, 22], [191, 17], [302, 11], [49, 18]]
+        np.testing.assert_allclose(
+            int_vsot_bg_m, [11875, 14819, 22673, 13298])
+        assert engine.background_intensity() == 74
+        assert engine._bk_int == {"Mode": 74}
+
+    def test_poly_pk_integrate(self):
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join("test_data", "PF.raw"))
+        data, attr = raw_file.get_data()
+
+        int_vsot_bg_m, ind_l, edge = PolesFigureEngine(
+            data, attr).poly_pk_integrate()
+        np.testing.assert_allclose(
+            int_vsot_bg_m, [21688, 14396, 13249, 11781])
+        assert [list(map(round, i)) for i in ind_l] == [
+            [302, 11], [191, 17], [49, 18], [119, 23]]
+        assert edge.shape == (69, 362)
+
+    def test_region_stats(self):
+        label_image = np.array([[1, 1, 0, 2],
+                                [0, 1, 0, 2],
+                                [3, 0, 0, 0]])
+        int_m = np.arange(12, dtype=float).reshape(3, 4)
+        stats = region_stats(label_image, int_m)
+        np.testing.assert_array_equal(stats['label'], [1, 2, 3])
+        np.testing.assert_array_equal(stats['area'], [3, 2, 1])
+        np.testing.assert_allclose(stats['sum'], [6, 10, 8])
+        np.testing.assert_allclose(
+            stats['centroid'], [[1, 5 / 6], [3, 0.7], [0, 2]])
+
+    def test_grid(self):
+        from scipy.interpolate import griddata
+
+        data = np.random.RandomState(0).rand(181, 721)
+        attr = {'DRV_1': np.linspace(0, 90, 181),
+                'DRV_2': np.linspace(-5, 355, 721)}
+        engine = PolesFigureEngine(data, attr)
+        gridded_data = engine.grid()
+        assert engine.grid() is gridded_data
+
+        xx, yy = np.meshgrid(np.arange(-5, 356), np.arange(0, 91))
+        xx_r, yy_r = np.meshgrid(
+            np.linspace(-5, 355, 721), np.linspace(0, 90, 181))
+        expected = griddata(
+            (xx_r.ravel(), yy_r.ravel()), data.ravel(), (xx, yy),
+            method='nearest')
+        np.testing.assert_array_equal(gridded_data, expected)
+
+        engine.set_data(data[:, ::2], attr)
+        assert engine.grid() is not gridded_data
+
+    def test_integral_image(self):
+        int_m = np.random.RandomState(0).rand(40, 60)
+        int_m[30, 50] = np.nan
+        integral = IntegralImage(int_m)
+        for cr_l, sz_t in [([10, 10], [8, 6]), ([0, 0], [20, 20]),
+                           ([55, 35], [20, 20]), ([50, 30], [4, 4])]:
+            sq = Square(cr_l, sz_t, int_m)
+            sq_sat = Square(cr_l, sz_t, integral)
+            np.testing.assert_allclose(
+                sq_sat.intensity_image, sq.intensity_image)
+            assert sq_sat.points == sq.points
+
+        np.testing.assert_allclose(
+            integral.sum(np.array([0, 5]), np.array([60, 9]),
+                         np.array([0, 2]), np.array([30, 7])),
+            [np.sum(int_m[0:30, 0:60]), np.sum(int_m[2:7, 5:9])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+import RSMBatch
+
+
+class TestRSMBatch(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_main(self):
+        assert RSMBatch.find_files(["test_data"]) == [
+            os.path.join("test_data", "002.raw"),
+            os.path.join("test_data", "PF.raw")]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            assert RSMBatch.main([
+                "test_data/*.raw", "-o", tmp_dir, "-m", "Structured",
+                "-i", "none", "-j", "2"]) == 0
+            assert sorted(os.listdir(tmp_dir)) == ["002.npz"]
+            res = np.load(os.path.join(tmp_dir, "002.npz"))
+            assert res['z'].shape == (len(res['y']), len(res['x']))
+
+    def test_same_name(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_dir = os.path.join(tmp_dir, "in")
+            for i in ("wafer01", "wafer02"):
+                os.makedirs(os.path.join(in_dir, i))
+                shutil.copy(os.path.join("test_data", "002.raw"),
+                            os.path.join(in_dir, i))
+            assert RSMBatch.find_inputs(
+                [os.path.join(in_dir, "*", "*.raw")]) == [
+                (os.path.join(in_dir, "wafer01", "002.raw"),
+                 os.path.join("wafer01", "002")),
+                (os.path.join(in_dir, "wafer02", "002.raw"),
+                 os.path.join("wafer02", "002"))]
+
+            out_dir = os.path.join(tmp_dir, "out")
+            assert RSMBatch.main([
+                in_dir, "-o", out_dir, "-m", "Structured", "-i", "none",
+                "-j", "2"]) == 0
+            assert sorted(os.listdir(out_dir)) == ["wafer01", "wafer02"]
+            assert os.listdir(os.path.join(out_dir, "wafer02")) == [
+                "002.npz"]
+
+            # Two inputs of the same name are refused.
+            assert RSMBatch.main([
+                os.path.join(in_dir, "wafer01"),
+                os.path.join(in_dir, "wafer02"), "-o", out_dir]) == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
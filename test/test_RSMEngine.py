@@ -0,0 +1,84 @@
+import os
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.RawFile import RawFile
+from module.engine import RSMEngine
+
+
+class TestRSMEngine(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_rsm_regrid(self):
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join("test_data", "002.raw"))
+        data, attr = raw_file.get_data()
+        # A coarse map keeps the triangulations short.
+        data, attr['OMEGA'] = data[::10], attr['OMEGA'][::10]
+        RSMEngine._RSM_CACHE.clear()
+
+        res = RSMEngine.rsm_regrid(data, attr['TWOTHETA'], attr['OMEGA'], 0)
+        assert res[2].shape == data.shape[::-1]
+        assert not res[2].flags.writeable
+        assert RSMEngine.rsm_regrid(
+            data, attr['TWOTHETA'], attr['OMEGA'], 0.5) is res
+        shifted = RSMEngine.rsm_regrid(
+            data, attr['TWOTHETA'], attr['OMEGA'] - 0.1, 0)
+        assert shifted is not res
+        assert not np.allclose(shifted[0], res[0])
+
+        for i in range(RSMEngine.RSM_CACHE_SIZE):
+            RSMEngine.rsm_regrid(
+                data, attr['TWOTHETA'], attr['OMEGA'], 0, shape=(10 + i, 10))
+        assert len(RSMEngine._RSM_CACHE) == RSMEngine.RSM_CACHE_SIZE
+        assert RSMEngine.rsm_regrid(
+            data, attr['TWOTHETA'], attr['OMEGA'], 0) is not res
+
+    def test_rsm_interpolator(self):
+        from scipy.interpolate import griddata
+
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join("test_data", "002.raw"))
+        data, attr = raw_file.get_data()
+        data, omega = data[::10], attr['OMEGA'][::10]
+        tth = attr['TWOTHETA']
+
+        interpolator = RSMEngine.get_interpolator(tth, omega)
+        assert RSMEngine.get_interpolator(tth, omega.copy()) is interpolator
+        xi, yi, zi, _ = interpolator(data, 0.2, True)
+
+        s_x, s_z = interpolator.coordinates(0.2, True)
+        xx, yy = np.meshgrid(xi, yi)
+        ref = griddata((s_x, s_z), data.ravel(), (xx, yy), method='linear')
+        assert (np.isnan(ref) == np.isnan(zi)).mean() > 0.99
+        mask = ~np.isnan(ref) & ~np.isnan(zi)
+        assert np.allclose(zi[mask], ref[mask], atol=1e-2 * data.max())
+        # Only the weights are reused for a new intensity map.
+        assert np.allclose(interpolator(2 * data, 0.2, True)[2][mask],
+                           2 * zi[mask])
+
+    def test_rsm_structured(self):
+        raw_file = RawFile()
+        raw_file.get_file(os.path.join("test_data", "002.raw"))
+        data, attr = raw_file.get_data()
+        data, omega = data[::10], attr['OMEGA'][::10]
+        tth = attr['TWOTHETA']
+
+        s_x, s_z = RSMEngine.angle2q(tth, omega, 0.2, True)
+        tth_q, omega_q = RSMEngine.q2angle(s_x, s_z, 0.2, True)
+        assert np.allclose(tth_q, tth[None, :])
+        assert np.allclose(omega_q, omega[:, None])
+
+        xi, yi, zi, extent = RSMEngine.rsm_structured(
+            data, tth, omega, 0.2, True)
+        ref = RSMEngine.get_interpolator(tth, omega)(data, 0.2, True)
+        assert np.allclose(xi, ref[0]) and np.allclose(yi, ref[1])
+        assert (np.isnan(zi) == np.isnan(ref[2])).mean() > 0.98
+        mask = ~np.isnan(zi) & ~np.isnan(ref[2])
+        assert np.median(np.abs(zi[mask] - ref[2][mask])) < 1e-2 * data.max()
+
+
+if __name__ == '__main__':
+    unittest.main()
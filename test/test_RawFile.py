@@ -1,8 +1,12 @@
 import unittest
 import logging
 import os
+import struct
+import tempfile
 
-from module.RawFile import RawFile
+import numpy as np
+
+from module.RawFile import RangeTable, RawFile
 from unittest import TestCase
 
 
@@ -81,4 +85,155 @@ class TestRawFile(TestCase):
         assert ATTR['STEPPING_DRIVE1'] == "KHI"
         assert ATTR['STEPPING_DRIVE2'] == 'PHI'
 
+    def test_mmap_reader(self):
+        for file_name in ("002.raw", "PF.raw"):
+            RAW_FILE = RawFile()
+            RAW_FILE.get_file(os.path.join("test_data", file_name))
+            META_HEADER, TABLE = RAW_FILE.parser_table()
+            MAPPED_DATA, MAPPED_ATTR = RAW_FILE.get_data()
+
+            assert len(TABLE) == META_HEADER['RANGE_CNT']
+
+            RAW_FILE.use_mmap = False
+            DATA, ATTR = RAW_FILE.get_data()
+
+            assert np.array_equal(MAPPED_DATA, DATA)
+            assert MAPPED_ATTR['TYPE'] == ATTR['TYPE']
+
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "PF.raw"))
+        _, TABLE = RAW_FILE.parser_table()
+        # Regular files are exposed as a view into the mapped file.
+        assert isinstance(TABLE.intensity, np.ndarray)
+        assert TABLE.intensity.shape == (69, 361)
+        assert not TABLE.intensity.flags['OWNDATA']
+        buffer = TABLE.buffer
+        TABLE.close()
+        assert buffer.closed
+        assert TABLE.intensity is None
+        assert TABLE.header['STEPS'][0] == 361
+
+    def test_ragged_assembly(self):
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "002.raw"))
+        _, TABLE = RAW_FILE.parser_table()
+        # The aborted ranges at the end of the map have no step.
+        assert TABLE.intensity is None
+        assert TABLE.to_array().shape == (1501, 154)
+        assert not TABLE.to_array()[-1].any()
+
+        TABLE = TABLE.select('TWOTHETA')
+        assert len(TABLE) == 1291
+        TABLE.check_uniform('STEPS', 'STEP_SIZE')
+
+    def test_short_last_range(self):
+        with open(os.path.join("test_data", "PF.raw"), 'rb') as file_handle:
+            content = bytearray(file_handle.read())
+        TABLE = RangeTable.from_buffer(bytes(content), 712, 69)
+        stride = (len(content) - 712) // 69
+        last = 712 + 68 * stride
+        # The last range is cut to 100 steps, the strides are unchanged.
+        struct.pack_into('<I', content, last + 4, 100)
+        content = bytes(content[:last + stride - 4 * (361 - 100)])
+        SHORT_TABLE = RangeTable.from_buffer(content, 712, 69)
+        assert SHORT_TABLE.intensity is None
+        DATA = SHORT_TABLE.to_array()
+        assert DATA.shape == (69, 361)
+        assert np.array_equal(DATA[:-1], TABLE.to_array()[:-1])
+        assert np.array_equal(DATA[-1, :100], TABLE.to_array()[-1, :100])
+        assert not DATA[-1, 100:].any()
+
+    def test_get_header(self):
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "002.raw"))
+        ATTR = RAW_FILE.get_header()
+        _, DATA_ATTR = RAW_FILE.get_data()
+
+        assert ATTR['TYPE'] == 'RSMPlot'
+        assert np.array_equal(ATTR['OMEGA'], DATA_ATTR['OMEGA'])
+        assert ATTR['ANGULAR_RANGE']['OMEGA'] == (
+            DATA_ATTR['OMEGA'].min(), DATA_ATTR['OMEGA'].max())
+
+        RAW_FILE = RawFile()
+        RAW_FILE.get_file(os.path.join("test_data", "PF.raw"))
+        ATTR = RAW_FILE.get_header()
+
+        assert ATTR['TYPE'] == 'PolesFigurePlot'
+        assert ATTR['STEPPING_DRIVE2'] == 'PHI'
+        assert ATTR['ANGULAR_RANGE']['KHI'] == (0, 68)
+
+    def test_version1_version2(self):
+        intensity = np.arange(20, dtype='<f4')
+
+        def range_v1(twotheta, following, khi=-1e6):
+            head = bytearray(152)
+            struct.pack_into('<IffI', head, 0, 10, 2., 0.01, 1)
+            struct.pack_into('<ffff', head, 20, twotheta, 15., khi, -1e6)
+            struct.pack_into('<I', head, 148, following)
+            return bytes(head)
+
+        def range_v2(twotheta):
+            head = bytearray(48)
+            struct.pack_into('<HH', head, 0, 48, 10)
+            struct.pack_into('<fff', head, 8, 2., 0.01, twotheta)
+            return bytes(head)
+
+        head_v2 = bytearray(256)
+        struct.pack_into('<H', head_v2, 4, 2)
+        contents = {
+            'v1.raw': b"RAW " + range_v1(30., 1) + intensity[:10].tobytes() +
+            b"RAW " + range_v1(30., 0) + intensity[10:].tobytes(),
+            'v2.raw': b"RAW2" + bytes(head_v2[4:]) +
+            range_v2(30.) + intensity[:10].tobytes() +
+            range_v2(30.) + intensity[10:].tobytes(),
+            'v1_khi.raw': b"RAW " +
+            range_v1(30., 1, khi=0.) + intensity[:10].tobytes() +
+            b"RAW " + range_v1(30., 0, khi=5.) + intensity[10:].tobytes(),
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name, content in contents.items():
+                path = os.path.join(tmp_dir, name)
+                with open(path, 'wb') as file_handle:
+                    file_handle.write(content)
+                RAW_FILE = RawFile()
+                RAW_FILE.get_file(path)
+                META_HEADER, SCANS = RAW_FILE.parser_file()
+                assert META_HEADER['FORMAT_VERSION'] == name[:2]
+                assert len(SCANS) == 2
+                assert SCANS[1].intensity == tuple(intensity[10:])
+                for use_mmap in (True, False):
+                    RAW_FILE.use_mmap = use_mmap
+                    META_HEADER, TABLE = RAW_FILE.parser_table()
+                    assert TABLE.header['TWOTHETA'][1] == 30.
+                    assert np.array_equal(
+                        TABLE.to_array(2.), intensity.reshape(2, 10) / 2.)
+                    del TABLE
+                    DATA, ATTR = RAW_FILE.get_data()
+                    if name == 'v1_khi.raw':
+                        assert ATTR['TYPE'] == 'TwoDPlot'
+                        assert ATTR['STEPPING_DRIVE1'] == 'KHI'
+                        assert ATTR['STEPPING_DRIVE2'] == 'TWOTHETA'
+                        assert np.array_equal(ATTR['DRV_1'], [0., 5.])
+                        assert np.array_equal(
+                            DATA, intensity.reshape(2, 10) / 2.)
+                    else:
+                        # Repeated ranges, joined along the scan axis.
+                        assert ATTR['TYPE'] == 'SingleScan'
+                        assert ATTR['STEPPING_DRIVE1'] == 'TWOTHETA'
+                        assert DATA.shape == (2, 20)
+                        assert np.all(np.diff(DATA[0]) >= 0)
+                        assert np.array_equal(
+                            DATA[1, ::2], intensity[:10] / 2.)
+                        assert np.array_equal(
+                            DATA[1, 1::2], intensity[10:] / 2.)
+                        assert abs(DATA[0][0] - 30.) < 1e-6
+                    del DATA
+                    HEADER = RAW_FILE.get_header()
+                    assert HEADER['TYPE'] == ATTR['TYPE']
+                    assert abs(
+                        HEADER['ANGULAR_RANGE']['TWOTHETA'][1] - 30.1) < 1e-5
+        V1_TABLE = RawFile.table_version1(contents['v1.raw'])[1]
+        assert V1_TABLE.header['OMEGA'][0] == 15.
+        assert V1_TABLE.header['PHI'][0] == 0.
+
     # def test_
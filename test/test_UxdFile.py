@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+from module.UxdFile import UxdFile
+
+
+class TestUxdFile(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_get_data(self):
+        lines = [
+            "; RSM export", "_FILEVERSION=2", "_TYPE=RSMPlot",
+            "_STEPPING_DRIVE1=OMEGA", "_STEPPING_DRIVE2=TWOTHETA",
+        ]
+        for i in range(3):
+            lines += [
+                "; (Data for Range number {0})".format(i),
+                "_STEPTIME=2.0", "_STEPSIZE=0.01", "_STEPS=4", "_PHI=1.5",
+                "_OMEGA={0}".format(10 + 0.1 * i), "_2THETACOUNTS",
+            ]
+            lines += [
+                "{0:.2f}\t{1}".format(30 + 0.01 * j, 10 * i + j)
+                for j in range(4)
+            ]
+        lines += ["; Empty range", "_STEPTIME=2.0", ""]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "rsm.uxd")
+            with open(path, 'w') as file_handle:
+                file_handle.write("\n".join(lines))
+            UXD_FILE = UxdFile()
+            UXD_FILE.get_file(path)
+            DATA, ATTR = UXD_FILE.get_data()
+        assert ATTR['TYPE'] == 'RSMPlot'
+        assert ATTR['PHI'] == 1.5
+        assert ATTR['STPES'] == 4
+        assert np.allclose(ATTR['OMEGA'], [10, 10.1, 10.2])
+        assert np.allclose(ATTR['TWOTHETA'], [30, 30.01, 30.02, 30.03])
+        assert np.array_equal(
+            DATA, (np.arange(4) + 10 * np.arange(3)[:, None]) / 2.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import TestCase
+
+from test.bench_startup import LAZY_MODULES, ROOT
+
+
+class TestStartup(TestCase):
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    def test_lazy_import(self):
+        # The library is read at start up, the plot dependencies are not.
+        code = (
+            "import sys\n"
+            "import module.H5File, module.RawFile\n"
+            "lazy = [i for i in {0!r} if i in sys.modules]\n"
+            "assert not lazy, lazy\n"
+        ).format(LAZY_MODULES)
+        subprocess.check_call([sys.executable, "-c", code], cwd=ROOT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,4 @@
 import logging
-from distutils import util
 
 import numpy as np
 from PyQt5 import QtWidgets, QtCore
@@ -8,6 +7,18 @@ from ui.ConfirmInt.ConfirmInterface import ConfirmInterface
 from ui.TableInt.table import Ui_Form
 
 
+def strtobool(val):
+    """Convert a string representation of truth to 1 or 0, as the
+    distutils one, whose import is slow."""
+    val = val.lower()
+    if val in ('y', 'yes', 't', 'true', 'on', '1'):
+        return 1
+    elif val in ('n', 'no', 'f', 'false', 'off', '0'):
+        return 0
+    else:
+        raise ValueError("invalid truth value {0!r}".format(val))
+
+
 class TableInt(QtWidgets.QWidget):
     proc_done = QtCore.pyqtSignal(dict)
 
@@ -58,7 +69,7 @@ class TableInt(QtWidgets.QWidget):
         for i in scan_d:
             if i in self.dct:
                 if isinstance(self.dct[i], (bool, np.bool_)):
-                    scan_d[i] = util.strtobool(scan_d[i])
+                    scan_d[i] = strtobool(scan_d[i])
                 elif isinstance(self.dct[i], (np.int_, int)):
                     scan_d[i] = np.int(scan_d[i])
                 elif isinstance(self.dct[i], (np.float_, float)):